@@ -0,0 +1,130 @@
+"""
+Allergen and attribute tags for catalog products
+
+Every product gets a tag_bits integer column: bit i is set when the product
+carries TAGS[i] (an allergen such as nuts or gluten, or an attribute such
+as pork). Tags are matched once, by enhance_data.py when it builds
+data/foods_enhanced.csv, on the product name. Requests
+never match strings; excluding tags is a single bitwise AND over the
+column. The catalog snapshot computes the column at load time for CSVs
+built before it existed.
+
+Exclusions are given as tag names or "brand:<name>". Brands are matched
+case-insensitively against the brand column.
+
+Tag order is part of the data format: add new tags at the end.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Plant milks and butters that carry no dairy (lookbehinds before "milk"/"butter")
+_PLANT = "".join(f"(?<!{word} )" for word in ("almond", "soy", "oat", "coconut", "rice", "cashew", "hemp", "pea"))
+_NUT_BUTTER = "".join(f"(?<!{word} )" for word in ("peanut", "almond", "cashew", "apple", "cocoa", "shea"))
+
+
+def _unless(free_of: str) -> str:
+    """Prefix that stops a tag matching names saying they're free of it."""
+    return rf"^(?!.*\b(?:{free_of})\b)"
+
+
+# name -> pattern matched against the lowercase product_name
+TAGS = {
+    "gluten": _unless(r"gluten[ -]free")
+              + r".*(?:bread|bagel|croissant|muffin|dinner roll|pita|tortilla wrap|pasta|spaghetti|penne|lasagna"
+                r"|pizza|cookie|cracker|corn flakes|granola|nugget|wheat)",
+    "dairy": _unless(r"vegan|dairy[ -]free|non[ -]dairy|plant[ -]based")
+             + rf".*(?:{_PLANT}milk\b|cheese|yogurt|{_NUT_BUTTER}butter(?!nut)|ice cream|eggnog|croissant|lasagna|pizza"
+               r"|chocolate chip)",
+    "eggs": _unless(r"vegan|egg[ -]free|plant[ -]based")
+            + r".*(?:\beggs?\b|eggnog|mayonnaise|croissant|lasagna|cookie)",
+    "peanuts": r"peanut|trail mix",
+    "tree_nuts": r"almond|cashew|walnut|pecan|hazelnut|pistachio|trail mix|granola",
+    "soy": r"\bsoy|tofu|edamame|protein bar",
+    "fish": r"salmon|tilapia|tuna|\bcod\b|\bfish",
+    "shellfish": r"shrimp|prawn|crab|lobster|mussel",
+    "sesame": r"sesame|hummus|bagel",
+    "pork": r"bacon|\bham\b|pork",
+    "caffeine": r"coffee|\btea\b|\bcola\b",
+}
+
+BRAND_PREFIX = "brand:"
+
+
+def tag_bits(df: pd.DataFrame) -> np.ndarray:
+    """tag_bits of every row of df (int64 array, bit i = TAGS[i]; all 0 without product_name)."""
+    if "product_name" not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    text = df["product_name"].fillna("").astype(str).str.lower()
+
+    bits = np.zeros(len(df), dtype=np.int64)
+    for i, pattern in enumerate(TAGS.values()):
+        bits |= text.str.contains(pattern, regex=True).to_numpy(dtype=bool).astype(np.int64) << i
+    return bits
+
+
+def tag_names(bits: int) -> list:
+    """Tag names set in one tag_bits value."""
+    return [name for i, name in enumerate(TAGS) if bits >> i & 1]
+
+
+def parse_exclusions(values) -> tuple:
+    """
+    Normalize a list of exclusions.
+
+    Args:
+        values: Tag names and "brand:<name>" entries (strings; a string may
+                hold several, comma-separated)
+
+    Returns:
+        Sorted tuple of distinct lowercase exclusions
+
+    Raises:
+        ValueError: on an unknown tag or an empty brand
+    """
+    exclusions = set()
+    for value in values:
+        for entry in str(value).split(","):
+            entry = entry.strip().lower()
+            if not entry:
+                continue
+            if entry.startswith(BRAND_PREFIX):
+                if not entry[len(BRAND_PREFIX):].strip():
+                    raise ValueError("brand exclusions need a name, e.g. brand:kirkland")
+                entry = BRAND_PREFIX + entry[len(BRAND_PREFIX):].strip()
+            elif entry not in TAGS:
+                raise ValueError(f"Unknown exclusion {entry!r}; expected one of: {', '.join(TAGS)} "
+                                 f"or {BRAND_PREFIX}<name>")
+            exclusions.add(entry)
+    return tuple(sorted(exclusions))
+
+
+def unknown_brands(exclusions, brands) -> list:
+    """
+    Brand names of the brand:<name> exclusions (from parse_exclusions())
+    that aren't in brands (lowercase brand names of a catalog).
+    """
+    return [entry[len(BRAND_PREFIX):] for entry in exclusions
+            if entry.startswith(BRAND_PREFIX) and entry[len(BRAND_PREFIX):] not in brands]
+
+
+def excluded_rows(df: pd.DataFrame, exclusions) -> np.ndarray:
+    """
+    Boolean mask of the rows of df hit by any exclusion (from parse_exclusions()).
+
+    Tags are one AND of the tag_bits column with the OR of their bits
+    (computed here if df has no tag_bits column).
+    """
+    mask_bits = 0
+    brands = set()
+    for entry in exclusions:
+        if entry.startswith(BRAND_PREFIX):
+            brands.add(entry[len(BRAND_PREFIX):])
+        else:
+            mask_bits |= 1 << list(TAGS).index(entry)
+
+    bits = df["tag_bits"].to_numpy(dtype=np.int64) if "tag_bits" in df.columns else tag_bits(df)
+    excluded = (bits & mask_bits) != 0
+    if brands and "brand" in df.columns:
+        excluded |= df["brand"].fillna("").astype(str).str.lower().isin(brands).to_numpy()
+    return excluded
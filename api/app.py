@@ -1,35 +1,32 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, make_response, request, jsonify
 from flask_cors import CORS
+import functools
 import os
 import logging
+import time
+
+import metrics
+import ml_utils
+import smart_chef
+from catalog import CatalogSnapshot, search_products, start_warmup
+from log_config import configure_logging
+from plan_executor import PlanExecutor, PlannerBusy
+from profiling import RequestProfiler
+from settings import default_config
+from substitutes import find_substitutes
+from validation import (RequestError, check_catalog_params, parse_plan_request, parse_adjust_request,
+                        parse_recipe_items, parse_sweep_request)
 
-from planner import load_dataset, planner
-
-app = Flask(__name__)
-
-# CORS configuration for local dev and production
-CORS(app, origins=[
-    "http://localhost:3000",  # Local development
-    "https://nutribudget-web.vercel.app",  # Production (update this after Vercel deployment)
-    "https://*.vercel.app",  # Vercel preview deployments
-], supports_credentials=True)
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Path to CSV (in api/data folder for deployment)
-DATA_PATH = os.path.join(
-    os.path.dirname(__file__),
-    "data",
-    "foods_enhanced.csv",
-)
+api = Blueprint("api", __name__)
 
-# Load dataset once at startup
-df = load_dataset(DATA_PATH)
+def get_catalog() -> CatalogSnapshot:
+    """The catalog snapshot attached to the current app."""
+    return current_app.extensions["catalog"]
 
 
-@app.route("/health", methods=["GET"])
+@api.route("/health", methods=["GET"])
 def health():
     """
     Health check endpoint.
@@ -37,17 +34,80 @@ def health():
     return jsonify({"status": "ok"})
 
 
-@app.route("/api/debug-products", methods=["GET"])
+@api.route("/ready", methods=["GET"])
+def ready():
+    """
+    Readiness check, separate from /health (liveness).
+    
+    Returns 200 once the catalog is loaded and warm-up has finished (models
+    loaded and catalog ML scores precomputed, or models known to be unavailable
+    so the greedy fallback is used), and 503 while warm-up is still in progress.
+    """
+    catalog = get_catalog()
+    status = ml_utils.model_status()
+    models_settled = catalog.scores_ready or current_app.config["WARM_MODELS"] == "off"
+    is_ready = len(catalog) > 0 and models_settled
+    
+    return jsonify({
+        "status": "ready" if is_ready else "warming",
+        "products": len(catalog),
+        "models": status
+    }), 200 if is_ready else 503
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Request, plan-stage and cache metrics of this worker in Prometheus text format.
+    """
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@api.before_app_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@api.after_app_request
+def record_request(response):
+    if "request_started" in g:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe_request(endpoint, request.method, response.status_code,
+                                time.perf_counter() - g.request_started)
+    return response
+
+
+@api.route("/api/debug-products", methods=["GET"])
 def debug_products():
     """
     Simple debug route to confirm backend + data loading work.
     Returns the first 20 rows as JSON.
     """
-    sample = df.head(20).to_dict(orient="records")
+    sample = get_catalog().df.head(20).to_dict(orient="records")
     return jsonify(sample)
 
 
-@app.route("/api/foods", methods=["GET"])
+def profiled(view):
+    """
+    Run the view under cProfile when the request asks for it (see profiling.py)
+    and return the profile id in an X-Profile-Id header. When profiling is
+    off this adds a single attribute check.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        profiler = current_app.extensions["profiler"]
+        if not profiler.enabled or not profiler.wants(request.path, request.headers):
+            return view(*args, **kwargs)
+        
+        g.profile_id = profiler.request_id(request.headers)
+        response = make_response(profiler.run(g.profile_id, view, *args, **kwargs))
+        response.headers["X-Profile-Id"] = g.profile_id
+        return response
+    return wrapper
+
+
+@api.route("/api/foods", methods=["GET"])
+@profiled
 def api_foods():
     """
     GET /api/foods - Search and filter products.
@@ -58,32 +118,12 @@ def api_foods():
     - cluster: filter by cluster ID
     - store: filter by store name
     - limit: max number of results (default 100)
+    - group_by: "product" for one record per product with min/max price across stores
     """
     try:
-        filtered = df.copy()
-        
-        # Apply filters
-        if "veg_nonveg" in request.args:
-            veg_type = request.args.get("veg_nonveg").lower()
-            filtered = filtered[filtered["veg_nonveg"].astype(str).str.lower().str.contains(veg_type)]
-        
-        if "max_price_per_100g" in request.args:
-            max_price = float(request.args.get("max_price_per_100g"))
-            filtered = filtered[filtered["price_per_100g"] <= max_price]
-        
-        if "cluster" in request.args:
-            cluster_id = int(request.args.get("cluster"))
-            filtered = filtered[filtered["cluster"] == cluster_id]
-        
-        if "store" in request.args:
-            store_name = request.args.get("store").lower()
-            filtered = filtered[filtered["store"].astype(str).str.lower().str.contains(store_name)]
-        
-        # Limit results
-        limit = int(request.args.get("limit", 100))
-        filtered = filtered.head(limit)
-        
-        results = filtered.to_dict(orient="records")
+        # The snapshot is never modified, so filter it directly (no copy)
+        catalog = get_catalog()
+        results = search_products(catalog.df, request.args, catalog.brand_product_ids, catalog.brands)
         return jsonify({"count": len(results), "items": results})
         
     except Exception as e:
@@ -91,7 +131,27 @@ def api_foods():
         return jsonify({"error": str(e)}), 400
 
 
-@app.route("/api/stats", methods=["GET"])
+@api.route("/api/foods/<int:product_id>/substitutes", methods=["GET"])
+def api_substitutes(product_id):
+    """
+    GET /api/foods/<product_id>/substitutes - Nutritionally closest alternatives.
+
+    Query params:
+    - k: number of alternatives (default 5, max 50)
+    - diet: "veg" for vegetarian alternatives only
+    - max_price: maximum price per item
+    - same_category: "true" to stay within the product's category
+    """
+    try:
+        return jsonify(find_substitutes(get_catalog(), product_id, request.args))
+    except KeyError:
+        return jsonify({"error": "Product not found", "product_id": product_id}), 404
+    except Exception as e:
+        logger.error(f"Error in /api/foods/{product_id}/substitutes: {e}")
+        return jsonify({"error": str(e)}), 400
+
+
+@api.route("/api/stats", methods=["GET"])
 def api_stats():
     """
     GET /api/stats - High-level statistics for charts.
@@ -102,40 +162,8 @@ def api_stats():
     - Overall stats (total products, avg price, etc.)
     """
     try:
-        stats = {}
-        
-        # Overall stats
-        stats["total_products"] = len(df)
-        stats["avg_price_per_100g"] = round(df["price_per_100g"].mean(), 2)
-        stats["avg_calories"] = round(df["calories"].mean(), 1)
-        stats["avg_protein"] = round(df["protein"].mean(), 1)
-        
-        # Cluster distribution
-        if "cluster" in df.columns:
-            cluster_stats = df.groupby("cluster").agg({
-                "product_id": "count",
-                "price_per_100g": "mean"
-            }).reset_index()
-            cluster_stats.columns = ["cluster", "count", "avg_price"]
-            
-            # Add cluster labels if available
-            if "cluster_label" in df.columns:
-                labels = df.groupby("cluster")["cluster_label"].first()
-                cluster_stats["label"] = cluster_stats["cluster"].map(labels)
-            
-            stats["cluster_distribution"] = cluster_stats.to_dict(orient="records")
-        
-        # Category distribution
-        if "category" in df.columns:
-            category_stats = df.groupby("category").agg({
-                "product_id": "count",
-                "price_per_100g": "mean"
-            }).reset_index()
-            category_stats.columns = ["category", "count", "avg_price"]
-            category_stats = category_stats.sort_values("count", ascending=False).head(10)
-            stats["category_distribution"] = category_stats.to_dict(orient="records")
-        
-        return jsonify(stats)
+        # Computed once when the catalog snapshot was built
+        return jsonify(get_catalog().stats)
         
     except Exception as e:
         logger.error(f"Error in /api/stats: {e}")
@@ -143,7 +171,8 @@ def api_stats():
 
 
 
-@app.route("/api/plan", methods=["POST"])
+@api.route("/api/plan", methods=["POST"])
+@profiled
 def api_plan():
     """
     POST /api/plan implementation for Phase 1.
@@ -152,184 +181,146 @@ def api_plan():
     - Reads dietType and goal with validation
     - Delegates to planner() to build a response that matches API_CONTRACT.md.
     """
-    body = request.get_json(force=True) or {}
+    try:
+        params = check_catalog_params(parse_plan_request(request.get_json(force=True)), get_catalog())
+    except RequestError as e:
+        return jsonify(e.payload), e.status
+    
+    return planner_response(params)
 
-    # Validate required fields
-    required_fields = ["budget", "people", "dietType", "goal"]
-    missing_fields = [field for field in required_fields if field not in body]
-    if missing_fields:
-        logger.warning(f"Missing required fields: {missing_fields}")
-        return jsonify({
-            "error": "Missing required fields",
-            "missing": missing_fields
-        }), 400
 
-    try:
-        budget = float(body.get("budget", 0))
-        people = int(body.get("people", 1))
-        diet_type = str(body.get("dietType", "veg")).lower()
-        goal = str(body.get("goal", "balanced")).lower()
-    except (TypeError, ValueError) as e:
-        logger.error(f"Invalid request body: {e}")
-        return jsonify({
-            "error": "Invalid data types",
-            "message": "budget must be a number, people must be an integer"
-        }), 400
+@api.route("/api/plan/sweep", methods=["POST"])
+@profiled
+def api_plan_sweep():
+    """
+    POST /api/plan/sweep - Plans for many budgets from one scoring pass.
 
-    # Validate budget
-    if budget <= 0:
-        logger.warning(f"Invalid budget: {budget}")
-        return jsonify({
-            "error": "Invalid budget",
-            "message": "Budget must be greater than 0"
-        }), 400
-    
-    if budget <= 5:
-        logger.info(f"Very low budget: {budget}")
-        return jsonify({
-            "error": "Budget too low",
-            "message": "Budget must be greater than $5 to meet basic nutrition needs."
-        }), 400
+    Takes the /api/plan body with budgets (list) or budgetRange
+    ({"min", "max", "step"}) instead of budget. Returns the totals/coverage
+    curve and the basket changes between consecutive budgets.
+    """
+    try:
+        params = check_catalog_params(parse_sweep_request(request.get_json(force=True)), get_catalog())
+    except RequestError as e:
+        return jsonify(e.payload), e.status
     
-    if budget > 1000:
-        logger.warning(f"Very high budget: {budget}")
-        return jsonify({
-            "error": "Budget too high",
-            "message": "Budget must be less than $1000. Please contact support for larger budgets."
-        }), 400
+    return planner_response(params, task="sweep")
 
-    # Validate people
-    if people < 1:
-        logger.warning(f"Invalid people count: {people}")
-        return jsonify({
-            "error": "Invalid people count",
-            "message": "Number of people must be at least 1"
-        }), 400
-    
-    if people > 20:
-        logger.warning(f"Very large household: {people}")
-        return jsonify({
-            "error": "Household too large",
-            "message": "Maximum supported household size is 20 people"
-        }), 400
-
-    # Validate diet type
-    valid_diet_types = ["veg", "vegetarian", "nonveg", "non-veg", "non_veg", "mixed", "vegan"]
-    if diet_type not in valid_diet_types:
-        logger.warning(f"Invalid diet type: {diet_type}")
-        return jsonify({
-            "error": "Invalid diet type",
-            "message": f"dietType must be one of: {', '.join(valid_diet_types)}",
-            "received": diet_type
-        }), 400
-
-    # Validate goal
-    valid_goals = ["balanced", "high_protein", "low_sugar"]
-    if goal not in valid_goals:
-        logger.warning(f"Invalid goal: {goal}")
-        return jsonify({
-            "error": "Invalid goal",
-            "message": f"goal must be one of: {', '.join(valid_goals)}",
-            "received": goal
-        }), 400
-    
-    logger.info(f"Planning for budget=${budget}, people={people}, diet={diet_type}, goal={goal}")
+
+@api.route("/api/plan/adjust", methods=["POST"])
+@profiled
+def api_plan_adjust():
+    """
+    POST /api/plan/adjust - Repair a prior plan after a small edit.
+
+    Takes planToken (or the prior plan body) plus exclude, pin, budget or
+    people edits. The basket is repaired from cached ranked candidates, so
+    most items stay and nothing is re-scored.
+    """
+    try:
+        params = check_catalog_params(parse_adjust_request(request.get_json(force=True)), get_catalog())
+    except RequestError as e:
+        return jsonify(e.payload), e.status
     
+    return planner_response(params, task="adjust")
+
+
+def planner_response(params, task="plan"):
+    """Run a planner task on the plan executor and turn the outcome into a response."""
     try:
-        result = planner(budget, people, diet_type, goal, df)
-        logger.info(f"Plan generated: {len(result['items'])} items, total cost=${result['totals']['total_spent']:.2f}")
-        return jsonify(result)
+        # Profiled plans run in this thread so cProfile sees the planner
+        result = current_app.extensions["plan_executor"].run(params, inline="profile_id" in g, task=task)
+        serialize_started = time.perf_counter()
+        response = jsonify(result)
+        metrics.plan_stage_duration.observe(time.perf_counter() - serialize_started, stage="serialize")
+        return response
+    except PlannerBusy as e:
+        logger.warning(f"Plan rejected, queue full: {e}")
+        return too_busy_response()
     except Exception as e:
         logger.error(f"Error in planner: {e}")
         return jsonify({
             "error": "Failed to generate plan",
             "message": "An error occurred while generating your meal plan. Please try again.",
-            "details": str(e) if app.debug else None
+            "details": str(e) if current_app.debug else None
         }), 500
 
 
+def too_busy_response():
+    """429 returned when the plan executor's queue is full."""
+    response = jsonify({
+        "error": "Too many requests",
+        "message": "The planner is busy. Please retry in a moment."
+    })
+    response.headers["Retry-After"] = "1"
+    return response, 429
+
+
+@api.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    """
+    GET /admin/profiles - ids of stored request profiles, newest first.
+    Requires the X-Profile-Token header.
+    """
+    profiler = current_app.extensions["profiler"]
+    if not profiler.is_admin(request.headers):
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": profiler.list()})
+
+
+@api.route("/admin/profiles/<profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    """
+    GET /admin/profiles/<id>?format=pstats|collapsed - download a request profile.
+    
+    - pstats (default): binary file for pstats.Stats / snakeviz
+    - collapsed: "a;b;c <microseconds>" lines for flamegraph.pl / speedscope
+    
+    Requires the X-Profile-Token header.
+    """
+    profiler = current_app.extensions["profiler"]
+    if not profiler.is_admin(request.headers):
+        return jsonify({"error": "Not found"}), 404
+    
+    output_format = request.args.get("format", "pstats")
+    try:
+        if output_format == "collapsed":
+            return Response(profiler.collapsed(profile_id), content_type="text/plain; charset=utf-8")
+        return Response(profiler.pstats_bytes(profile_id), content_type="application/octet-stream", headers={
+            "Content-Disposition": f"attachment; filename={profile_id}.pstats"
+        })
+    except KeyError:
+        return jsonify({"error": "Profile not found", "id": profile_id}), 404
+
+
 # --- Smart Chef Integration ---
-import google.generativeai as genai
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Configure Gemini
-# Ideally, this should be an environment variable.
-# For now, we'll check for the env var, and if missing, log a warning.
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    logger.warning("GEMINI_API_KEY not found in environment variables. Smart Chef features will fail.")
-
-@app.route("/api/recipes", methods=["POST"])
+def get_genai():
+    """
+    The configured Gemini module (see smart_chef.get_genai), or None if no key
+    is configured. Prefers the app's GEMINI_API_KEY over the environment.
+    """
+    return smart_chef.get_genai(current_app.config.get("GEMINI_API_KEY"))
+
+@api.route("/api/recipes", methods=["POST"])
 def api_recipes():
     """
     POST /api/recipes
     Generates recipes based on the provided list of ingredients (from the basket).
     """
-    if not GEMINI_API_KEY:
+    genai = get_genai()
+    if genai is None:
         return jsonify({
             "error": "Configuration Error",
             "message": "Smart Chef is not configured (missing API Key)."
         }), 503
 
-    body = request.get_json(force=True) or {}
-    items = body.get("items", [])
-    
-    if not items or len(items) == 0:
-        return jsonify({
-            "error": "No items provided",
-            "message": "Please provide a list of ingredients."
-        }), 400
-
-    # Extract just the product names for the prompt
-    # Handle both string list and object list (if full basket items are sent)
-    ingredient_names = []
-    for item in items:
-        if isinstance(item, str):
-            ingredient_names.append(item)
-        elif isinstance(item, dict) and "product_name" in item:
-            ingredient_names.append(item["product_name"])
-    
-    ingredients_str = ", ".join(ingredient_names[:20]) # Limit to top 20 to avoid huge prompts
+    try:
+        ingredient_names = parse_recipe_items(request.get_json(force=True))
+    except RequestError as e:
+        return jsonify(e.payload), e.status
 
     try:
-        # Switching to gemini-flash-latest as it is explicitly available for this key
-        model = genai.GenerativeModel('gemini-flash-latest')
-        
-        prompt = f"""
-        You are a creative chef helping a budget-conscious user.
-        Create 3 simple, healthy, and delicious recipes using a subset of these ingredients: {ingredients_str}.
-        You can assume they have basic pantry staples (oil, salt, pepper, water).
-        
-        Format the output strictly as a JSON list of objects with these keys:
-        - name: Recipe Name
-        - time: Preparation time (e.g., "30 mins")
-        - difficulty: "Easy", "Medium", or "Hard"
-        - ingredients: List of strings (ingredients used)
-        - instructions: List of strings (step-by-step instructions)
-        - calories: Approximate calories per serving (number)
-        
-        Do not include markdown formatting (like ```json). Just return the raw JSON string.
-        """
-        
-        response = model.generate_content(prompt)
-        
-        # Clean up response if it contains markdown code blocks
-        text = response.text.strip()
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-            
-        import json
-        recipes = json.loads(text)
-        
+        recipes = smart_chef.generate_recipes(genai, ingredient_names)
         return jsonify({"recipes": recipes})
         
     except Exception as e:
@@ -341,16 +332,67 @@ def api_recipes():
         }), 500
 
 
-@app.route("/", methods=["GET"])
+@api.route("/", methods=["GET"])
 def root():
     return jsonify(
         {
             "status": "NutriBudget backend running",
-            "endpoints": ["/health", "/api/foods", "/api/plan", "/api/stats", "/api/debug-products"],
+            "endpoints": ["/health", "/ready", "/metrics", "/api/foods", "/api/foods/<id>/substitutes", "/api/plan", "/api/plan/sweep", "/api/plan/adjust", "/api/stats", "/api/debug-products"],
         }
     )
 
 
+def create_app(config=None):
+    """
+    Application factory.
+    
+    Builds an immutable CatalogSnapshot from config["DATA_PATH"] and attaches
+    it to the app, so several catalogs or test configurations can live in one
+    process. With gunicorn --preload the snapshot is built once in the master
+    and shared copy-on-write by the forked workers.
+    
+    Args:
+        config: Overrides for default_config() (DATA_PATH, WARM_MODELS,
+                GEMINI_API_KEY, CORS_ORIGINS, PLAN_EXECUTOR, PLAN_WORKERS,
+                PLAN_MAX_PENDING, PROFILE_TOKEN, PROFILE_ALLOWLIST, PROFILE_DIR)
+                and any Flask settings.
+    """
+    configure_logging()
+    
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    
+    CORS(app, origins=app.config["CORS_ORIGINS"], supports_credentials=True)
+    
+    # Load dataset once at startup
+    catalog = CatalogSnapshot.from_csv(app.config["DATA_PATH"])
+    app.extensions["catalog"] = catalog
+    
+    # Warm ML models and precompute catalog scores so the first plan request
+    # after a cold start doesn't absorb the load
+    start_warmup(catalog, app.config["WARM_MODELS"])
+    
+    app.extensions["profiler"] = RequestProfiler(
+        token=app.config["PROFILE_TOKEN"],
+        allowlist=app.config["PROFILE_ALLOWLIST"],
+        directory=app.config["PROFILE_DIR"],
+    )
+    app.extensions["plan_executor"] = PlanExecutor(
+        catalog,
+        mode=app.config["PLAN_EXECUTOR"] or "inline",
+        workers=app.config["PLAN_WORKERS"],
+        max_pending=app.config["PLAN_MAX_PENDING"],
+    )
+    
+    app.register_blueprint(api)
+    return app
+
+
+# Module-level app for `gunicorn app:app` and `python app.py`
+app = create_app()
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,359 @@
+"""
+ASGI entry point for the NutriBudget API (Starlette)
+
+Serves the same routes, validation and responses as the Flask app in app.py,
+reusing planner() and the CatalogSnapshot, but on an event loop:
+- /api/recipes awaits the Gemini call, so a slow LLM response holds a
+  coroutine instead of a whole worker process
+- /api/plan is CPU-bound pandas/sklearn work, so it runs on a PlanExecutor
+  (thread or process pool, see plan_executor.py) and the loop keeps
+  accepting requests meanwhile
+- /api/foods, /api/stats and the other sync handlers run in Starlette's
+  threadpool
+
+Run:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 10000 --workers 2
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import re
+import time
+from functools import partial
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+import metrics
+import ml_utils
+from log_config import configure_logging
+import smart_chef
+from catalog import CatalogSnapshot, search_products, start_warmup
+from plan_executor import PlanExecutor, PlannerBusy
+from profiling import RequestProfiler
+from settings import default_config
+from substitutes import find_substitutes
+from validation import (RequestError, check_catalog_params, parse_plan_request, parse_adjust_request,
+                        parse_recipe_items, parse_sweep_request)
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSON(JSONResponse):
+    """JSON response encoded like Flask's jsonify (sorted keys, NumPy scalars allowed)."""
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, sort_keys=True, default=_json_default).encode("utf-8")
+
+
+async def read_json(request: Request):
+    """Request body as JSON regardless of Content-Type (like get_json(force=True))."""
+    body = await request.body()
+    return json.loads(body) if body else None
+
+
+def get_catalog(request: Request) -> CatalogSnapshot:
+    return request.app.state.catalog
+
+
+def health(request):
+    return JSON({"status": "ok"})
+
+
+def ready(request):
+    """Readiness check; same semantics as the Flask /ready."""
+    catalog = get_catalog(request)
+    models_settled = catalog.scores_ready or request.app.state.config["WARM_MODELS"] == "off"
+    is_ready = len(catalog) > 0 and models_settled
+    return JSON({
+        "status": "ready" if is_ready else "warming",
+        "products": len(catalog),
+        "models": ml_utils.model_status()
+    }, status_code=200 if is_ready else 503)
+
+
+def metrics_endpoint(request):
+    return Response(metrics.REGISTRY.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+class MetricsMiddleware:
+    """Records per-endpoint request counts and latency (route template, not raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            metrics.observe_request(endpoint, scope["method"], status, time.perf_counter() - started)
+
+
+def debug_products(request):
+    return JSON(get_catalog(request).df.head(20).to_dict(orient="records"))
+
+
+def profile_id_for(request):
+    """Profile id if this request should be profiled (see profiling.py), else None."""
+    profiler = request.app.state.profiler
+    if profiler.enabled and profiler.wants(request.url.path, request.headers):
+        return profiler.request_id(request.headers)
+    return None
+
+
+def with_profile_header(response, profile_id):
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def api_foods(request):
+    try:
+        catalog = get_catalog(request)
+        profile_id = profile_id_for(request)
+        if profile_id:
+            results = request.app.state.profiler.run(
+                profile_id, search_products, catalog.df, request.query_params,
+                catalog.brand_product_ids, catalog.brands)
+        else:
+            results = search_products(catalog.df, request.query_params, catalog.brand_product_ids, catalog.brands)
+        return with_profile_header(JSON({"count": len(results), "items": results}), profile_id)
+    except Exception as e:
+        logger.error(f"Error in /api/foods: {e}")
+        return JSON({"error": str(e)}, status_code=400)
+
+
+def api_substitutes(request):
+    product_id = request.path_params["product_id"]
+    try:
+        return JSON(find_substitutes(get_catalog(request), product_id, request.query_params))
+    except KeyError:
+        return JSON({"error": "Product not found", "product_id": product_id}, status_code=404)
+    except Exception as e:
+        logger.error(f"Error in /api/foods/{product_id}/substitutes: {e}")
+        return JSON({"error": str(e)}, status_code=400)
+
+
+def api_stats(request):
+    return JSON(get_catalog(request).stats)
+
+
+async def api_plan(request):
+    try:
+        params = check_catalog_params(parse_plan_request(await read_json(request)), get_catalog(request))
+    except RequestError as e:
+        return JSON(e.payload, status_code=e.status)
+    except ValueError:
+        return JSON({"error": "Invalid JSON body"}, status_code=400)
+
+    return await planner_response(request, params)
+
+
+async def api_plan_sweep(request):
+    try:
+        params = check_catalog_params(parse_sweep_request(await read_json(request)), get_catalog(request))
+    except RequestError as e:
+        return JSON(e.payload, status_code=e.status)
+    except ValueError:
+        return JSON({"error": "Invalid JSON body"}, status_code=400)
+
+    return await planner_response(request, params, task="sweep")
+
+
+async def api_plan_adjust(request):
+    try:
+        params = check_catalog_params(parse_adjust_request(await read_json(request)), get_catalog(request))
+    except RequestError as e:
+        return JSON(e.payload, status_code=e.status)
+    except ValueError:
+        return JSON({"error": "Invalid JSON body"}, status_code=400)
+
+    return await planner_response(request, params, task="adjust")
+
+
+async def planner_response(request, params, task="plan"):
+    try:
+        executor = request.app.state.plan_executor
+        profile_id = profile_id_for(request)
+        if profile_id:
+            # Profiled plans run inline on a spare thread so cProfile sees the planner
+            job = partial(request.app.state.profiler.run, profile_id, executor.run, params, inline=True, task=task)
+            result = await asyncio.get_running_loop().run_in_executor(None, job)
+        else:
+            result = await asyncio.wrap_future(executor.submit(params, task=task))
+        serialize_started = time.perf_counter()
+        response = JSON(result)
+        metrics.plan_stage_duration.observe(time.perf_counter() - serialize_started, stage="serialize")
+        return with_profile_header(response, profile_id)
+    except PlannerBusy as e:
+        logger.warning(f"Plan rejected, queue full: {e}")
+        return JSON({
+            "error": "Too many requests",
+            "message": "The planner is busy. Please retry in a moment."
+        }, status_code=429, headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error in planner: {e}")
+        return JSON({
+            "error": "Failed to generate plan",
+            "message": "An error occurred while generating your meal plan. Please try again.",
+            "details": str(e) if request.app.debug else None
+        }, status_code=500)
+
+
+def list_profiles(request):
+    profiler = request.app.state.profiler
+    if not profiler.is_admin(request.headers):
+        return JSON({"error": "Not found"}, status_code=404)
+    return JSON({"profiles": profiler.list()})
+
+
+def download_profile(request):
+    """Same as the Flask /admin/profiles/<id>: ?format=pstats (default) or collapsed."""
+    profiler = request.app.state.profiler
+    if not profiler.is_admin(request.headers):
+        return JSON({"error": "Not found"}, status_code=404)
+
+    profile_id = request.path_params["profile_id"]
+    try:
+        if request.query_params.get("format", "pstats") == "collapsed":
+            return PlainTextResponse(profiler.collapsed(profile_id))
+        return Response(profiler.pstats_bytes(profile_id), media_type="application/octet-stream", headers={
+            "Content-Disposition": f"attachment; filename={profile_id}.pstats"
+        })
+    except KeyError:
+        return JSON({"error": "Profile not found", "id": profile_id}, status_code=404)
+
+
+async def api_recipes(request):
+    genai = smart_chef.get_genai(request.app.state.config.get("GEMINI_API_KEY"))
+    if genai is None:
+        return JSON({
+            "error": "Configuration Error",
+            "message": "Smart Chef is not configured (missing API Key)."
+        }, status_code=503)
+
+    try:
+        ingredient_names = parse_recipe_items(await read_json(request))
+    except RequestError as e:
+        return JSON(e.payload, status_code=e.status)
+    except ValueError:
+        return JSON({"error": "Invalid JSON body"}, status_code=400)
+
+    try:
+        recipes = await smart_chef.generate_recipes_async(genai, ingredient_names)
+        return JSON({"recipes": recipes})
+    except Exception as e:
+        logger.error(f"Smart Chef Error: {e}", exc_info=True)
+        return JSON({
+            "error": "Generation Failed",
+            "message": f"Chef is busy! Error: {str(e)}",
+            "details": str(e)
+        }, status_code=500)
+
+
+def root(request):
+    return JSON({
+        "status": "NutriBudget backend running",
+        "endpoints": ["/health", "/ready", "/metrics", "/api/foods", "/api/foods/<id>/substitutes", "/api/plan", "/api/plan/sweep", "/api/plan/adjust", "/api/stats", "/api/debug-products"],
+    })
+
+
+routes = [
+    Route("/", root),
+    Route("/health", health),
+    Route("/ready", ready),
+    Route("/metrics", metrics_endpoint),
+    Route("/api/debug-products", debug_products),
+    Route("/api/foods", api_foods),
+    Route("/api/foods/{product_id:int}/substitutes", api_substitutes),
+    Route("/api/stats", api_stats),
+    Route("/api/plan", api_plan, methods=["POST"]),
+    Route("/api/plan/sweep", api_plan_sweep, methods=["POST"]),
+    Route("/api/plan/adjust", api_plan_adjust, methods=["POST"]),
+    Route("/api/recipes", api_recipes, methods=["POST"]),
+    Route("/admin/profiles", list_profiles),
+    Route("/admin/profiles/{profile_id}", download_profile),
+]
+
+
+def cors_middleware(origins):
+    """CORSMiddleware for CORS_ORIGINS; wildcard entries become an origin regex."""
+    exact = [origin for origin in origins if "*" not in origin]
+    patterns = [re.escape(origin).replace(r"\*", "[^/]+") for origin in origins if "*" in origin]
+    return Middleware(
+        CORSMiddleware,
+        allow_origins=exact,
+        allow_origin_regex="|".join(patterns) or None,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+
+def create_asgi_app(config=None):
+    """
+    ASGI application factory, the counterpart of app.create_app().
+
+    Args:
+        config: Overrides for settings.default_config() (DATA_PATH, WARM_MODELS,
+                GEMINI_API_KEY, CORS_ORIGINS, PLAN_EXECUTOR, PLAN_WORKERS,
+                PLAN_MAX_PENDING, PROFILE_TOKEN, PROFILE_ALLOWLIST, PROFILE_DIR)
+                plus DEBUG.
+    """
+    configure_logging()
+    settings = {**default_config(), **(config or {})}
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # Load dataset once per worker, then warm models and catalog scores
+        app.state.config = settings
+        app.state.catalog = CatalogSnapshot.from_csv(settings["DATA_PATH"])
+        app.state.profiler = RequestProfiler(token=settings["PROFILE_TOKEN"], allowlist=settings["PROFILE_ALLOWLIST"],
+                                             directory=settings["PROFILE_DIR"])
+        start_warmup(app.state.catalog, settings["WARM_MODELS"])
+        # Inline planning would block the event loop, so the ASGI app always offloads
+        mode = settings["PLAN_EXECUTOR"] if settings["PLAN_EXECUTOR"] in ("thread", "process") else "thread"
+        app.state.plan_executor = PlanExecutor(app.state.catalog, mode=mode, workers=settings["PLAN_WORKERS"],
+                                               max_pending=settings["PLAN_MAX_PENDING"])
+        app.state.plan_executor.start()
+        yield
+        app.state.plan_executor.shutdown()
+
+    return Starlette(
+        debug=settings.get("DEBUG", False),
+        routes=routes,
+        middleware=[Middleware(MetricsMiddleware), cors_middleware(settings["CORS_ORIGINS"])],
+        lifespan=lifespan,
+    )
+
+
+# Module-level app for `uvicorn asgi_app:app`
+app = create_asgi_app()
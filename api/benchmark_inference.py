@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the ML inference backends.
+
+Times predict() per 1k rows for the quality classifier and value predictor
+with the "sklearn" and "compiled" backends at several batch sizes, and checks
+that both backends produce the same predictions.
+
+Usage:
+    python benchmark_inference.py --rows 10 100 1000 5000 --repeats 20
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+import ml_utils
+from forest_inference import CROSSOVER_ROWS
+from planner import load_dataset
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def best_ms(fn, repeats):
+    fn()  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ML inference backends.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    catalog = load_dataset("data/foods_enhanced.csv")
+    sklearn_models = ml_utils.load_models("sklearn")
+    compiled_models = ml_utils.load_models("compiled")
+
+    print(f"\nLatency per 1k rows, best of {args.repeats} "
+          f"(compiled hands batches > {CROSSOVER_ROWS} rows back to sklearn):")
+    print(f"{'model':<20}{'rows':>7}{'sklearn ms':>12}{'compiled ms':>13}{'speedup':>10}")
+
+    for rows in args.rows:
+        df = catalog.iloc[np.resize(np.arange(len(catalog)), rows)].reset_index(drop=True)
+        X = ml_utils.prepare_features(df)
+        per_1k = 1000 / rows
+
+        for name in ["quality_classifier", "value_predictor"]:
+            a = best_ms(lambda: sklearn_models[name].predict(X), args.repeats) * per_1k
+            b = best_ms(lambda: compiled_models[name].predict(X), args.repeats) * per_1k
+            print(f"{name:<20}{rows:>7}{a:>12.2f}{b:>13.2f}{a / b:>9.1f}x")
+
+        # Both backends must agree exactly on the flattened path
+        forest = compiled_models["quality_classifier"]
+        X_small = np.asarray(X, dtype=np.float32).astype(np.float64)[:CROSSOVER_ROWS]
+        labels = forest.classes_.take(np.argmax(forest._mean_leaf_values(X_small), axis=1))
+        assert (labels == sklearn_models["quality_classifier"].predict(X[:CROSSOVER_ROWS])).all()
+        values = compiled_models["value_predictor"]._mean_leaf_values(X_small)[:, 0]
+        assert np.allclose(values, sklearn_models["value_predictor"].predict(X[:CROSSOVER_ROWS]))
+
+    print("\nFlattened predictions match sklearn on every batch.")
+
+
+if __name__ == "__main__":
+    main()
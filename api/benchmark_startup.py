@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: process start -> first /api/plan response.
+
+Each scenario runs in a fresh Python process so imports and model loading are
+truly cold, and drives the app through Flask's test client (no server needed).
+
+Scenarios:
+- lazy:        NUTRIBUDGET_WARM_MODELS=0, models load inside the first request
+- warm-race:   background warm-up, first request sent immediately
+- warm-ready:  background warm-up, first request sent once /ready returns 200
+
+Usage:
+    python benchmark_startup.py --runs 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PLAN_BODY = {"budget": 50, "people": 2, "dietType": "veg", "goal": "balanced"}
+
+SCENARIOS = {
+    "lazy": {"NUTRIBUDGET_WARM_MODELS": "0"},
+    "warm-race": {"NUTRIBUDGET_WARM_MODELS": "1"},
+    "warm-ready": {"NUTRIBUDGET_WARM_MODELS": "1"},
+}
+
+
+def run_child(scenario):
+    """Runs inside the fresh process; prints one JSON line of timings."""
+    start = time.perf_counter()
+    import app
+
+    client = app.app.test_client()
+    imported = time.perf_counter()
+
+    if scenario == "warm-ready":
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.01)
+    ready = time.perf_counter()
+
+    response = client.post("/api/plan", json=PLAN_BODY)
+    assert response.status_code == 200, response.data
+    done = time.perf_counter()
+
+    print(json.dumps({
+        "import_s": imported - start,
+        "ready_s": ready - start,
+        "first_plan_s": done - ready,
+        "total_s": done - start,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start to first plan.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'scenario':<12}{'import s':>10}{'ready s':>10}{'1st plan s':>12}{'total s':>10}")
+    for scenario, env in SCENARIOS.items():
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-W", "ignore", __file__, "--child", scenario],
+                cwd=here, env={**os.environ, **env}, capture_output=True, text=True, check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        # Median run of each scenario
+        median = sorted(runs, key=lambda r: r["total_s"])[len(runs) // 2]
+        print(f"{scenario:<12}{median['import_s']:>10.2f}{median['ready_s']:>10.2f}"
+              f"{median['first_plan_s']:>12.2f}{median['total_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Benchmarks: catalog loading and ML scoring."""
+
+import ml_utils
+from catalog import CatalogSnapshot
+from planner import load_dataset
+
+import synthetic
+
+
+def test_load_dataset_real(benchmark):
+    df = benchmark(load_dataset, synthetic.REAL_CATALOG_PATH)
+    assert len(df) > 0
+
+
+def test_load_dataset_synthetic(benchmark, synthetic_csv, catalog_size):
+    df = benchmark.pedantic(load_dataset, args=(synthetic_csv,), rounds=3, iterations=1)
+    assert len(df) == catalog_size
+
+
+def test_catalog_snapshot_synthetic(benchmark, synthetic_df):
+    # Startup cost per worker: product index, score arrays and /api/stats
+    snapshot = benchmark.pedantic(CatalogSnapshot, args=(synthetic_df,), rounds=3, iterations=1)
+    assert len(snapshot) == len(synthetic_df)
+
+
+def test_calculate_ml_score_real(benchmark, models):
+    df = synthetic.real_catalog().copy()
+    scores = benchmark(ml_utils.calculate_ml_score, df)
+    assert scores is not None and len(scores) == len(df)
+
+
+def test_calculate_ml_score_synthetic(benchmark, models, synthetic_df):
+    df = synthetic_df.copy()
+    scores = benchmark.pedantic(ml_utils.calculate_ml_score, args=(df,), rounds=3, iterations=1)
+    assert len(scores) == len(df)
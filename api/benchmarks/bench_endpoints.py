@@ -0,0 +1,65 @@
+"""Benchmarks: /api/foods, /api/stats and /api/plan through Flask's test client."""
+
+import pytest
+
+FOODS_QUERIES = {
+    "default": "",
+    "veg": "?veg_nonveg=veg",
+    "price": "?max_price_per_100g=1.5",
+    "cluster": "?cluster=2",
+    "store": "?store=walmart",
+    "combined": "?veg_nonveg=veg&max_price_per_100g=2&store=loblaws&limit=50",
+    "large_limit": "?limit=1000",
+    "by_product": "?group_by=product",
+    "exclude": "?exclude=gluten,dairy",
+}
+
+
+@pytest.mark.parametrize("query", list(FOODS_QUERIES.values()), ids=list(FOODS_QUERIES))
+def test_api_foods(benchmark, client, query):
+    response = benchmark(client.get, "/api/foods" + query)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("query", ["", "?veg_nonveg=veg&max_price_per_100g=2&store=loblaws&limit=50"],
+                         ids=["default", "combined"])
+def test_api_foods_synthetic(benchmark, synthetic_client, query):
+    response = benchmark(synthetic_client.get, "/api/foods" + query)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("query", ["", "?k=20&diet=veg&max_price=5&same_category=true"], ids=["default", "filtered"])
+def test_api_substitutes(benchmark, client, query):
+    response = benchmark(client.get, "/api/foods/10/substitutes" + query)
+    assert response.status_code == 200
+
+
+def test_api_stats(benchmark, client):
+    response = benchmark(client.get, "/api/stats")
+    assert response.status_code == 200
+
+
+def test_api_plan(benchmark, client):
+    body = {"budget": 100, "people": 2, "dietType": "veg", "goal": "balanced"}
+    response = benchmark(client.post, "/api/plan", json=body)
+    assert response.status_code == 200
+
+
+def test_api_plan_sweep(benchmark, client):
+    body = {"budgetRange": {"min": 20, "max": 200, "step": 10}, "people": 2, "dietType": "veg", "goal": "balanced"}
+    response = benchmark(client.post, "/api/plan/sweep", json=body)
+    assert response.status_code == 200
+
+
+def test_api_plan_sweep_max_stores(benchmark, client):
+    body = {"budgetRange": {"min": 20, "max": 265, "step": 5}, "people": 2, "dietType": "nonveg",
+            "goal": "balanced", "maxStores": 3}
+    response = benchmark(client.post, "/api/plan/sweep", json=body)
+    assert len(response.get_json()["curve"]) == 50
+
+
+def test_api_plan_adjust(benchmark, client):
+    plan = client.post("/api/plan", json={"budget": 100, "people": 2, "dietType": "veg", "goal": "balanced"}).get_json()
+    body = {"planToken": plan["planToken"], "exclude": [plan["items"][0]["product_id"]], "budget": 110}
+    response = benchmark(client.post, "/api/plan/adjust", json=body)
+    assert response.status_code == 200
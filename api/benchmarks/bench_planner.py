@@ -0,0 +1,88 @@
+"""Benchmarks: planner() across the diet x goal x budget matrix."""
+
+import pytest
+
+from planner import planner
+
+DIETS = ["veg", "nonveg", "vegan"]
+GOALS = ["balanced", "high_protein", "low_sugar"]
+BUDGETS = [30, 100, 300]
+
+
+@pytest.mark.parametrize("budget", BUDGETS)
+@pytest.mark.parametrize("goal", GOALS)
+@pytest.mark.parametrize("diet", DIETS)
+def test_planner_matrix(benchmark, real_snapshot, diet, goal, budget):
+    # Serving path: catalog ML scores precomputed once per snapshot
+    result = benchmark(planner, budget, 2, diet, goal, real_snapshot.df, ml_scores=real_snapshot.ml_scores(),
+                       canonical_ids=real_snapshot.canonical_ids)
+    assert result["totals"]["total_spent"] <= budget
+
+
+def test_planner_unscored(benchmark, models, real_snapshot):
+    # Models and the canonical product index run inside the call (scripts, or a
+    # snapshot that isn't warm yet)
+    result = benchmark(planner, 100, 2, "veg", "balanced", real_snapshot.df)
+    assert result["items"]
+
+
+def test_planner_fallback(benchmark, real_snapshot):
+    result = benchmark(planner, 100, 2, "veg", "balanced", real_snapshot.df, use_ml=False,
+                       canonical_ids=real_snapshot.canonical_ids)
+    assert result["items"]
+
+
+def test_planner_synthetic(benchmark, models, synthetic_df):
+    from catalog import CatalogSnapshot
+    snapshot = CatalogSnapshot(synthetic_df)
+    scores = snapshot.ml_scores()
+    result = benchmark.pedantic(planner, args=(100, 2, "veg", "balanced", synthetic_df),
+                                kwargs={"ml_scores": scores, "canonical_ids": snapshot.canonical_ids},
+                                rounds=5, iterations=1)
+    assert result["items"]
+
+
+@pytest.mark.parametrize("max_stores", [1, 2, 3])
+def test_planner_max_stores(benchmark, real_snapshot, max_stores):
+    result = benchmark(planner, 100, 2, "nonveg", "balanced", real_snapshot.df,
+                       ml_scores=real_snapshot.ml_scores(), canonical_ids=real_snapshot.canonical_ids,
+                       max_stores=max_stores)
+    assert len(result["storeBreakdown"]) <= max_stores
+
+
+def test_planner_nutrient_limits(benchmark, real_snapshot):
+    household = [{"age": 40, "sex": "female"}, {"age": 9}]
+    result = benchmark(planner, 100, 2, "nonveg", "balanced", real_snapshot.df,
+                       ml_scores=real_snapshot.ml_scores(), canonical_ids=real_snapshot.canonical_ids,
+                       household=household, nutrient_limits=["sodium", "sugar"])
+    assert result["totals"]["sodium"] <= result["coverage"]["sodium"]["target"]
+
+
+@pytest.mark.parametrize("weeks", [4, 8])
+def test_planner_weeks(benchmark, real_snapshot, weeks):
+    result = benchmark(planner, 60, 2, "nonveg", "balanced", real_snapshot.df,
+                       ml_scores=real_snapshot.ml_scores(), canonical_ids=real_snapshot.canonical_ids,
+                       weeks=weeks)
+    assert len(result["schedule"]) == weeks
+    baskets = [frozenset(item["product_id"] for item in week["items"]) for week in result["schedule"]]
+    assert len(set(baskets)) == weeks
+
+
+def test_planner_alternatives(benchmark, real_snapshot):
+    result = benchmark(planner, 100, 2, "nonveg", "balanced", real_snapshot.df,
+                       ml_scores=real_snapshot.ml_scores(), canonical_ids=real_snapshot.canonical_ids,
+                       alternatives=5)
+    assert "alternatives" in result
+
+
+def test_planner_seeded_variety(benchmark, real_snapshot):
+    result = benchmark(planner, 100, 2, "nonveg", "balanced", real_snapshot.df,
+                       ml_scores=real_snapshot.ml_scores(), canonical_ids=real_snapshot.canonical_ids, seed=7)
+    assert result["inputs"]["seed"] == 7
+
+
+def test_planner_exclusions(benchmark, real_snapshot):
+    result = benchmark(planner, 100, 2, "nonveg", "balanced", real_snapshot.df,
+                       ml_scores=real_snapshot.ml_scores(), canonical_ids=real_snapshot.canonical_ids,
+                       exclusions=("dairy", "gluten"))
+    assert result["inputs"]["exclude"] == ["dairy", "gluten"]
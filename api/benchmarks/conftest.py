@@ -0,0 +1,76 @@
+"""
+Fixtures for the benchmark suite (see "Benchmarks" in api/README.md).
+
+Synthetic catalog sizes default to 5k, 50k and 500k rows. Set
+NUTRIBUDGET_BENCH_SIZES (e.g. "5000,50000") to run a subset.
+"""
+
+import os
+import sys
+import warnings
+
+import pytest
+
+# Benchmarks import the API modules directly, as the app does
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+os.environ.setdefault("NUTRIBUDGET_WARM_MODELS", "0")
+
+warnings.filterwarnings("ignore", category=UserWarning)  # sklearn feature-name warnings
+
+import ml_utils  # noqa: E402
+from catalog import CatalogSnapshot  # noqa: E402
+
+import synthetic  # noqa: E402
+
+SIZES = [int(size) for size in os.environ.get("NUTRIBUDGET_BENCH_SIZES", "5000,50000,500000").split(",")]
+
+
+def pytest_generate_tests(metafunc):
+    if "catalog_size" in metafunc.fixturenames:
+        metafunc.parametrize("catalog_size", SIZES, ids=[f"{size // 1000}k" for size in SIZES], scope="session")
+
+
+@pytest.fixture(scope="session")
+def models():
+    loaded = ml_utils.load_models()
+    if loaded is None:
+        pytest.skip("ML models not trained (run train_models.py)")
+    return loaded
+
+
+@pytest.fixture(scope="session")
+def real_snapshot(models):
+    """The shipped catalog with ML scores precomputed, as served in production."""
+    snapshot = CatalogSnapshot.from_csv(synthetic.REAL_CATALOG_PATH)
+    snapshot.warm()
+    return snapshot
+
+
+@pytest.fixture(scope="session")
+def catalog_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("catalogs"))
+
+
+@pytest.fixture(scope="session")
+def synthetic_df(catalog_size):
+    return synthetic.make_catalog(catalog_size)
+
+
+@pytest.fixture(scope="session")
+def synthetic_csv(catalog_size, catalog_dir):
+    return synthetic.write_catalog(catalog_size, catalog_dir)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Flask test client on the shipped catalog (no server needed)."""
+    from app import create_app
+    return create_app({"DATA_PATH": synthetic.REAL_CATALOG_PATH, "WARM_MODELS": "sync"}).test_client()
+
+
+@pytest.fixture(scope="session")
+def synthetic_client(synthetic_csv):
+    """Flask test client on a synthetic catalog."""
+    from app import create_app
+    return create_app({"DATA_PATH": synthetic_csv, "WARM_MODELS": "off"}).test_client()
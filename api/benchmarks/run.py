@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite against the stored baselines.
+
+Baselines live in benchmarks/baselines/<machine id>/ (pytest-benchmark
+storage, e.g. Linux-CPython-3.11-64bit), since timings are only comparable
+on the same kind of machine.
+
+Usage:
+    python benchmarks/run.py                      # compare with the latest baseline; fail on regression
+    python benchmarks/run.py --max-regression 30  # allowed slowdown of the best (min) time, in percent (default 25)
+    python benchmarks/run.py --save               # record a new baseline for this machine
+    python benchmarks/run.py -- -k planner        # extra pytest arguments after --
+"""
+
+import argparse
+import os
+import sys
+
+import pytest
+from pytest_benchmark.utils import get_machine_id
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_DIR = os.path.join(BENCH_DIR, "baselines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run benchmarks and compare with the stored baseline.")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--max-regression", type=int, default=25,
+                        help="fail if any benchmark's best time is this many percent slower than the baseline")
+    parser.add_argument("pytest_args", nargs="*", help="extra pytest arguments (after --)")
+    args = parser.parse_args()
+
+    pytest_args = [BENCH_DIR, f"--benchmark-storage=file://{BASELINES_DIR}"]
+
+    if args.save:
+        pytest_args.append("--benchmark-save=baseline")
+    else:
+        machine_dir = os.path.join(BASELINES_DIR, get_machine_id())
+        if not os.path.isdir(machine_dir) or not os.listdir(machine_dir):
+            print(f"No baseline for {get_machine_id()} in {BASELINES_DIR}; record one with --save")
+            return 2
+        pytest_args += ["--benchmark-compare", f"--benchmark-compare-fail=min:{args.max_regression}%"]
+
+    return pytest.main(pytest_args + args.pytest_args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Synthetic product catalogs for the benchmark suite.
+
+Rows are resampled from the real catalog and jittered, so column types, value
+ranges and category/cluster mixes stay realistic at any size.
+"""
+
+import os
+
+import numpy as np
+
+from planner import load_dataset
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_CATALOG_PATH = os.path.join(API_DIR, "data", "foods_enhanced.csv")
+
+PRICE_COLUMNS = ["price_per_gram", "price_per_100g", "price_per_item"]
+NUTRIENT_COLUMNS = ["calories", "protein", "carbs", "fat", "sugar", "fiber", "sodium", "saturated_fat"]
+
+_real_catalog = None
+
+
+def real_catalog():
+    """The shipped catalog (loaded once)."""
+    global _real_catalog
+    if _real_catalog is None:
+        _real_catalog = load_dataset(REAL_CATALOG_PATH)
+    return _real_catalog
+
+
+def make_catalog(n_rows: int, seed: int = 0):
+    """
+    Build a synthetic catalog with n_rows products.
+
+    Args:
+        n_rows: Number of products
+        seed: RNG seed (the same seed always gives the same catalog)
+
+    Returns:
+        DataFrame with the same columns as data/foods_enhanced.csv
+    """
+    base = real_catalog()
+    rng = np.random.default_rng(seed)
+
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+
+    # One price factor per row keeps per-gram, per-100g and per-item prices consistent
+    price_factor = rng.lognormal(0.0, 0.15, n_rows)
+    for column in PRICE_COLUMNS:
+        df[column] = (df[column] * price_factor).round(4)
+    for column in NUTRIENT_COLUMNS:
+        df[column] = (df[column] * rng.lognormal(0.0, 0.05, n_rows)).round(2)
+
+    df["product_id"] = np.arange(n_rows)
+    return df
+
+
+def write_catalog(n_rows: int, directory: str, seed: int = 0) -> str:
+    """Write make_catalog(n_rows) as CSV (for create_app) and return the path."""
+    path = os.path.join(directory, f"catalog_{n_rows}.csv")
+    if not os.path.exists(path):
+        make_catalog(n_rows, seed).to_csv(path, index=False)
+    return path
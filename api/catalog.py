@@ -0,0 +1,323 @@
+"""
+Catalog snapshot for the NutriBudget API
+
+A CatalogSnapshot is built once per app (see app.create_app) and never
+modified afterwards. It holds the product DataFrame plus everything derived
+from it that requests would otherwise recompute: the product_id index, score
+arrays, the /api/stats blob and (lazily) the ML score of every product and
+the substitutes index.
+
+Because nothing writes to it after startup, a snapshot built in the gunicorn
+master with --preload is shared copy-on-write by every forked worker.
+"""
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import ml_utils
+from allergens import excluded_rows, parse_exclusions, tag_bits, unknown_brands
+from planner import RankedCandidates, diet_group, load_dataset, rank_candidates
+from products import canonical_product_ids, group_by_product
+from substitutes import SubstituteIndex
+
+
+# Cached by ml_scores() while models can't be loaded (None means "not computed yet")
+_MODELS_UNAVAILABLE = object()
+
+# Rankings with exclusions kept per snapshot (least recently used go first)
+RANKED_EXCLUSION_CACHE_SIZE = 16
+
+# Live snapshots, so their locks can be replaced in forked children
+_snapshots = weakref.WeakSet()
+
+def _reset_locks_after_fork():
+    for snapshot in list(_snapshots):
+        object.__setattr__(snapshot, "_lazy_lock", threading.Lock())
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def compute_stats(df: pd.DataFrame) -> dict:
+    """
+    High-level statistics for charts (the /api/stats response).
+
+    Returns:
+    - Cluster distribution (count and avg price per cluster)
+    - Category distribution (count and avg price per category)
+    - Overall stats (total products, avg price, etc.)
+    """
+    stats = {}
+
+    # Overall stats
+    stats["total_products"] = len(df)
+    stats["avg_price_per_100g"] = round(df["price_per_100g"].mean(), 2)
+    stats["avg_calories"] = round(df["calories"].mean(), 1)
+    stats["avg_protein"] = round(df["protein"].mean(), 1)
+
+    # Cluster distribution
+    if "cluster" in df.columns:
+        cluster_stats = df.groupby("cluster").agg({
+            "product_id": "count",
+            "price_per_100g": "mean"
+        }).reset_index()
+        cluster_stats.columns = ["cluster", "count", "avg_price"]
+
+        # Add cluster labels if available
+        if "cluster_label" in df.columns:
+            labels = df.groupby("cluster")["cluster_label"].first()
+            cluster_stats["label"] = cluster_stats["cluster"].map(labels)
+
+        stats["cluster_distribution"] = cluster_stats.to_dict(orient="records")
+
+    # Category distribution
+    if "category" in df.columns:
+        category_stats = df.groupby("category").agg({
+            "product_id": "count",
+            "price_per_100g": "mean"
+        }).reset_index()
+        category_stats.columns = ["category", "count", "avg_price"]
+        category_stats = category_stats.sort_values("count", ascending=False).head(10)
+        stats["category_distribution"] = category_stats.to_dict(orient="records")
+
+    return stats
+
+
+def search_products(df: pd.DataFrame, args, canonical_ids: pd.Series = None, brands=None) -> list:
+    """
+    Filter products for GET /api/foods.
+
+    Args:
+        df: Catalog DataFrame (not modified)
+        args: Mapping of query params (Flask request.args or Starlette query_params):
+              veg_nonveg, max_price_per_100g, cluster, store, limit (default 100),
+              group_by ("product": one record per canonical product with its
+              min/max price across stores; limit counts products),
+              exclude (allergen/attribute tags or brand:<name>, repeated or
+              comma-separated; see allergens.py)
+        canonical_ids: canonical_product_ids(df, by_brand=True) for group_by,
+                       computed if omitted
+        brands: Lowercase brand names brand:<name> exclusions may use
+                (CatalogSnapshot.brands); not checked if omitted
+
+    Returns:
+        List of product records
+
+    Raises:
+        ValueError: if a numeric param can't be parsed, group_by is unknown
+                    or an exclusion isn't a known tag or brand
+    """
+    group_by = args.get("group_by")
+    if group_by not in (None, "product"):
+        raise ValueError(f"Unsupported group_by {group_by!r}; expected 'product'")
+
+    filtered = df
+
+    # Apply filters
+    if "veg_nonveg" in args:
+        veg_type = args.get("veg_nonveg").lower()
+        filtered = filtered[filtered["veg_nonveg"].astype(str).str.lower().str.contains(veg_type)]
+
+    if "max_price_per_100g" in args:
+        max_price = float(args.get("max_price_per_100g"))
+        filtered = filtered[filtered["price_per_100g"] <= max_price]
+
+    if "cluster" in args:
+        cluster_id = int(args.get("cluster"))
+        filtered = filtered[filtered["cluster"] == cluster_id]
+
+    if "store" in args:
+        store_name = args.get("store").lower()
+        filtered = filtered[filtered["store"].astype(str).str.lower().str.contains(store_name)]
+
+    if "exclude" in args:
+        values = args.getlist("exclude") if hasattr(args, "getlist") else [args.get("exclude")]
+        exclusions = parse_exclusions(values)
+        unknown = unknown_brands(exclusions, brands) if brands is not None else []
+        if unknown:
+            raise ValueError(f"Unknown brand {unknown[0]!r} in exclude")
+        if exclusions:
+            filtered = filtered[~excluded_rows(filtered, exclusions)]
+
+    # Limit results
+    limit = int(args.get("limit", 100))
+    if group_by == "product":
+        if canonical_ids is None:
+            canonical_ids = canonical_product_ids(df, by_brand=True)
+        return group_by_product(filtered, canonical_ids, limit)
+    filtered = filtered.head(limit)
+
+    return filtered.to_dict(orient="records")
+
+
+def _read_only(values) -> np.ndarray:
+    array = np.array(values)
+    array.flags.writeable = False
+    return array
+
+
+class CatalogSnapshot:
+    """
+    Immutable, preloaded view of the product catalog.
+
+    Attributes:
+        df: Product DataFrame (treat as read-only; the planner copies before writing)
+        product_index: pd.Index of product_id, aligned with df rows
+        price_per_100g, nutri_score_app: read-only score arrays aligned with df rows
+        canonical_ids: Canonical product id of each row (see products.py)
+        canonical_of: product_id -> canonical product id
+        brand_product_ids: Canonical ids that also key on brand, for price
+                           comparison (/api/foods?group_by=product)
+        stores: Store names, sorted
+        brands: Lowercase brand names (for brand:<name> exclusions)
+        stats: Precomputed /api/stats response
+
+    df always has a tag_bits column (allergens.py); it is computed here for
+    CSVs built before the pipeline added it.
+    """
+
+    def __init__(self, df: pd.DataFrame, source: str = None):
+        if "tag_bits" not in df.columns:
+            df = df.assign(tag_bits=tag_bits(df))
+        self.df = df
+        self.source = source
+        self.product_index = pd.Index(df["product_id"]) if "product_id" in df.columns else pd.RangeIndex(len(df))
+        self.price_per_100g = _read_only(df["price_per_100g"]) if "price_per_100g" in df.columns else None
+        self.nutri_score_app = _read_only(df["nutri_score_app"]) if "nutri_score_app" in df.columns else None
+        self.canonical_ids = canonical_product_ids(df)
+        self.canonical_of = dict(zip(self.product_index.tolist(), self.canonical_ids.tolist()))
+        self.brand_product_ids = canonical_product_ids(df, by_brand=True)
+        self.stores = tuple(sorted(df["store"].dropna().astype(str).unique())) if "store" in df.columns else ()
+        self.brands = frozenset(df["brand"].dropna().astype(str).str.lower()) if "brand" in df.columns else frozenset()
+        self.stats = compute_stats(df) if len(df) else {}
+
+        # Lazily computed, request-independent values (one-time, under a lock)
+        self._lazy = {}
+        self._lazy_lock = threading.Lock()
+        self._frozen = True
+        _snapshots.add(self)
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"CatalogSnapshot is immutable (tried to set {name!r})")
+        super().__setattr__(name, value)
+
+    def __len__(self):
+        return len(self.df)
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "CatalogSnapshot":
+        return cls(load_dataset(csv_path), source=csv_path)
+
+    def position_of(self, product_id: int):
+        """Row position of a product_id, or None if it isn't in the catalog."""
+        position = self.product_index.get_indexer([product_id])[0]
+        return None if position < 0 else int(position)
+
+    def ml_scores(self):
+        """
+        calculate_ml_score() for every product, computed once per snapshot.
+
+        ML scores depend only on each product's own features, so the planner
+        can look them up instead of running the models on every request.
+        Returns None if models are unavailable. That is cached too, so
+        requests don't retry loading them from disk; it is dropped once
+        ml_utils.load_models() succeeds (e.g. in the warm-up thread).
+        """
+        if self._lazy.get("ml_scores") is _MODELS_UNAVAILABLE and ml_utils.model_status()["state"] == "ready":
+            with self._lazy_lock:
+                if self._lazy.get("ml_scores") is _MODELS_UNAVAILABLE:
+                    del self._lazy["ml_scores"]
+        metrics.cache_lookup("catalog_ml_scores", hit="ml_scores" in self._lazy)
+        if "ml_scores" not in self._lazy:
+            with self._lazy_lock:
+                if "ml_scores" not in self._lazy and len(self.df):
+                    scores = ml_utils.calculate_ml_score(self.df.copy())
+                    self._lazy["ml_scores"] = _MODELS_UNAVAILABLE if scores is None else scores
+        scores = self._lazy.get("ml_scores")
+        return None if scores is _MODELS_UNAVAILABLE else scores
+
+    def ranked(self, diet_type: str, goal: str, by_store: bool = False,
+               exclusions: tuple = ()) -> RankedCandidates:
+        """
+        rank_candidates() for a diet, goal and exclusions, computed once per snapshot.
+
+        Ranking doesn't depend on budget or household, so /api/plan/adjust
+        repairs baskets from these cached lists instead of re-scoring. A
+        fallback ranking (models unavailable) is replaced once models load.
+
+        Rankings without exclusions are kept for good: diets are keyed on
+        diet_group(), so there are at most a few dozen. Clients choose
+        exclusions freely, so only the RANKED_EXCLUSION_CACHE_SIZE most
+        recently used rankings with exclusions are kept.
+        """
+        exclusions = tuple(sorted(set(exclusions)))
+        scores = self.ml_scores()
+        key = ("ranked", diet_group(diet_type), goal, by_store, exclusions, scores is not None)
+        if exclusions:
+            return self._ranked_with_exclusions(key, scores)
+        metrics.cache_lookup("ranked_candidates", hit=key in self._lazy)
+        if key not in self._lazy:
+            with self._lazy_lock:
+                if key not in self._lazy:
+                    self._lazy[key] = self._rank(key, scores)
+        return self._lazy[key]
+
+    def _ranked_with_exclusions(self, key: tuple, scores) -> RankedCandidates:
+        with self._lazy_lock:
+            cache = self._lazy.setdefault("ranked_exclusions", OrderedDict())
+            ranked = cache.get(key)
+            if ranked is not None:
+                cache.move_to_end(key)
+        metrics.cache_lookup("ranked_candidates", hit=ranked is not None)
+        if ranked is None:
+            ranked = self._rank(key, scores)
+            with self._lazy_lock:
+                cache[key] = ranked
+                while len(cache) > RANKED_EXCLUSION_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return ranked
+
+    def _rank(self, key: tuple, scores) -> RankedCandidates:
+        _, diet, goal, by_store, exclusions, use_ml = key
+        return rank_candidates(self.df, diet, goal, use_ml=use_ml, ml_scores=scores,
+                               canonical_ids=self.canonical_ids, by_store=by_store, exclusions=exclusions)
+
+    def substitute_index(self) -> SubstituteIndex:
+        """Nearest-neighbour index for /api/foods/<id>/substitutes, built once per snapshot."""
+        metrics.cache_lookup("substitute_index", hit="substitutes" in self._lazy)
+        if "substitutes" not in self._lazy:
+            with self._lazy_lock:
+                if "substitutes" not in self._lazy:
+                    self._lazy["substitutes"] = SubstituteIndex(self.df, self.canonical_ids)
+        return self._lazy["substitutes"]
+
+    @property
+    def scores_ready(self) -> bool:
+        return "ml_scores" in self._lazy
+
+    def warm(self):
+        """Load models, precompute ML scores and build the substitute index (run at startup)."""
+        self.ml_scores()
+        if len(self.df):
+            self.substitute_index()
+
+
+def start_warmup(catalog: CatalogSnapshot, mode: str):
+    """
+    Warm a snapshot according to WARM_MODELS.
+
+    Args:
+        catalog: Snapshot to warm
+        mode: "sync" (block until done), "background" (daemon thread) or "off"
+    """
+    if mode == "sync":
+        catalog.warm()
+    elif mode == "background":
+        threading.Thread(target=catalog.warm, name="catalog-warmup", daemon=True).start()
@@ -0,0 +1,102 @@
+"""
+Compiled inference for NutriBudget's Random Forest models
+
+Flattens every tree of a fitted RandomForestClassifier/Regressor into one set
+of NumPy node arrays and walks all trees for all rows at once, one tree level
+per step. This skips sklearn's per-call validation and per-tree dispatch, and
+gives the same predictions as the original estimator.
+
+Per-call overhead dominates sklearn's cost for small batches, while its Cython
+traversal wins on large ones. Batches above CROSSOVER_ROWS are therefore handed
+back to the original forest, so the compiled path is never the slower one.
+Measured on the shipped models (best of 5, value predictor): 100 rows take
+1.5 ms compiled vs 11 ms sklearn, 500 rows 7.6 vs 11.8 ms, 1000 rows 15.7 vs
+13.1 ms and 4900 rows 85 vs 25 ms, so the two break even just under 1000 rows.
+
+Catalog-wide scoring (CatalogSnapshot.ml_scores() at warm-up, ~4900 rows) is
+therefore deliberately served by sklearn; the compiled path is for the small
+batches scored per request (calculate_ml_score() on filtered frames).
+"""
+
+import os
+
+import numpy as np
+
+# Above this many rows the sklearn estimator is faster (see benchmark_inference.py)
+CROSSOVER_ROWS = int(os.environ.get("NUTRIBUDGET_FOREST_CROSSOVER_ROWS", 1000))
+
+
+class CompiledForest:
+    """
+    A fitted forest exported to flat arrays.
+
+    Internal node i splits on feature[i] at threshold[i]; its children are
+    children[2*i] (x <= threshold) and children[2*i + 1]. Leaves point to
+    themselves with an infinite threshold, so extra traversal steps are no-ops.
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        feature, threshold, children, value = [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left = np.where(is_leaf, node_ids, tree.children_left + offset)
+            right = np.where(is_leaf, node_ids, tree.children_right + offset)
+            children.append(np.stack([left, right], axis=1).ravel())
+
+            leaf_value = tree.value[:, 0, :]
+            if hasattr(forest, "classes_"):
+                # Per-tree class probabilities, as in DecisionTreeClassifier.predict_proba
+                totals = leaf_value.sum(axis=1, keepdims=True)
+                leaf_value = np.divide(leaf_value, totals, out=np.zeros_like(leaf_value), where=totals > 0)
+            value.append(leaf_value)
+
+        self.feature = np.concatenate(feature).astype(np.int32)
+        self.threshold = np.concatenate(threshold)
+        self.children = np.concatenate(children).astype(np.int32)
+        self.value = np.concatenate(value)
+        self.roots = offsets.astype(np.int32)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.classes_ = getattr(forest, "classes_", None)
+        self.n_features_in_ = forest.n_features_in_
+        self.forest = forest
+
+    def _mean_leaf_values(self, X):
+        """Mean leaf value across trees for each row, shape (rows, outputs)."""
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+
+        # One entry per (row, tree) pair, flattened row-major
+        node = np.tile(self.roots, n_rows)
+        row_base = np.repeat(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+        X_flat = X.ravel()
+
+        for _ in range(self.max_depth):
+            x = X_flat.take(row_base + self.feature.take(node))
+            node = self.children.take(2 * node + (x > self.threshold.take(node)))
+
+        return self.value.take(node, axis=0).reshape(n_rows, n_trees, -1).mean(axis=1)
+
+    def predict(self, X):
+        if len(X) > CROSSOVER_ROWS:
+            return self.forest.predict(X)
+
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        means = self._mean_leaf_values(X)
+
+        if self.classes_ is not None:
+            return self.classes_.take(np.argmax(means, axis=1))
+        return means[:, 0]
+
+
+def compile_forest(forest):
+    """Export a fitted RandomForest to a CompiledForest."""
+    return CompiledForest(forest)
@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for the NutriBudget API (picked up automatically
+when gunicorn is started from this directory).
+
+The app is built once in the master with preload_app, including the catalog
+snapshot, ML models and per-product ML scores, and the workers are forked
+from it. Since none of that is written after startup, workers share those
+pages copy-on-write instead of each loading its own copy.
+
+Workers and bind address come from gunicorn's usual WEB_CONCURRENCY and PORT
+environment variables.
+"""
+
+import gc
+import os
+
+preload_app = True
+
+# Warm synchronously so models and scores exist before the fork; a background
+# warm-up thread would not survive into the workers
+os.environ.setdefault("NUTRIBUDGET_WARM_MODELS", "sync")
+
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation.
+    # Otherwise each worker's garbage collector writes to those objects'
+    # headers and un-shares the pages.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Plan pools are per worker process (never forked from the master); start
+    # them before the worker takes requests
+    worker.wsgi.extensions["plan_executor"].start()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Throughput comparison of the API's deployment modes.
+
+Starts each server configuration on a local port, waits for /ready, then
+drives it with CONCURRENCY concurrent clients for DURATION seconds using a
+mix of /api/plan and /api/foods requests (and /api/recipes if
+--recipes-share > 0, which needs GEMINI_API_KEY). It reports requests per
+second and latency percentiles of served requests, plus the number of 429s
+from plan backpressure (see plan_executor.py). Executor settings are taken
+from the environment (NUTRIBUDGET_PLAN_EXECUTOR, NUTRIBUDGET_PLAN_WORKERS,
+NUTRIBUDGET_PLAN_MAX_PENDING).
+
+Servers:
+- gunicorn-sync:     Flask app, gunicorn sync workers (one request per process)
+- gunicorn-gthread:  Flask app, gunicorn threaded workers
+- uvicorn:           Starlette app (asgi_app.py), planner on a PlanExecutor
+
+Requires httpx (pip install httpx).
+
+Usage:
+    python load_test.py --workers 2 --concurrency 32 --duration 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+SERVERS = {
+    "gunicorn-sync": ["gunicorn", "-c", "gunicorn.conf.py", "--workers", "{workers}",
+                      "--bind", "127.0.0.1:{port}", "app:app"],
+    "gunicorn-gthread": ["gunicorn", "-c", "gunicorn.conf.py", "--workers", "{workers}",
+                         "--worker-class", "gthread", "--threads", "8",
+                         "--bind", "127.0.0.1:{port}", "app:app"],
+    "uvicorn": ["uvicorn", "asgi_app:app", "--workers", "{workers}",
+                "--port", "{port}", "--log-level", "warning"],
+}
+
+PLAN_BODIES = [
+    {"budget": budget, "people": people, "dietType": diet, "goal": goal}
+    for budget in (30, 60, 120) for people in (1, 3)
+    for diet in ("veg", "nonveg") for goal in ("balanced", "high_protein")
+]
+
+FOODS_QUERIES = ["?limit=50", "?veg_nonveg=veg&limit=100", "?max_price_per_100g=1.5&limit=100", "?store=walmart"]
+
+
+def start_server(name, workers, port):
+    command = [part.format(workers=workers, port=port) for part in SERVERS[name]]
+    env = {**os.environ, "NUTRIBUDGET_WARM_MODELS": "sync"}
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen(command, cwd=here, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{base_url} not ready after {timeout}s")
+
+
+async def run_load(base_url, concurrency, duration, plan_share, recipes_share, seed):
+    """Returns (latencies_s, status_codes, elapsed_s)."""
+    latencies, statuses = [], []
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client, rng):
+        while time.perf_counter() < deadline:
+            pick = rng.random()
+            start = time.perf_counter()
+            if pick < recipes_share:
+                response = await client.post("/api/recipes", json={"items": ["rice", "lentils", "spinach"]})
+            elif pick < recipes_share + plan_share:
+                response = await client.post("/api/plan", json=rng.choice(PLAN_BODIES))
+            else:
+                response = await client.get("/api/foods" + rng.choice(FOODS_QUERIES))
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, random.Random(seed + i)) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare throughput of sync vs ASGI deployments.")
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--plan-share", type=float, default=0.5, help="fraction of /api/plan requests")
+    parser.add_argument("--recipes-share", type=float, default=0.0, help="fraction of /api/recipes requests")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} concurrency={args.concurrency} duration={args.duration}s "
+          f"mix: plan {args.plan_share:.0%}, recipes {args.recipes_share:.0%}, foods rest")
+    print(f"{'server':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'429s':>8}{'errors':>8}")
+
+    for offset, name in enumerate(args.servers):
+        port = args.port + offset
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(name, args.workers, port)
+        try:
+            wait_until_ready(base_url)
+            latencies, statuses, elapsed = asyncio.run(run_load(
+                base_url, args.concurrency, args.duration, args.plan_share, args.recipes_share, args.seed))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        # Throughput and latency of served requests; 429s (backpressure) counted apart
+        statuses = np.array(statuses)
+        ms = np.array(latencies)[statuses < 400] * 1000
+        rejected = int((statuses == 429).sum())
+        errors = int(((statuses >= 400) & (statuses != 429)).sum())
+        print(f"{name:<18}{len(ms) / elapsed:>9.1f}{np.percentile(ms, 50):>9.0f}"
+              f"{np.percentile(ms, 95):>9.0f}{np.percentile(ms, 99):>9.0f}{rejected:>8}{errors:>8}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Logging setup for the NutriBudget API
+
+configure_logging() puts a single QueueHandler on the root logger. Request
+threads only enqueue records. A QueueListener thread formats them and writes
+them to stderr, so slow log I/O never blocks a request.
+
+Environment:
+- NUTRIBUDGET_LOG_LEVEL:   root level (default INFO)
+- NUTRIBUDGET_LOG_LEVELS:  per-subsystem levels by module, e.g.
+                           "planner=DEBUG,ml_utils=WARNING,validation=ERROR"
+- NUTRIBUDGET_LOG_FORMAT:  "json" (default, one object per line) or "text"
+- NUTRIBUDGET_LOG_SAMPLE:  keep-rates for high-volume events logged with
+                           log_sampled(), e.g. "plan=0.05" (default plan=0.1)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+DEFAULT_SAMPLE_RATES = {"plan": 0.1}
+
+# Attributes every LogRecord has; anything else came in via extra= and is a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_handler = None
+_listener = None
+_sample_rates = dict(DEFAULT_SAMPLE_RATES)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message plus extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _parse_pairs(spec):
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}"""
+    pairs = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, value = part.partition("=")
+        pairs[name.strip()] = value.strip()
+    return pairs
+
+
+def _start_listener():
+    global _listener
+    output = logging.StreamHandler(sys.stderr)
+    if os.environ.get("NUTRIBUDGET_LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def configure_logging():
+    """
+    Install the queue-based handler, levels and sample rates (idempotent).
+
+    Called by create_app() and create_asgi_app(); scripts may call it too.
+    """
+    global _handler
+    if _handler is not None:
+        return
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+
+    _handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    root.addHandler(_handler)
+    root.setLevel(os.environ.get("NUTRIBUDGET_LOG_LEVEL", "INFO").upper())
+
+    for name, level in _parse_pairs(os.environ.get("NUTRIBUDGET_LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    for event, rate in _parse_pairs(os.environ.get("NUTRIBUDGET_LOG_SAMPLE")).items():
+        _sample_rates[event] = float(rate)
+
+    _start_listener()
+    atexit.register(_stop_listener)
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    # The listener thread doesn't survive fork (gunicorn --preload, process
+    # pools); give the child its own queue and listener
+    if _handler is not None:
+        _handler.queue = queue.SimpleQueue()
+        _start_listener()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def log_sampled(logger, event, msg, *args, level=logging.INFO, **fields):
+    """
+    Log a high-volume event, keeping only a sample of them.
+
+    The record carries event and sample_rate fields, so counts can be scaled
+    back up. Nothing is formatted for dropped records.
+
+    Args:
+        logger: Logger to write to
+        event: Sampling key (rate from NUTRIBUDGET_LOG_SAMPLE, default 1.0)
+        msg, args: Message and %-args, as for Logger.log
+        level: Log level (default INFO)
+        **fields: Structured fields added to the record
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = _sample_rates.get(event, 1.0)
+    if rate < 1.0 and random.random() >= rate:
+        return
+    logger.log(level, msg, *args, extra={"event": event, "sample_rate": rate, **fields})
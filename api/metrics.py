@@ -0,0 +1,173 @@
+"""
+In-process metrics for the NutriBudget API, exposed in Prometheus text format
+
+Recording a sample costs one lock and a few dict/list updates. Nothing is
+formatted until /metrics is scraped, so the overhead is negligible when no
+one is scraping. Each server process (gunicorn or uvicorn worker) keeps its
+own registry, and a scrape reports the worker that answered it.
+
+Metrics:
+- nutribudget_http_requests_total{endpoint,method,status}
+- nutribudget_http_request_duration_seconds{endpoint}        (histogram)
+- nutribudget_plan_stage_duration_seconds{stage}             (histogram: filter,
+  score, sort, select, totals from planner(); serialize from the route)
+- nutribudget_plan_path_total{path}                          (ml / fallback)
+- nutribudget_plans_rejected_total                           (429 backpressure)
+- nutribudget_plan_queue_depth                               (gauge)
+- nutribudget_cache_requests_total{cache,result}             (hit / miss)
+"""
+
+import bisect
+import threading
+
+# Seconds; covers sub-millisecond /health up to multi-second cold plans
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labelnames))
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = ("le", bound if bound == "+Inf" else _format_value(float(bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [le])} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = Registry()
+
+requests_total = REGISTRY.register(Counter(
+    "nutribudget_http_requests_total", "HTTP requests by endpoint, method and status.",
+    ("endpoint", "method", "status")))
+request_duration = REGISTRY.register(Histogram(
+    "nutribudget_http_request_duration_seconds", "HTTP request latency by endpoint.", ("endpoint",)))
+plan_stage_duration = REGISTRY.register(Histogram(
+    "nutribudget_plan_stage_duration_seconds", "Time spent in each stage of /api/plan.", ("stage",)))
+plan_path_total = REGISTRY.register(Counter(
+    "nutribudget_plan_path_total", "Plans built with ML scoring vs the greedy fallback.", ("path",)))
+plans_rejected_total = REGISTRY.register(Counter(
+    "nutribudget_plans_rejected_total", "Plans rejected with 429 because the plan queue was full."))
+plan_queue_depth = REGISTRY.register(Gauge(
+    "nutribudget_plan_queue_depth", "Plans currently queued or running."))
+cache_requests_total = REGISTRY.register(Counter(
+    "nutribudget_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result")))
+
+
+def observe_request(endpoint, method, status, seconds):
+    requests_total.inc(endpoint=endpoint, method=method, status=str(status))
+    request_duration.observe(seconds, endpoint=endpoint)
+
+
+def observe_plan(stats: dict):
+    """Record the stage timings and scoring path collected by planner(stats=...)."""
+    for stage, seconds in stats.get("stages", {}).items():
+        plan_stage_duration.observe(seconds, stage=stage)
+    if "path" in stats:
+        plan_path_total.inc(path=stats["path"])
+
+
+def cache_lookup(cache, hit):
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
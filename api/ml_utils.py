@@ -4,44 +4,113 @@ ML Utilities for NutriBudget
 Helper functions for loading models and making predictions.
 """
 
+import logging
 import os
-import joblib
+import threading
+import time
 import pandas as pd
 import numpy as np
 
+import metrics
+from forest_inference import compile_forest
+
+logger = logging.getLogger(__name__)
+
 MODELS_DIR = os.path.join(os.path.dirname(__file__), "models")
 
+# Inference backend for the Random Forests:
+# - "compiled": flattened node arrays with vectorized traversal (forest_inference.py)
+# - "sklearn":  the unpickled estimators as-is
+INFERENCE_BACKEND = os.environ.get("NUTRIBUDGET_INFERENCE_BACKEND", "compiled")
+
+# joblib mmap_mode for the artifacts: estimator arrays in uncompressed dumps are
+# memory-mapped instead of copied. Set NUTRIBUDGET_MODEL_MMAP="" to disable.
+MMAP_MODE = os.environ.get("NUTRIBUDGET_MODEL_MMAP", "r") or None
+
 # Global cache for models
 _models_cache = None
+_models_lock = threading.Lock()
+_models_status = {"state": "cold", "backend": None, "load_time_s": None}
+_warned_missing = False
 
-def load_models():
+def _load_artifact(filename):
+    # Imported here: joblib (and sklearn, via unpickling) are only needed once
+    # models actually load, not for every worker that serves /health or /api/foods
+    import joblib
+    return joblib.load(os.path.join(MODELS_DIR, filename), mmap_mode=MMAP_MODE)
+
+def load_models(backend=None):
     """
     Load all trained ML models from disk.
     Returns dict with models and scaler, or None if models don't exist.
+
+    Args:
+        backend: "compiled" or "sklearn" (default: INFERENCE_BACKEND)
     """
     global _models_cache
+    backend = backend or INFERENCE_BACKEND
     
     # Return cached models if already loaded
-    if _models_cache is not None:
+    if _models_cache is not None and _models_cache['backend'] == backend:
+        metrics.cache_lookup("models", hit=True)
         return _models_cache
+    metrics.cache_lookup("models", hit=False)
     
-    try:
-        models = {
-            'quality_classifier': joblib.load(os.path.join(MODELS_DIR, "quality_classifier.joblib")),
-            'value_predictor': joblib.load(os.path.join(MODELS_DIR, "value_predictor.joblib")),
-            'price_predictor': joblib.load(os.path.join(MODELS_DIR, "price_predictor.joblib")),
-            'scaler': joblib.load(os.path.join(MODELS_DIR, "feature_scaler.joblib"))
-        }
-        _models_cache = models
-        print("✅ ML models loaded successfully")
-        return models
-    except FileNotFoundError as e:
-        print(f"⚠️  ML models not found: {e}")
-        print("   Run 'python train_models.py' to train models")
-        return None
-    except Exception as e:
-        print(f"❌ Error loading ML models: {e}")
-        return None
+    # Only one thread unpickles; others (e.g. a request racing the warm-up) wait for it
+    with _models_lock:
+        if _models_cache is not None and _models_cache['backend'] == backend:
+            return _models_cache
+        
+        _models_status["state"] = "loading"
+        start = time.perf_counter()
+        try:
+            models = {
+                'quality_classifier': _load_artifact("quality_classifier.joblib"),
+                'value_predictor': _load_artifact("value_predictor.joblib"),
+                'price_predictor': _load_artifact("price_predictor.joblib"),
+                'scaler': _load_artifact("feature_scaler.joblib"),
+                'backend': backend
+            }
+            if backend == "compiled":
+                models['quality_classifier'] = compile_forest(models['quality_classifier'])
+                models['value_predictor'] = compile_forest(models['value_predictor'])
+            _models_cache = models
+            _models_status.update(state="ready", backend=backend, load_time_s=round(time.perf_counter() - start, 3))
+            logger.info(f"✅ ML models loaded successfully ({backend} inference)",
+                        extra={"backend": backend, "load_time_s": _models_status["load_time_s"]})
+            return models
+        except FileNotFoundError as e:
+            # Retried on every plan while missing, so only warn the first time
+            global _warned_missing
+            log = logger.debug if _warned_missing else logger.warning
+            _warned_missing = True
+            _models_status["state"] = "unavailable"
+            log(f"⚠️  ML models not found: {e}. Run 'python train_models.py' to train models")
+            return None
+        except Exception as e:
+            _models_status["state"] = "unavailable"
+            logger.error(f"❌ Error loading ML models: {e}")
+            return None
+
+def _reset_after_fork():
+    # A fork (e.g. gunicorn) can happen while another thread holds the lock;
+    # give the child a fresh one so it can't deadlock on load_models()
+    global _models_lock
+    _models_lock = threading.Lock()
+    if _models_status["state"] == "loading":
+        _models_status["state"] = "cold"
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def model_status():
+    """
+    Model loading state for readiness checks.
+    
+    Returns:
+        dict: state ("cold", "loading", "ready" or "unavailable"), backend, load_time_s
+    """
+    return dict(_models_status)
 
 def prepare_features(df):
     """
@@ -61,22 +130,22 @@ def prepare_features(df):
                 
     X = df[feature_cols]
     
-    # Load scaler
-    scaler_path = os.path.join(MODELS_DIR, "feature_scaler.joblib")
-    if os.path.exists(scaler_path):
-        scaler = joblib.load(scaler_path)
-        X_scaled = scaler.transform(X)
+    # Use the cached scaler rather than reading it from disk on every call
+    models = load_models()
+    if models is not None:
+        X_scaled = models['scaler'].transform(X)
         return pd.DataFrame(X_scaled, columns=feature_cols)
     else:
         # Fallback if scaler not found (shouldn't happen in prod)
         return X
 
-def predict_quality(df):
+def predict_quality(df, X=None):
     """
     Predict health quality category for products.
     
     Args:
         df: DataFrame with product data
+        X: Features already prepared by prepare_features(df) (optional)
     
     Returns:
         Series with predictions ('High', 'Medium', 'Low'), or None if models unavailable
@@ -85,19 +154,21 @@ def predict_quality(df):
     if models is None:
         return None
     
-    X = prepare_features(df)
+    if X is None:
+        X = prepare_features(df)
     if X is None:
         return None
     
     predictions = models['quality_classifier'].predict(X)
     return pd.Series(predictions, index=df.index)
 
-def predict_value(df):
+def predict_value(df, X=None):
     """
     Predict nutritional value score for products.
     
     Args:
         df: DataFrame with product data
+        X: Features already prepared by prepare_features(df) (optional)
     
     Returns:
         Series with predicted value scores, or None if models unavailable
@@ -106,19 +177,21 @@ def predict_value(df):
     if models is None:
         return None
     
-    X = prepare_features(df)
+    if X is None:
+        X = prepare_features(df)
     if X is None:
         return None
     
     predictions = models['value_predictor'].predict(X)
     return pd.Series(predictions, index=df.index)
 
-def predict_fair_price(df):
+def predict_fair_price(df, X=None):
     """
     Predict fair price for products based on nutritional content.
     
     Args:
         df: DataFrame with product data
+        X: Features already prepared by prepare_features(df) (optional)
     
     Returns:
         Series with predicted prices, or None if models unavailable
@@ -127,7 +200,8 @@ def predict_fair_price(df):
     if models is None:
         return None
     
-    X = prepare_features(df)
+    if X is None:
+        X = prepare_features(df)
     if X is None:
         return None
     
@@ -147,10 +221,14 @@ def calculate_ml_score(df):
     Returns:
         Series with ML scores, or None if models unavailable
     """
-    # Get predictions
-    quality_pred = predict_quality(df)
-    value_pred = predict_value(df)
-    fair_price_pred = predict_fair_price(df)
+    if load_models() is None:
+        return None
+    
+    # Get predictions (features are scaled once and shared)
+    X = prepare_features(df)
+    quality_pred = predict_quality(df, X)
+    value_pred = predict_value(df, X)
+    fair_price_pred = predict_fair_price(df, X)
     
     if quality_pred is None or value_pred is None or fair_price_pred is None:
         return None
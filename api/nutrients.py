@@ -0,0 +1,187 @@
+"""
+Nutrient targets for grocery plans
+
+Each nutrient a plan reports has a daily target per person and a kind:
+"min" nutrients (calories, protein, carbs, fiber) should be reached, "max"
+nutrients (fat, saturated fat, sugar, sodium) are limits not to exceed.
+
+A person's targets come from their age and sex, following Health Canada's
+Dietary Reference Intakes: energy for a low-active lifestyle, the protein
+RDA, the fiber AI and the sodium CDRR. Carbs, fat, saturated fat and sugar
+are set as shares of that person's energy (carbs at least 45%, fat at most
+35%, saturated fat at most 10%, sugar at most 20%). Without age and sex the
+Nutrition Facts reference adult is used (2000 kcal, 50 g protein), which is
+what plans were measured against before household profiles existed.
+
+The planner turns every candidate's per-100g values into a per-package
+nutrient matrix (nutrient_matrix()) once per ranking, so a basket's totals
+are a single product of the selected rows with their quantities.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Days covered by a plan
+PLAN_DAYS = 7
+
+# Reported nutrients, in nutrient_matrix() column order: name -> (unit, kind)
+NUTRIENTS = {
+    "calories": ("kcal", "min"),
+    "protein": ("g", "min"),
+    "carbs": ("g", "min"),
+    "fat": ("g", "max"),
+    "saturated_fat": ("g", "max"),
+    "sugar": ("g", "max"),
+    "fiber": ("g", "min"),
+    "sodium": ("mg", "max"),
+}
+
+# (from age, kcal male, kcal female, protein g male, female, fiber g male, female, sodium mg)
+_DRI_BY_AGE = [
+    (1, 1000, 950, 13, 13, 19, 19, 1200),
+    (4, 1450, 1350, 19, 19, 25, 25, 1500),
+    (9, 1850, 1700, 34, 34, 31, 26, 1800),
+    (14, 2650, 2050, 52, 46, 38, 26, 2300),
+    (19, 2700, 2100, 56, 46, 38, 25, 2300),
+    (31, 2550, 2000, 56, 46, 38, 25, 2300),
+    (51, 2350, 1850, 56, 46, 30, 21, 2300),
+    (71, 2150, 1650, 56, 46, 30, 21, 2300),
+]
+
+SEXES = ("male", "female")
+MIN_AGE = 1
+MAX_AGE = 120
+
+
+def _targets(calories: float, protein: float, fiber: float, sodium: float) -> dict:
+    return {
+        "calories": calories,
+        "protein": protein,
+        "carbs": round(calories * 0.45 / 4),
+        "fat": round(calories * 0.35 / 9),
+        "saturated_fat": round(calories * 0.10 / 9),
+        "sugar": round(calories * 0.20 / 4),
+        "fiber": fiber,
+        "sodium": sodium,
+    }
+
+
+# Nutrition Facts reference adult
+DEFAULT_DAILY_TARGETS = _targets(2000, 50, 28, 2300)
+
+
+def daily_targets(age: int = None, sex: str = None) -> dict:
+    """
+    Daily targets for one person.
+
+    Args:
+        age: Age in years (None: the reference adult)
+        sex: "male" or "female" (None: the average of both)
+
+    Returns:
+        nutrient -> daily amount, in NUTRIENTS order and units
+
+    Raises:
+        ValueError: if age or sex is out of range
+    """
+    if age is None and sex is None:
+        return dict(DEFAULT_DAILY_TARGETS)
+    if age is None:
+        age = 31
+    if not MIN_AGE <= age <= MAX_AGE:
+        raise ValueError(f"age must be between {MIN_AGE} and {MAX_AGE}")
+    if sex is not None and sex not in SEXES:
+        raise ValueError(f"sex must be one of: {', '.join(SEXES)}")
+
+    row = [band for band in _DRI_BY_AGE if band[0] <= age][-1]
+    _, kcal_m, kcal_f, protein_m, protein_f, fiber_m, fiber_f, sodium = row
+    if sex == "male":
+        return _targets(kcal_m, protein_m, fiber_m, sodium)
+    if sex == "female":
+        return _targets(kcal_f, protein_f, fiber_f, sodium)
+    return _targets(round((kcal_m + kcal_f) / 2), round((protein_m + protein_f) / 2),
+                    round((fiber_m + fiber_f) / 2), sodium)
+
+
+def plan_targets(people: int, household: list = None, days: int = PLAN_DAYS) -> dict:
+    """
+    Targets for a whole plan: every person's daily targets over days.
+
+    Args:
+        people: Household size (used when household isn't given)
+        household: Optional list of {"age", "sex"} dicts, one per person
+        days: Days the plan covers
+
+    Returns:
+        nutrient -> amount for the plan
+    """
+    if household:
+        people_targets = [daily_targets(person.get("age"), person.get("sex")) for person in household]
+    else:
+        people_targets = [DEFAULT_DAILY_TARGETS] * people
+    return {name: sum(person[name] for person in people_targets) * days for name in NUTRIENTS}
+
+
+def nutrient_matrix(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Nutrients per package of every row: a (rows, NUTRIENTS) float array.
+
+    The dataset is per 100g; package_weight_g scales it (100g if missing).
+    Missing columns and values count as 0.
+    """
+    multiplier = (frame["package_weight_g"].to_numpy(dtype=float) if "package_weight_g" in frame.columns
+                  else np.full(len(frame), 100.0)) / 100.0
+    matrix = np.zeros((len(frame), len(NUTRIENTS)))
+    for j, name in enumerate(NUTRIENTS):
+        if name in frame.columns:
+            matrix[:, j] = frame[name].to_numpy(dtype=float)
+    return np.nan_to_num(matrix) * multiplier[:, None]
+
+
+def resolve_limits(limits, targets: dict) -> dict:
+    """
+    Resolve a plan's nutrientLimits into amounts the selection must stay under.
+
+    Limits are per week: multi-week plans resolve them against one week's
+    targets and apply them to every weekly basket.
+
+    Args:
+        limits: List of "max" nutrient names (capped at their weekly target),
+                or a dict of nutrient name -> amount per week, in the
+                nutrient's NUTRIENTS unit (mg sodium, kcal calories, g others)
+        targets: plan_targets() for one week
+
+    Returns:
+        nutrient -> maximum amount for a week's basket (empty if limits is empty)
+    """
+    if not limits:
+        return {}
+    if isinstance(limits, dict):
+        return {name: float(amount) for name, amount in limits.items()}
+    return {name: float(targets[name]) for name in limits}
+
+
+def nutrient_coverage(amounts: list, targets: dict, names=None) -> dict:
+    """
+    Coverage of targets by a basket's nutrient amounts.
+
+    Args:
+        amounts: Basket totals in NUTRIENTS order (already rounded)
+        targets: plan_targets()
+        names: Nutrients to report (default: all)
+
+    Returns:
+        nutrient -> {actual, target, percentage, kind}
+    """
+    result = {}
+    for j, name in enumerate(NUTRIENTS):
+        if names is not None and name not in names:
+            continue
+        actual, target = amounts[j], targets[name]
+        result[name] = {
+            "actual": actual,
+            "target": target,
+            "percentage": round((actual / target) * 100, 1) if target > 0 else 0,
+            "kind": NUTRIENTS[name][1],
+        }
+    return result
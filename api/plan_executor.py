@@ -0,0 +1,238 @@
+"""
+Planning executors for the NutriBudget API
+
+planner() is CPU-bound pandas/sklearn work that holds the GIL, so threads in
+one process can't plan in parallel. PlanExecutor runs plans in one of three
+modes:
+- inline:   in the calling thread (default for the Flask app under sync workers)
+- thread:   on a thread pool; keeps an event loop responsive, no extra parallelism
+- process:  on a process pool whose workers are initialized once with the
+            catalog and warm models, so only the request params and the plan
+            dict cross the process boundary
+
+All modes apply queue-depth backpressure. Once max_pending plans are queued or
+running, submit() raises PlannerBusy (the API answers 429) instead of letting
+latency grow without bound.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from catalog import CatalogSnapshot
+from log_config import log_sampled
+from planner import adjust_plan, plan_sweep, planner
+
+logger = logging.getLogger(__name__)
+
+MODES = ("inline", "thread", "process")
+
+# Catalog of a process-pool worker, set by _init_worker (or inherited via fork)
+_worker_catalog = None
+
+
+class PlannerBusy(Exception):
+    """Raised by PlanExecutor.submit() when the plan queue is full."""
+
+
+def _catalog_kwargs(catalog: CatalogSnapshot, params: dict) -> dict:
+    # No scores means the models couldn't be loaded; don't let the planner retry
+    scores = catalog.ml_scores()
+    return {"ml_scores": scores, "use_ml": scores is not None, "canonical_ids": catalog.canonical_ids,
+            "max_stores": params.get("max_stores"), "preferred_stores": params.get("preferred_stores"),
+            "household": params.get("household"), "nutrient_limits": params.get("nutrient_limits"),
+            "seed": params.get("seed"), "exclusions": params.get("exclusions", ())}
+
+
+def run_plan(catalog: CatalogSnapshot, params: dict) -> tuple:
+    """
+    Run planner() against a catalog snapshot for parsed /api/plan params.
+
+    Returns:
+        (plan, stats) where stats holds planner() stage timings and scoring path
+    """
+    stats = {}
+    result = planner(params["budget"], params["people"], params["diet_type"], params["goal"],
+                     catalog.df, stats=stats, weeks=params.get("weeks", 1),
+                     alternatives=params.get("alternatives", 0), **_catalog_kwargs(catalog, params))
+    return result, stats
+
+
+def run_sweep(catalog: CatalogSnapshot, params: dict) -> tuple:
+    """plan_sweep() for parsed /api/plan/sweep params; returns (sweep, stats)."""
+    stats = {}
+    result = plan_sweep(params["budgets"], params["people"], params["diet_type"], params["goal"],
+                        catalog.df, stats=stats, **_catalog_kwargs(catalog, params))
+    return result, stats
+
+
+def run_adjust(catalog: CatalogSnapshot, params: dict) -> tuple:
+    """adjust_plan() for parsed /api/plan/adjust params, from the catalog's cached ranking."""
+    stats = {}
+    by_store = bool(params.get("max_stores") or params.get("preferred_stores"))
+    exclusions = params.get("exclusions", ())
+    result = adjust_plan(catalog.ranked(params["diet_type"], params["goal"], by_store, exclusions), params["basket"],
+                         params["budget"], params["people"], params["diet_type"], params["goal"],
+                         exclude=params["exclude"], pin=params["pin"], max_stores=params.get("max_stores"),
+                         preferred_stores=params.get("preferred_stores"), canonical_of=catalog.canonical_of,
+                         stats=stats, household=params.get("household"),
+                         nutrient_limits=params.get("nutrient_limits"), seed=params.get("seed"),
+                         exclusions=exclusions)
+    return result, stats
+
+
+# Work the executor can run, by name (names cross the process boundary)
+TASKS = {"plan": run_plan, "sweep": run_sweep, "adjust": run_adjust}
+
+
+def _init_worker(data_path: str):
+    """Process-pool initializer: load the catalog and warm models once per worker."""
+    global _worker_catalog
+    if _worker_catalog is None or _worker_catalog.source != data_path:
+        _worker_catalog = CatalogSnapshot.from_csv(data_path)
+    _worker_catalog.warm()
+
+
+def _plan_in_worker(task: str, params: dict) -> tuple:
+    return TASKS[task](_worker_catalog, params)
+
+
+class PlanExecutor:
+    """
+    Runs plans inline, on threads or on pre-initialized worker processes.
+
+    Args:
+        catalog: Catalog snapshot of the serving process
+        mode: "inline", "thread" or "process"
+        workers: Pool size for thread/process modes
+        max_pending: Plans allowed queued or running at once before PlannerBusy
+                     (default: 4 per worker)
+    """
+
+    def __init__(self, catalog: CatalogSnapshot, mode: str = "inline", workers: int = 2, max_pending: int = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown plan executor mode {mode!r}; expected one of {MODES}")
+        self.catalog = catalog
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max_pending or 4 * self.workers
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        """Plans currently queued or running."""
+        return self._pending
+
+    def _get_pool(self):
+        # Created lazily and per process: a pool built in a gunicorn master
+        # before fork would be unusable in the workers
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    if self.mode == "thread":
+                        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="planner")
+                    else:
+                        global _worker_catalog
+                        _worker_catalog = self.catalog  # reused by forked workers instead of reloading
+                        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                         initargs=(self.catalog.source,))
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            metrics.plan_queue_depth.set(self._pending)
+
+    def _finish(self, future: Future, outcome: Future, params: dict, task: str):
+        # Record planner stats in this (serving) process and hand back only the plan
+        self._release()
+        try:
+            result, stats = outcome.result()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        metrics.observe_plan(stats)
+        fields = {"people": params["people"], "diet": params["diet_type"], "goal": params["goal"],
+                  "path": stats.get("path"), "planner_ms": round(sum(stats.get("stages", {}).values()) * 1000, 1)}
+        if task == "sweep":
+            log_sampled(logger, "plan", "Sweep generated: %d budgets", len(result["curve"]), task=task, **fields)
+        else:
+            log_sampled(logger, "plan", "Plan generated: %d items, total cost=$%.2f",
+                        len(result["items"]), result["totals"]["total_spent"], budget=params["budget"],
+                        task=task, **fields)
+        future.set_result(result)
+
+    def submit(self, params: dict, inline: bool = False, task: str = "plan") -> Future:
+        """
+        Schedule a plan.
+
+        Args:
+            params: Parsed request from validation.parse_plan_request()
+                    (parse_sweep_request() / parse_adjust_request() for
+                    the sweep and adjust tasks)
+            inline: Run in the calling thread whatever the mode (used when the
+                    request is being profiled, see profiling.py)
+            task: Name in TASKS: "plan" (planner()), "sweep" (plan_sweep())
+                  or "adjust" (adjust_plan())
+
+        Returns:
+            Future resolving to the task's result
+
+        Raises:
+            PlannerBusy: if max_pending plans are already queued or running
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.plans_rejected_total.inc()
+                raise PlannerBusy(f"{self._pending} plans pending (limit {self.max_pending})")
+            self._pending += 1
+            metrics.plan_queue_depth.set(self._pending)
+
+        future = Future()
+        if inline or self.mode == "inline":
+            outcome = Future()
+            try:
+                outcome.set_result(TASKS[task](self.catalog, params))
+            except Exception as e:
+                outcome.set_exception(e)
+            self._finish(future, outcome, params, task)
+            return future
+
+        try:
+            if self.mode == "thread":
+                outcome = self._get_pool().submit(TASKS[task], self.catalog, params)
+            else:
+                outcome = self._get_pool().submit(_plan_in_worker, task, params)
+        except Exception:
+            self._release()
+            raise
+        outcome.add_done_callback(lambda done: self._finish(future, done, params, task))
+        return future
+
+    def start(self):
+        """
+        Create the pool now, in the serving process, rather than on the first
+        plan. Process workers load the catalog and models before any request.
+        """
+        if self.mode == "inline":
+            return
+        pool = self._get_pool()
+        if self.mode == "process":
+            for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def run(self, params: dict, inline: bool = False, task: str = "plan") -> dict:
+        """Blocking submit(); raises PlannerBusy or the planner's exception."""
+        return self.submit(params, inline=inline, task=task).result()
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
@@ -0,0 +1,53 @@
+"""
+Plan tokens for POST /api/plan/adjust
+
+A plan token is the plan's inputs plus its product ids, as compressed JSON in
+URL-safe base64. It carries nothing the client couldn't send itself, so it
+isn't signed; /api/plan/adjust validates the decoded inputs like any request.
+Because the token holds the whole plan, any worker can adjust a plan made by
+another one and the server keeps no per-plan state.
+"""
+
+import base64
+import binascii
+import json
+import zlib
+
+# Largest decoded payload; a real plan's inputs and items are a few KB
+MAX_TOKEN_BYTES = 64 * 1024
+# Longest token accepted (the compressed payload is far smaller than that)
+MAX_TOKEN_LENGTH = 16 * 1024
+
+
+def encode_plan_token(inputs: dict, product_ids: list) -> str:
+    """Token for a plan made from inputs (the response's inputs) with these items."""
+    payload = json.dumps({"inputs": inputs, "items": [int(pid) for pid in product_ids]},
+                         separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(zlib.compress(payload.encode("utf-8"))).decode("ascii").rstrip("=")
+
+
+def decode_plan_token(token: str) -> tuple:
+    """
+    Returns:
+        (inputs, product_ids) of the plan the token was made for
+
+    Raises:
+        ValueError: if the token is malformed, or longer than MAX_TOKEN_LENGTH
+                    or MAX_TOKEN_BYTES once decompressed
+    """
+    if len(token) > MAX_TOKEN_LENGTH:
+        raise ValueError(f"Malformed plan token: longer than {MAX_TOKEN_LENGTH} characters")
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        # Bounded, so a small token can't expand into gigabytes
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(raw, MAX_TOKEN_BYTES)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"payload is larger than {MAX_TOKEN_BYTES} bytes")
+        payload = json.loads(data)
+        inputs, product_ids = payload["inputs"], [int(pid) for pid in payload["items"]]
+    except (binascii.Error, zlib.error, UnicodeDecodeError, TypeError, ValueError, KeyError) as e:
+        raise ValueError(f"Malformed plan token: {e}")
+    if not isinstance(inputs, dict):
+        raise ValueError("Malformed plan token: inputs is not an object")
+    return inputs, product_ids
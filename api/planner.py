@@ -1,7 +1,15 @@
+import logging
+import time
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import ml_utils
+from allergens import excluded_rows
+from nutrients import NUTRIENTS, PLAN_DAYS, nutrient_coverage, nutrient_matrix, plan_targets, resolve_limits
+from plan_tokens import encode_plan_token
+from products import canonical_product_ids, cheapest_offers, product_name_keys
+
+logger = logging.getLogger(__name__)
 
 def load_dataset(csv_path: str) -> pd.DataFrame:
     """
@@ -14,41 +22,346 @@ def load_dataset(csv_path: str) -> pd.DataFrame:
             df["product_id"] = df["product_id"].astype(int)
         return df
     except FileNotFoundError:
-        print(f"Error: Could not find file at {csv_path}")
+        logger.error(f"Could not find file at {csv_path}")
         return pd.DataFrame()
 
-def planner(budget: float, people: int, diet_type: str, goal: str, df: pd.DataFrame, use_ml: bool = True) -> Dict[str, Any]:
+# Store subsets kept per round of the max_stores search
+STORE_BEAM_WIDTH = 3
+
+# Nutrients always reported in totals (others when the catalog has them)
+REPORTED_TOTALS = ("calories", "protein", "fiber")
+REPORTED_COVERAGE = ("calories", "protein")
+
+# Multi-week plans: categories bought fresh every week, and how many weeks
+# after a purchase the same product isn't bought again
+PERISHABLE_CATEGORIES = ("Produce", "Dairy", "Dairy & Eggs", "Bakery")
+MAX_WEEKS = 8
+VARIETY_GAP_WEEKS = 2
+
+# Plan alternatives: (value, nutrition, whole foods) weights of the walk
+# orders tried, and budget shares each order is walked at
+PARETO_WEIGHTS = [(1.0, 0.0, 0.0), (0.5, 0.5, 0.0), (0.0, 1.0, 0.0), (0.5, 0.0, 0.5),
+                  (0.0, 0.5, 0.5), (0.34, 0.33, 0.33)]
+PARETO_BUDGET_SHARES = (1.0, 0.75, 0.5, 0.3)
+MAX_ALTERNATIVES = 5
+
+# Variety mode: seeded Gumbel-top-k sample of this many candidates, weighted
+# exp(-rank / VARIETY_TEMPERATURE), walked before the rest in ranked order
+VARIETY_POOL = 200
+VARIETY_TEMPERATURE = 25.0
+
+
+def processing_level(category: str) -> str:
+    """Processing level of a product, estimated from its category."""
+    if "Frozen" in category or "Snack" in category:
+        return "Processed"
+    if "Meat" in category or "Dairy" in category:
+        return "Minimally Processed"
+    return "Whole Foods"
+
+
+def _greedy_walk(prices: list, clusters: list, budget: float, max_cluster_budget: float, order=None,
+                 products: list = None, start=(), skip=(), limits: list = None) -> tuple:
     """
-    Generates a grocery plan using ML-powered intelligent selection or greedy fallback.
-    
+    Walk candidates best-first, taking each one that fits the budget and its
+    cluster's spending cap.
+
     Args:
-        budget: Weekly budget in dollars
-        people: Number of people
-        diet_type: Diet preference (veg/non-veg/vegan)
-        goal: Health goal (balanced/high_protein/low_sugar)
-        df: Product dataframe
-        use_ml: Use ML models for selection (default True)
+        prices, clusters: From RankedCandidates
+        budget: Total spend allowed
+        max_cluster_budget: Spend allowed per cluster
+        order: Candidate positions to walk, best first (default: all)
+        products: Product keys from RankedCandidates (names: the planner
+                  passes these, so a basket holds one offer of each item);
+                  when given, a candidate whose key is already in the
+                  basket isn't bought
+        start: Positions already in the basket; they count towards the
+               budget and cluster caps, and the walk tops them up
+        skip: Positions the walk must not take
+        limits: (amount per candidate, maximum) pairs from
+                RankedCandidates.limit_columns(); a candidate that would take
+                the basket over a maximum is passed over
+
+    Returns:
+        (positions, spend) of the selected candidates (start first)
     """
+    positions = list(start)
+    spend = 0.0
+    cluster_spending = {}
+    bought = set()
+    for i in positions:
+        spend += prices[i]
+        cluster_spending[clusters[i]] = cluster_spending.get(clusters[i], 0.0) + prices[i]
+        if products is not None:
+            bought.add(products[i])
+    excluded = set(skip) | set(positions)
+    limit_totals = [sum(amounts[i] for i in positions) for amounts, _ in limits or ()]
+
+    for i in (range(len(prices)) if order is None else order):
+        price = prices[i]
+
+        # Skip if price is missing or zero
+        if price != price or price <= 0:
+            continue
+        if products is not None and products[i] in bought:
+            continue
+        if excluded and i in excluded:
+            continue
+
+        if spend + price <= budget:
+            cluster = clusters[i]
+            cluster_spend = cluster_spending.get(cluster, 0.0)
+            if cluster_spend + price <= max_cluster_budget and (
+                    not limits or all(total + amounts[i] <= cap
+                                      for total, (amounts, cap) in zip(limit_totals, limits))):
+                positions.append(i)
+                spend += price
+                cluster_spending[cluster] = cluster_spend + price
+                if products is not None:
+                    bought.add(products[i])
+                for j, (amounts, _) in enumerate(limits or ()):
+                    limit_totals[j] += amounts[i]
+
+        # Stop if we are very close to budget (e.g. < $0.5 left)
+        if budget - spend < 0.5:
+            break
+
+    return positions, spend
+
+
+def _greedy_walk_budgets(prices: list, clusters: list, budgets: list, max_cluster_budgets: list, order=None,
+                         products: list = None, skip=(), limits: list = None) -> list:
+    """
+    _greedy_walk() for several budgets in one pass over the candidates.
+
+    Each budget keeps its own spend, cluster spending, nutrient totals and
+    bought products as one entry of a NumPy array, and every candidate is
+    tried for all budgets with a few array operations. The baskets are the
+    ones separate _greedy_walk() calls would return (same order, same float
+    additions); the walk ends once every budget has stopped.
+
+    Args:
+        budgets: Total spend allowed, one per basket
+        max_cluster_budgets: Spend allowed per cluster, one per budget
+        Other args: As for _greedy_walk()
+
+    Returns:
+        [(positions, spend)] per budget
+    """
+    if len(budgets) == 1:
+        return [_greedy_walk(prices, clusters, budgets[0], max_cluster_budgets[0], order, products,
+                             skip=skip, limits=limits)]
+
+    budgets = np.asarray(budgets, dtype=float)
+    n = len(budgets)
+    # Budgets that stopped get a -inf budget, so nothing fits them any more
+    open_budgets = budgets.copy()
+    open_caps = np.asarray(max_cluster_budgets, dtype=float).copy()
+    spend = np.zeros(n)
+    room = float(budgets.max())  # most any walking budget has left
+    cluster_spending = {}
+    bought = {}
+    limit_totals = np.zeros((len(limits or ()), n))
+    taken = [[] for _ in range(n)]
+    excluded = set(skip)
+    total, fits, other = np.empty(n), np.empty(n, dtype=bool), np.empty(n, dtype=bool)
+
+    for i in (range(len(prices)) if order is None else order):
+        price = prices[i]
+        # A price above every budget's room can't fit (with a margin for rounding)
+        if price != price or price <= 0 or price > room + 1e-6:
+            continue
+        if excluded and i in excluded:
+            continue
+
+        cluster = clusters[i]
+        cluster_spend = cluster_spending.get(cluster)
+        if cluster_spend is None:
+            cluster_spend = cluster_spending[cluster] = np.zeros(n)
+        np.less_equal(np.add(spend, price, out=total), open_budgets, out=fits)
+        fits &= np.less_equal(np.add(cluster_spend, price, out=total), open_caps, out=other)
+        for j, (amounts, cap) in enumerate(limits or ()):
+            fits &= np.less_equal(np.add(limit_totals[j], amounts[i], out=total), cap, out=other)
+        if products is not None and products[i] in bought:
+            fits &= ~bought[products[i]]
+        added = fits.nonzero()[0]
+        if not len(added):
+            continue
+
+        spend[added] += price
+        cluster_spend[added] += price
+        for j, (amounts, _) in enumerate(limits or ()):
+            limit_totals[j, added] += amounts[i]
+        if products is not None:
+            if products[i] not in bought:
+                bought[products[i]] = np.zeros(n, dtype=bool)
+            bought[products[i]][added] = True
+        for k in added.tolist():
+            taken[k].append(i)
+
+        # Budgets with less than $0.5 left stop, as in _greedy_walk() (spend
+        # only moves here, so that's the only place one can run out)
+        stopped = added[budgets[added] - spend[added] < 0.5]
+        if len(stopped):
+            open_budgets[stopped] = -np.inf
+            open_caps[stopped] = -np.inf
+            if np.isneginf(open_budgets).all():
+                break
+        room = float((open_budgets - spend).max())
+
+    return [(positions, float(total)) for positions, total in zip(taken, spend)]
+
+
+def _horizon_walk(prices: list, clusters: list, names: list, perishable: list, weeks: int, budget: float,
+                  max_cluster_budget: float, order=None, limits: list = None) -> list:
+    """
+    One best-first walk that fills several weekly baskets at once.
+
+    Variety is by name (product_name_keys()), so another pack or store of
+    the same item counts as a repeat, and a week never holds two of them.
+    The walk makes two passes over the candidates:
+
+    1. Each name goes into at most one week of the whole horizon, the
+       first that fits (budget, cluster cap and limits of that week).
+    2. Weeks with budget left are topped up with repeats, each into every
+       week it fits unless the name is already bought within
+       VARIETY_GAP_WEEKS of it: with a gap of 2, an item bought in week 1
+       comes back in week 4 at the earliest.
+
+    Repeats thus only fill what fresh items can't, anywhere in the horizon,
+    and every week that got something in pass 1 differs from all others.
+    Perishable candidates try the weeks with the fewest perishables first,
+    which spreads fresh food over the shopping trips; shelf-stable ones try
+    the weeks with the most budget left.
+
+    Args:
+        names: Name key per candidate
+        perishable: Whether each candidate is perishable
+        weeks: Number of weekly baskets
+        budget, max_cluster_budget, limits: Per week, as for _greedy_walk()
+        Other args: As for _greedy_walk()
+
+    Returns:
+        [(positions, spend)] per week
+    """
+    baskets = [[] for _ in range(weeks)]
+    spend = [0.0] * weeks
+    cluster_spending = [{} for _ in range(weeks)]
+    bought = [set() for _ in range(weeks)]
+    perishables = [0] * weeks
+    limit_totals = [[0.0] * len(limits or ()) for _ in range(weeks)]
+    open_weeks = list(range(weeks))
+    placed = set()
+
+    for repeats in (False, True):
+        for i in (range(len(prices)) if order is None else order):
+            price = prices[i]
+            if price != price or price <= 0:
+                continue
+            name, cluster = names[i], clusters[i]
+            if not repeats and name in placed:
+                continue
+
+            if perishable[i]:
+                open_weeks.sort(key=lambda w: (perishables[w], spend[w]))
+            else:
+                open_weeks.sort(key=lambda w: spend[w])
+            for w in open_weeks:
+                if repeats and any(name in bought[near] for near in
+                                   range(max(0, w - VARIETY_GAP_WEEKS), min(weeks, w + VARIETY_GAP_WEEKS + 1))):
+                    continue
+                cluster_spend = cluster_spending[w].get(cluster, 0.0)
+                if spend[w] + price > budget or cluster_spend + price > max_cluster_budget:
+                    continue
+                if limits and not all(total + amounts[i] <= cap
+                                      for total, (amounts, cap) in zip(limit_totals[w], limits)):
+                    continue
+                baskets[w].append(i)
+                spend[w] += price
+                cluster_spending[w][cluster] = cluster_spend + price
+                bought[w].add(name)
+                perishables[w] += bool(perishable[i])
+                for j, (amounts, _) in enumerate(limits or ()):
+                    limit_totals[w][j] += amounts[i]
+                if not repeats:
+                    placed.add(name)
+                    break
+
+            # A week is full once less than $0.5 is left
+            open_weeks = [w for w in open_weeks if budget - spend[w] >= 0.5]
+            if not open_weeks:
+                break
+
+    return [(sorted(basket), total) for basket, total in zip(baskets, spend)]
+
+
+def diet_group(diet_type: str) -> str:
+    """
+    How rank_candidates() treats a diet: "veg" (veg, vegetarian, vegan)
+    keeps only vegetarian products, "nonveg" (non-veg and its aliases)
+    boosts non-vegetarian ones and anything else ("mixed") does neither.
+    Diets in one group get the same ranking.
+    """
+    diet_lower = diet_type.lower()
+    if "non" in diet_lower:
+        return "nonveg"
+    # Ensure we don't accidentally match "non-vegetarian"
+    return "veg" if "veg" in diet_lower else "mixed"
+
+
+def rank_candidates(df: pd.DataFrame, diet_type: str, goal: str, use_ml: bool = True,
+                    ml_scores: Optional[pd.Series] = None, canonical_ids: Optional[pd.Series] = None,
+                    by_store: bool = False, stages: Optional[dict] = None,
+                    exclusions: tuple = ()) -> "RankedCandidates":
+    """
+    Filter, score and sort the catalog for one diet and goal (budget-independent).
+
+    Args:
+        df, diet_type, goal, use_ml, ml_scores, canonical_ids: As for planner()
+        by_store: Keep the cheapest offer of each product per store rather
+                  than overall (for store-limited plans)
+        stages: Optional dict that receives filter/score/sort timings in seconds
+        exclusions: parse_exclusions() tags and brands whose products are dropped
+
+    Returns:
+        RankedCandidates, best first
+    """
+    started = time.perf_counter()
     
     # 1. Filter by Diet
     filtered = df.copy()
-    diet_lower = diet_type.lower()
-    
-    # Map "vegan" or "vegetarian" to the "Vegetarian" value in dataset
-    # Ensure we don't accidentally match "non-vegetarian"
-    if "veg" in diet_lower and "non" not in diet_lower:
+    diet = diet_group(diet_type)
+    if diet == "veg":
         if "veg_nonveg" in filtered.columns:
             filtered = filtered[filtered["veg_nonveg"].astype(str).str.lower().str.contains("veg")]
     
     # 2. Calculate Value Metric with ML or Fallback
-    filtered = filtered[filtered["price_per_100g"] > 0.01].copy()
+    filtered = filtered[filtered["price_per_100g"] > 0.01]
+
+    # What a typical shopper pays for each candidate, before pricier offers are dropped
+    filtered = filtered.assign(_typical_price=_typical_prices(filtered))
+
+    # Excluded allergens/attributes/brands, before offers are deduplicated so an
+    # excluded brand's product can still come from another store
+    if exclusions:
+        filtered = filtered[~excluded_rows(filtered, exclusions)]
+
+    # Same product at several stores (or twice at one): keep the cheapest offer
+    if canonical_ids is None:
+        canonical_ids = canonical_product_ids(df)
+    filtered = cheapest_offers(filtered, canonical_ids, by_store=by_store and "store" in filtered.columns).copy()
+    filtered["_product"] = canonical_ids.reindex(filtered.index)
+    filtered_at = time.perf_counter()
     
     # Try ML-based scoring
     if use_ml and ml_utils.models_available():
-        print("🤖 Using ML-powered product selection")
+        logger.debug("🤖 Using ML-powered product selection")
         
         # Get ML predictions
-        ml_score = ml_utils.calculate_ml_score(filtered)
+        if ml_scores is not None:
+            ml_score = ml_scores.reindex(filtered.index)
+        else:
+            ml_score = ml_utils.calculate_ml_score(filtered)
         
         if ml_score is not None:
             # Use ML score as base
@@ -66,7 +379,7 @@ def planner(budget: float, people: int, diet_type: str, goal: str, df: pd.DataFr
                     filtered["value_metric"] -= sugar_penalty
             
             # UX: Boost non-veg items if requested
-            if "non" in diet_lower and "veg_nonveg" in filtered.columns:
+            if diet == "nonveg" and "veg_nonveg" in filtered.columns:
                 mask = filtered["veg_nonveg"] == "Non-Vegetarian"
                 filtered.loc[mask, "value_metric"] *= 5.0
         else:
@@ -77,7 +390,7 @@ def planner(budget: float, people: int, diet_type: str, goal: str, df: pd.DataFr
     
     # Fallback to traditional greedy method
     if not use_ml:
-        print("📊 Using traditional greedy selection")
+        logger.debug("📊 Using traditional greedy selection")
         filtered["value_metric"] = filtered["nutri_score_app"] / filtered["price_per_100g"]
         
         # Goal Adjustments
@@ -90,126 +403,457 @@ def planner(budget: float, people: int, diet_type: str, goal: str, df: pd.DataFr
                 filtered["value_metric"] -= (filtered["sugar"] / filtered["price_per_100g"]) * 0.5
 
         # UX Improvement for non-veg
-        if "non" in diet_lower and "veg_nonveg" in filtered.columns:
+        if diet == "nonveg" and "veg_nonveg" in filtered.columns:
             mask = filtered["veg_nonveg"] == "Non-Vegetarian"
             filtered.loc[mask, "value_metric"] *= 10.0
     
+    scored_at = time.perf_counter()
+    
     # 3. Sort by Value Metric (Descending)
     candidates = filtered.sort_values(by="value_metric", ascending=False)
-    
-    # 4. Intelligent Selection with Variety Optimization
-    basket = []
-    current_spend = 0.0
-    
-    # Cluster tracking for variety
-    cluster_spending = {}
-    max_cluster_budget = budget * 0.35 # Max 35% of budget per cluster
-    
-    if use_ml and "cluster_label" in filtered.columns:
-        max_cluster_budget = budget * 0.35
-    else:
-        max_cluster_budget = budget
-        
-        
-    for i, (_, product) in enumerate(candidates.iterrows()):
+
+    if stages is not None:
+        stages["filter"] = filtered_at - started
+        stages["score"] = scored_at - filtered_at
+        stages["sort"] = time.perf_counter() - scored_at
+
+    return RankedCandidates(candidates, use_ml)
+
+
+def _typical_prices(df: pd.DataFrame) -> pd.Series:
+    """
+    Baseline price of each row for plan savings: the median price per 100g
+    of its sub-category (category if missing) across all offers, for the
+    row's package weight. Without those columns the row's own price.
+    """
+    price_column = "price_per_item" if "price_per_item" in df.columns else "price_per_100g"
+    group = next((column for column in ("sub_category", "category") if column in df.columns), None)
+    if group is None or "package_weight_g" not in df.columns or not len(df):
+        return df[price_column]
+    return df.groupby(group)["price_per_100g"].transform("median") * df["package_weight_g"] / 100.0
+
+
+class RankedCandidates:
+    """
+    Scored candidates, best first, with the plain-list columns the greedy
+    walk and the totals read. Budget-independent, so one instance serves
+    any number of baskets (plan sweeps, re-planning).
+
+    Attributes:
+        frame: Candidate rows sorted by value_metric (descending)
+        use_ml: Whether ML scoring was used (False: greedy fallback)
+        prices: Item price per candidate
+        clusters: Integer code of each candidate's cluster_label
+        products: Canonical product id per candidate
+        names: product_name_keys() per candidate
+        product_ids: product_id per candidate
+        nutrition: Nutrients per package per candidate, a (candidates,
+                   nutrients.NUTRIENTS) array
+        nutrient_names: NUTRIENTS the catalog has columns for
+        perishable: Whether each candidate's category is in PERISHABLE_CATEGORIES
+        processed: Whether each candidate's processing_level() is "Processed"
+        typical_prices: Baseline price per candidate (see _typical_prices())
+    """
+
+    def __init__(self, frame: pd.DataFrame, use_ml: bool):
+        self.frame = frame
+        self.use_ml = use_ml
+
         # Use item price if available, otherwise fallback (shouldn't happen with enhanced data)
-        price = product.get("price_per_item", product["price_per_100g"])
-        
-        # Skip if price is missing or zero
-        if pd.isna(price) or price <= 0:
-            continue
-            
-        if current_spend + price <= budget:
-            # Check cluster limit
-            cluster = product.get("cluster_label", "Uncategorized")
-            current_cluster_spend = cluster_spending.get(cluster, 0.0)
-            
-            if current_cluster_spend + price <= max_cluster_budget:
-                # Add to basket
-                item = product.to_dict()
-                item["estimated_cost"] = price
-                item["quantity_units"] = 1
-                
-                # Calculate nutrition per package (dataset is per 100g)
-                weight = product.get("package_weight_g", 100)
-                multiplier = weight / 100.0
-                
-                item["_calories"] = product.get("calories", 0) * multiplier
-                item["_protein"] = product.get("protein", 0) * multiplier
-                item["_fiber"] = product.get("fiber", 0) * multiplier
-                
-                basket.append(item)
-                current_spend += price
-                
-                cluster_spending[cluster] = cluster_spending.get(cluster, 0) + price
-        
-        # Stop if we are very close to budget (e.g. < $0.5 left)
-        if budget - current_spend < 0.5:
-            break
-            
-    # 5. Compute Totals
-    totals = {
-        "total_spent": round(current_spend, 2),
-        "budget": budget,
-        "calories": 0,
-        "protein": 0,
-        "fiber": 0
-    }
+        price_column = "price_per_item" if "price_per_item" in frame.columns else "price_per_100g"
+        self.prices = frame[price_column].tolist()
+        if "cluster_label" in frame.columns:
+            self.clusters = pd.factorize(frame["cluster_label"])[0].tolist()
+        else:
+            self.clusters = [0] * len(frame)
+        self.products = frame["_product"].tolist()
+        self.names = product_name_keys(frame).tolist()
+        self.product_ids = (frame["product_id"] if "product_id" in frame.columns else frame.index).tolist()
+        self._position_of_product = {pid: i for i, pid in enumerate(self.product_ids)}
+        self._position_of_canonical = {}
+        for i, product in enumerate(self.products):
+            self._position_of_canonical.setdefault(product, i)
+
+        # Calculate nutrition per package (dataset is per 100g)
+        self.nutrition = nutrient_matrix(frame)
+        self.nutrient_names = [name for name in NUTRIENTS if name in frame.columns]
+        if "category" in frame.columns:
+            self.perishable = frame["category"].isin(PERISHABLE_CATEGORIES).tolist()
+            self.processed = [processing_level(str(c)) == "Processed" for c in frame["category"]]
+        else:
+            self.perishable = [False] * len(frame)
+            self.processed = [False] * len(frame)
+        self.typical_prices = (frame["_typical_price"].tolist() if "_typical_price" in frame.columns
+                               else self.prices)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def position_of(self, product_id, canonical_id=None) -> Optional[int]:
+        """
+        Candidate position of a product_id. If that exact offer isn't a
+        candidate, the best-ranked offer of canonical_id; else None.
+        """
+        position = self._position_of_product.get(product_id)
+        if position is None and canonical_id is not None:
+            position = self._position_of_canonical.get(canonical_id)
+        return position
+
+    def max_cluster_budget(self, budget: float) -> float:
+        # Max 35% of budget per cluster when ML clusters are in play
+        if self.use_ml and "cluster_label" in self.frame.columns:
+            return budget * 0.35
+        return budget
+
+    def limit_columns(self, limits: Optional[dict]) -> list:
+        """(amount per candidate, maximum) pairs for nutrient limits, as _greedy_walk() takes them."""
+        names = list(NUTRIENTS)
+        return [(self.nutrition[:, names.index(name)].tolist(), cap) for name, cap in (limits or {}).items()]
+
+    def walk_order(self, seed: Optional[int] = None, allowed: Optional[np.ndarray] = None) -> Optional[list]:
+        """
+        Candidate positions in the order the greedy walk tries them.
+
+        Without a seed this is the ranked order (None when nothing is
+        filtered out). With one, it is a variety sample: every candidate's
+        key is -rank / VARIETY_TEMPERATURE plus Gumbel noise from the seeded
+        generator, and the VARIETY_POOL largest keys (found with a partial
+        sort) come first in key order, which draws them without replacement
+        with probability proportional to exp(-rank / VARIETY_TEMPERATURE).
+        Ranks stand in for value_metric because its scale differs by goal
+        and diet. The rest follow in ranked order. Nothing is re-scored and
+        the same seed always gives the same order.
+
+        Args:
+            seed: Variety seed (None: ranked order)
+            allowed: Optional boolean mask of candidates the walk may try
+        """
+        if seed is None:
+            return None if allowed is None else np.flatnonzero(allowed).tolist()
+
+        n = len(self)
+        keys = -np.arange(n) / VARIETY_TEMPERATURE + np.random.default_rng(seed).gumbel(size=n)
+        k = min(VARIETY_POOL, n)
+        top = np.argpartition(-keys, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-keys[top], kind="stable")]
+        sampled = np.zeros(n, dtype=bool)
+        sampled[top] = True
+        order = np.concatenate([top, np.flatnonzero(~sampled)])
+        if allowed is not None:
+            order = order[allowed[order]]
+        return order.tolist()
+
+    def select(self, budget: float, max_stores: Optional[int] = None,
+               preferred_stores: Optional[list] = None, skip=(), limits: Optional[dict] = None,
+               seed: Optional[int] = None) -> tuple:
+        """
+        4. Intelligent Selection with Variety Optimization
+
+        Args:
+            skip: Candidate positions that must not be bought
+            limits: nutrient -> maximum for the whole basket
+                    (nutrients.resolve_limits())
+            seed: Variety seed; walk a seeded sample of the top candidates
+                  instead of the ranked order (see walk_order())
+
+        Returns:
+            (positions, spend) of the basket's candidates
+        """
+        limit_columns = self.limit_columns(limits)
+        if (max_stores or preferred_stores) and "store" in self.frame.columns:
+            return self._select_within_stores([budget], max_stores, preferred_stores, skip, limit_columns, seed)[0]
+        return _greedy_walk(self.prices, self.clusters, budget, self.max_cluster_budget(budget),
+                            self.walk_order(seed), self.names, skip=skip, limits=limit_columns)
+
+    def select_budgets(self, budgets: list, max_stores: Optional[int] = None,
+                       preferred_stores: Optional[list] = None, limits: Optional[dict] = None,
+                       seed: Optional[int] = None) -> list:
+        """
+        select() for several budgets in one walk over the candidates.
+
+        Gives the same baskets as calling select() per budget, but every
+        candidate is tried for all budgets at once (_greedy_walk_budgets())
+        and the store search walks each store subset once.
+
+        Returns:
+            [(positions, spend)] per budget, in budgets order
+        """
+        limit_columns = self.limit_columns(limits)
+        if (max_stores or preferred_stores) and "store" in self.frame.columns:
+            return self._select_within_stores(budgets, max_stores, preferred_stores, (), limit_columns, seed)
+        return _greedy_walk_budgets(self.prices, self.clusters, budgets,
+                                    [self.max_cluster_budget(budget) for budget in budgets],
+                                    self.walk_order(seed), self.names, limits=limit_columns)
+
+    def stores_of(self, positions: list) -> np.ndarray:
+        """Mask of the candidates sold at the stores of the candidates at positions."""
+        stores = self.frame["store"].to_numpy()
+        return np.isin(stores, list({stores[p] for p in positions}))
+
+    def select_weeks(self, budget: float, weeks: int, max_stores: Optional[int] = None,
+                     preferred_stores: Optional[list] = None, limits: Optional[dict] = None,
+                     seed: Optional[int] = None) -> list:
+        """
+        Baskets for consecutive weeks from one walk (see _horizon_walk()).
+
+        Store-limited plans first pick their stores as for a one-week
+        basket, then every week shops at those stores.
+
+        Args:
+            budget: Budget per week
+            weeks: Number of weeks
+            limits: nutrient -> maximum per week
+            seed: As for select()
+
+        Returns:
+            [(positions, spend)] per week
+        """
+        allowed = None
+        if (max_stores or preferred_stores) and "store" in self.frame.columns:
+            positions, _ = self.select(budget, max_stores, preferred_stores, limits=limits, seed=seed)
+            allowed = self.stores_of(positions)
+        order = self.walk_order(seed, allowed)
+        return _horizon_walk(self.prices, self.clusters, self.names, self.perishable, weeks, budget,
+                             self.max_cluster_budget(budget), order, self.limit_columns(limits))
+
+    def objectives(self, positions: list, spend: float, targets: dict) -> dict:
+        """
+        Pareto objectives of a basket: cost, coverage (mean share of each
+        "min" nutrient target reached, capped at 1 per nutrient) and
+        processedShare (share of items that are processing_level() "Processed").
+        """
+        columns, amounts = self._min_targets(targets)
+        reached = (np.ones(len(positions)) @ self.nutrition[positions][:, columns]) / amounts
+        return {
+            "cost": round(spend, 2),
+            "coverage": round(float(np.minimum(reached, 1.0).mean()), 3) if len(columns) else 0.0,
+            "processedShare": round(sum(self.processed[p] for p in positions) / len(positions), 3) if positions else 0.0,
+        }
+
+    def _min_targets(self, targets: dict) -> tuple:
+        """Nutrition columns and plan amounts of the "min" targets the catalog has data for."""
+        names = [name for name, (_, kind) in NUTRIENTS.items()
+                 if kind == "min" and name in self.nutrient_names and targets[name] > 0]
+        return [list(NUTRIENTS).index(name) for name in names], np.array([targets[name] for name in names])
+
+    def alternatives(self, budget: float, targets: dict, basket: list = (), count: int = MAX_ALTERNATIVES,
+                     max_stores: Optional[int] = None, preferred_stores: Optional[list] = None,
+                     limits: Optional[dict] = None) -> list:
+        """
+        Baskets trading off cost, nutrient coverage and processed share.
+
+        Candidate baskets come from greedy walks over re-weighted orders of
+        the same arrays: each of PARETO_WEIGHTS blends the value rank, the
+        rank of target coverage per dollar and whether an item is processed,
+        and each order is walked at every share of PARETO_BUDGET_SHARES of
+        the budget. Baskets dominated on all three objectives (by each
+        other or by basket) are dropped.
+
+        Args:
+            budget, targets, limits: As for the plan (targets from
+                                     nutrients.plan_targets())
+            basket: Positions of the plan itself; never returned
+            count: Most baskets to return (spread over the cost range)
+            max_stores, preferred_stores: Alternatives shop at the stores
+                                          of a select() basket for them
+
+        Returns:
+            [(positions, spend, objectives())], cheapest first
+        """
+        n = len(self)
+        if not n:
+            return []
+        allowed = np.ones(n, dtype=bool)
+        if (max_stores or preferred_stores) and "store" in self.frame.columns:
+            positions, _ = self.select(budget, max_stores, preferred_stores, limits=limits)
+            allowed = self.stores_of(positions)
+
+        # Scores in [0, 1] per candidate: value rank, coverage-per-dollar rank, not processed
+        value = np.linspace(1.0, 0.0, n)
+        columns, amounts = self._min_targets(targets)
+        prices = np.asarray(self.prices, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            density = np.where(prices > 0, (self.nutrition[:, columns] / amounts).sum(axis=1) / prices, 0.0)
+        nutrition = 1.0 - np.argsort(np.argsort(-density, kind="stable")) / max(n - 1, 1)
+        whole = 1.0 - np.asarray(self.processed, dtype=float)
+        limit_columns = self.limit_columns(limits)
+
+        found = {frozenset(basket): (list(basket), sum(self.prices[p] for p in basket))}
+        for value_weight, nutrition_weight, whole_weight in PARETO_WEIGHTS:
+            order = np.argsort(-(value_weight * value + nutrition_weight * nutrition + whole_weight * whole),
+                               kind="stable")
+            order = order[allowed[order]].tolist()
+            for share in PARETO_BUDGET_SHARES:
+                positions, spend = _greedy_walk(self.prices, self.clusters, budget * share,
+                                                self.max_cluster_budget(budget * share), order, self.names,
+                                                limits=limit_columns)
+                found.setdefault(frozenset(positions), (sorted(positions), spend))
+
+        scored = [(key, positions, spend, self.objectives(positions, spend, targets))
+                  for key, (positions, spend) in found.items() if positions]
+
+        def dominates(a, b):
+            return (a["cost"] <= b["cost"] and a["coverage"] >= b["coverage"]
+                    and a["processedShare"] <= b["processedShare"] and a != b)
+
+        frontier = [(positions, spend, objectives) for key, positions, spend, objectives in scored
+                    if key != frozenset(basket) and not any(dominates(other[3], objectives) for other in scored)]
+        frontier.sort(key=lambda alternative: alternative[2]["cost"])
+        if len(frontier) > count:
+            frontier = [frontier[round(i * (len(frontier) - 1) / max(count - 1, 1))] for i in range(count)]
+        return frontier
+
+    def _select_within_stores(self, budgets: list, max_stores: Optional[int],
+                              preferred_stores: Optional[list], skip=(), limit_columns=None,
+                              seed: Optional[int] = None) -> list:
+        """
+        Greedy walk restricted to the best subset of at most max_stores stores.
+
+        Each store's candidates are already in value order within the sorted
+        candidates, so a subset's walk order is a merge of per-store position
+        lists and costs no re-scoring or re-sorting of the frame. Subsets are
+        grown one store at a time with a beam search (STORE_BEAM_WIDTH subsets
+        kept per round), starting from preferred_stores, and a subset is worth
+        the summed value_metric of the basket its walk buys. With a seed,
+        subsets filter the variety order instead.
+
+        Each budget gets its own beam search, but a store subset is walked
+        once for all budgets (_greedy_walk_budgets()).
+
+        Returns:
+            [(positions, spend)] per budget
+        """
+        codes, stores = pd.factorize(self.frame["store"].astype(str))
+        variety = np.asarray(self.walk_order(seed)) if seed is not None else None
+        store_positions = [np.flatnonzero(codes == code) for code in range(len(stores))]
+        values = self.frame["value_metric"].to_numpy(dtype=float)
+        values = np.where(np.isnan(values), 0.0, values)  # summed as np.nansum() would
+        max_cluster_budgets = [self.max_cluster_budget(budget) for budget in budgets]
+
+        code_by_name = {name.lower(): code for code, name in enumerate(stores)}
+        start = frozenset(code_by_name[name.lower()] for name in (preferred_stores or []) if name.lower() in code_by_name)
+        if not max_stores and not start:
+            # Only unknown preferred stores (requests are validated against the
+            # catalog, see validation.check_catalog_params): no store limit
+            logger.warning(f"None of the preferred stores are in the catalog: {preferred_stores}")
+            return _greedy_walk_budgets(self.prices, self.clusters, budgets, max_cluster_budgets,
+                                        self.walk_order(seed), self.names, skip=skip, limits=limit_columns)
+        if not max_stores:
+            max_stores = len(start)
+
+        evaluated = {}
+
+        def evaluate(subset):
+            # (worth, positions, spend) of the subset's basket, per budget
+            if subset not in evaluated:
+                if subset and variety is not None:
+                    order = variety[np.isin(codes[variety], list(subset))].tolist()
+                elif subset:
+                    order = np.sort(np.concatenate([store_positions[code] for code in subset])).tolist()
+                else:
+                    order = []
+                baskets = _greedy_walk_budgets(self.prices, self.clusters, budgets, max_cluster_budgets,
+                                               order, self.names, skip=skip, limits=limit_columns)
+                evaluated[subset] = [
+                    (float(np.add.reduce(values[positions])) if positions else float("-inf"), positions, spend)
+                    for positions, spend in baskets]
+            return evaluated[subset]
+
+        selected = []
+        for k in range(len(budgets)):
+            best = evaluate(start)[k]
+            beam = [start]
+            while beam and len(beam[0]) < max_stores:
+                grown = {subset | {code} for subset in beam for code in range(len(stores)) if code not in subset}
+                beam = sorted(grown, key=lambda subset: evaluate(subset)[k][0], reverse=True)[:STORE_BEAM_WIDTH]
+                if beam and evaluate(beam[0])[k][0] > best[0]:
+                    best = evaluate(beam[0])[k]
+            selected.append((best[1], best[2]))
+
+        logger.debug(f"Store search: {len(evaluated)} subsets evaluated")
+        return selected
+
+    def totals(self, positions: list, spend: float, budget: float, people: int,
+               targets: Optional[dict] = None, quantities: Optional[list] = None) -> tuple:
+        """
+        Nutrition totals and coverage of a basket.
+
+        Args:
+            targets: nutrients.plan_targets() of the plan (default: people
+                     reference adults)
+            quantities: Units bought per position (default: 1 each)
+
+        Returns:
+            (totals, coverage) as in the planner() response
+        """
+        if targets is None:
+            targets = plan_targets(people)
+
+        # One product of the quantities with the basket's rows of the nutrient matrix
+        quantities = np.ones(len(positions)) if quantities is None else np.asarray(quantities, dtype=float)
+        amounts = [round(float(amount)) for amount in quantities @ self.nutrition[positions]]
+
+        totals = {"total_spent": round(spend, 2), "budget": budget}
+        for name, amount in zip(NUTRIENTS, amounts):
+            if name in REPORTED_TOTALS or name in self.nutrient_names:
+                totals[name] = amount
+
+        coverage = nutrient_coverage(amounts, targets, set(REPORTED_COVERAGE) | set(self.nutrient_names))
+        return totals, coverage
+
+    def items(self, positions: list, quantities: Optional[list] = None) -> list:
+        """Basket item dicts for the candidates at positions (quantities default to 1)."""
+        private = [column for column in self.frame.columns if column.startswith("_")]
+        items = self.frame.iloc[positions].drop(columns=private).to_dict("records")
+        for item, position, qty in zip(items, positions, quantities or [1] * len(positions)):
+            item["estimated_cost"] = round(self.prices[position] * qty, 2)
+            item["quantity_units"] = qty
+        return items
+
+
+def build_plan(ranked: RankedCandidates, positions: list, spend: float, inputs: dict,
+               targets: Optional[dict] = None, quantities: Optional[list] = None) -> Dict[str, Any]:
+    """
+    5. Compute Totals: the planner() response for a selected basket.
+
+    Args:
+        ranked: Candidates the basket was selected from
+        positions, spend: From RankedCandidates.select()
+        inputs: Request echo; budget (per week), people and weeks are read from it
+        targets: nutrients.plan_targets() for coverage (default: people
+                 reference adults)
+        quantities: Units bought per position (default: 1 each)
+    """
+    basket = ranked.items(positions, quantities)
+    totals, coverage = ranked.totals(positions, spend, inputs["budget"] * inputs.get("weeks", 1),
+                                     inputs["people"], targets, quantities)
     
     cluster_counts = {}
     processing_counts = {}
+    store_breakdown = {}
     
-    for item in basket:
+    for position, item in zip(positions, basket):
         qty = item["quantity_units"]
-        totals["calories"] += item["_calories"] * qty
-        totals["protein"] += item["_protein"] * qty
-        totals["fiber"] += item["_fiber"] * qty
         
         # Cluster breakdown
         c_lbl = item.get("cluster_label", "Unknown")
         cluster_counts[c_lbl] = cluster_counts.get(c_lbl, 0) + qty
         
         # Processing breakdown (estimate based on category)
-        category = item.get("category", "Unknown")
-        if "Frozen" in category or "Snack" in category:
-            processing_level = "Processed"
-        elif "Meat" in category or "Dairy" in category:
-            processing_level = "Minimally Processed"
-        else:
-            processing_level = "Whole Foods"
-        processing_counts[processing_level] = processing_counts.get(processing_level, 0) + qty
+        level = processing_level(item.get("category", "Unknown"))
+        processing_counts[level] = processing_counts.get(level, 0) + qty
 
-    # Round totals
-    totals["calories"] = round(totals["calories"])
-    totals["protein"] = round(totals["protein"])
-    totals["fiber"] = round(totals["fiber"])
-    
-    # Calculate coverage (daily needs for 'people' over a week)
-    # Assume 2000 cal/day, 50g protein/day per person
-    daily_cal_per_person = 2000
-    daily_protein_per_person = 50
-    total_days = 7  # weekly plan
-    
-    target_calories = daily_cal_per_person * people * total_days
-    target_protein = daily_protein_per_person * people * total_days
-    
-    coverage = {
-        "calories": {
-            "actual": totals["calories"],
-            "target": target_calories,
-            "percentage": round((totals["calories"] / target_calories) * 100, 1) if target_calories > 0 else 0
-        },
-        "protein": {
-            "actual": totals["protein"],
-            "target": target_protein,
-            "percentage": round((totals["protein"] / target_protein) * 100, 1) if target_protein > 0 else 0
-        }
-    }
+        # Per-store subtotals
+        store = store_breakdown.setdefault(item.get("store", "Unknown"), {"items": 0, "subtotal": 0.0})
+        store["items"] += qty
+        store["subtotal"] += ranked.prices[position] * qty
+
+    for store in store_breakdown.values():
+        store["subtotal"] = round(store["subtotal"], 2)
     
-    # Calculate cost savings
-    # Estimate: typical basket with same nutrition would cost ~18% more
-    # (based on users buying branded/convenience items vs optimized selection)
-    typical_cost = totals["total_spent"] * 1.18
+    # Calculate cost savings against a typical basket: the same kinds of
+    # items and package sizes at the median price of their sub-category
+    typical_cost = sum(ranked.typical_prices[p] * item["quantity_units"] for p, item in zip(positions, basket))
     savings_amount = typical_cost - totals["total_spent"]
     savings_percentage = round((savings_amount / typical_cost) * 100, 1) if typical_cost > 0 else 0
     
@@ -218,20 +862,370 @@ def planner(budget: float, people: int, diet_type: str, goal: str, df: pd.DataFr
         "percentage": savings_percentage,
         "typical_cost": round(typical_cost, 2)
     }
-    
-    # Clean up basket (remove internal fields)
-    for item in basket:
-        item["estimated_cost"] = round(item["estimated_cost"], 2)
-        del item["_calories"]
-        del item["_protein"]
-        del item["_fiber"]
 
     return {
-        "inputs": { "budget": budget, "people": people, "dietType": diet_type, "goal": goal },
+        "inputs": inputs,
+        "planToken": encode_plan_token(inputs, [ranked.product_ids[p] for p in positions]),
         "items": basket,
         "totals": totals,
         "coverage": coverage,
         "savings": savings,
         "clusterBreakdown": cluster_counts,
-        "processingBreakdown": processing_counts
+        "processingBreakdown": processing_counts,
+        "storeBreakdown": store_breakdown
+    }
+
+
+def _plan_inputs(budget, people, diet_type, goal, max_stores=None, preferred_stores=None,
+                 household=None, nutrient_limits=None, weeks=1, seed=None, exclusions=()) -> dict:
+    inputs = { "budget": budget, "people": people, "dietType": diet_type, "goal": goal }
+    if weeks > 1:
+        inputs["weeks"] = weeks
+    if max_stores:
+        inputs["maxStores"] = max_stores
+    if preferred_stores:
+        inputs["preferredStores"] = list(preferred_stores)
+    if household:
+        inputs["household"] = household
+    if nutrient_limits:
+        inputs["nutrientLimits"] = nutrient_limits
+    if seed is not None:
+        inputs["seed"] = seed
+    if exclusions:
+        inputs["exclude"] = list(exclusions)
+    return inputs
+
+
+def planner(budget: float, people: int, diet_type: str, goal: str, df: pd.DataFrame, use_ml: bool = True,
+            ml_scores: Optional[pd.Series] = None, stats: Optional[dict] = None,
+            max_stores: Optional[int] = None, preferred_stores: Optional[list] = None,
+            canonical_ids: Optional[pd.Series] = None, household: Optional[list] = None,
+            nutrient_limits=None, weeks: int = 1, alternatives: int = 0,
+            seed: Optional[int] = None, exclusions: tuple = ()) -> Dict[str, Any]:
+    """
+    Generates a grocery plan using ML-powered intelligent selection or greedy fallback.
+    
+    Args:
+        budget: Weekly budget in dollars
+        people: Number of people
+        diet_type: Diet preference (veg/non-veg/vegan)
+        goal: Health goal (balanced/high_protein/low_sugar)
+        df: Product dataframe
+        use_ml: Use ML models for selection (default True)
+        ml_scores: Precomputed calculate_ml_score() values indexed like df
+                   (e.g. CatalogSnapshot.ml_scores()); computed per call if omitted
+        stats: Optional dict that receives per-stage timings in seconds
+               (stats["stages"]: filter/score/sort/select/totals) and the
+               scoring path used (stats["path"]: "ml" or "fallback")
+        max_stores: Buy from at most this many stores (best subset is searched)
+        preferred_stores: Stores to shop at. On their own they limit the basket
+                          to those stores; with max_stores they are always
+                          included and the remaining slots are searched
+        canonical_ids: products.canonical_product_ids() indexed like df
+                       (e.g. CatalogSnapshot.canonical_ids); computed per
+                       call if omitted. Only the cheapest offer of each
+                       product is considered (per store when stores are limited)
+        household: Optional {"age", "sex"} per person; coverage targets are
+                   the sum of their profiles (nutrients.py) instead of people
+                   reference adults
+        nutrient_limits: Optional nutrients each week's basket must stay
+                         under: "max" nutrient names (at the weekly target)
+                         or a dict of nutrient -> amount per week
+        weeks: Plan this many weeks (1 to MAX_WEEKS) at budget per week in
+               one pass over the ranked candidates (see plan_weeks())
+        alternatives: Also return up to this many baskets from the Pareto
+                      set of cost, nutrient coverage and processed share
+                      (see RankedCandidates.alternatives()); one-week plans
+        seed: Variety mode: pick from a seeded sample of the top candidates
+              (RankedCandidates.walk_order()), so returning users get a
+              different basket per seed and the same basket for the same seed
+        exclusions: Allergen/attribute tags and "brand:<name>" entries
+                    (allergens.parse_exclusions()); matching products are
+                    never candidates
+    """
+    stages = {}
+    ranked = rank_candidates(df, diet_type, goal, use_ml=use_ml, ml_scores=ml_scores, canonical_ids=canonical_ids,
+                             by_store=bool(max_stores or preferred_stores), stages=stages, exclusions=exclusions)
+
+    inputs = _plan_inputs(budget, people, diet_type, goal, max_stores, preferred_stores, household, nutrient_limits,
+                          weeks, seed, exclusions)
+
+    sorted_at = time.perf_counter()
+    if weeks > 1:
+        result = plan_weeks(ranked, inputs, weeks, max_stores, preferred_stores, household, nutrient_limits, seed)
+        selected_at = time.perf_counter()
+    else:
+        targets = plan_targets(people, household)
+        limits = resolve_limits(nutrient_limits, targets)
+        positions, spend = ranked.select(budget, max_stores, preferred_stores, limits=limits, seed=seed)
+        selected_at = time.perf_counter()
+        result = build_plan(ranked, positions, spend, inputs, targets)
+        if alternatives:
+            result["objectives"] = ranked.objectives(positions, spend, targets)
+            result["alternatives"] = [
+                _alternative(ranked, alternative, inputs, targets)
+                for alternative in ranked.alternatives(budget, targets, positions, alternatives, max_stores,
+                                                       preferred_stores, limits)]
+
+    if stats is not None:
+        stages["select"] = selected_at - sorted_at
+        stages["totals"] = time.perf_counter() - selected_at
+        stats["path"] = "ml" if ranked.use_ml else "fallback"
+        stats["stages"] = stages
+
+    return result
+
+
+def plan_weeks(ranked: RankedCandidates, inputs: dict, weeks: int, max_stores: Optional[int] = None,
+               preferred_stores: Optional[list] = None, household: Optional[list] = None,
+               nutrient_limits=None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    A plan over several weeks from one ranking and one walk.
+
+    Every week gets the weekly budget, cluster caps and nutrient limits.
+    Products don't repeat in consecutive weeks and perishables are spread
+    over the weekly trips (see _horizon_walk()).
+
+    Args:
+        ranked: rank_candidates() for the plan's diet and goal
+        inputs: _plan_inputs() of the plan (budget is per week)
+        weeks: Number of weeks
+        Other args: As for planner()
+
+    Returns:
+        planner() response for the whole period (items carry quantity_units
+        and the weeks they are bought in; totals and coverage cover all
+        weeks) plus schedule: per week, its items, subtotal and number of
+        perishable items
+    """
+    weekly_targets = plan_targets(inputs["people"], household)
+    baskets = ranked.select_weeks(inputs["budget"], weeks, max_stores, preferred_stores,
+                                  limits=resolve_limits(nutrient_limits, weekly_targets), seed=seed)
+
+    weeks_of = {}
+    for week, (positions, _) in enumerate(baskets, start=1):
+        for position in positions:
+            weeks_of.setdefault(position, []).append(week)
+    positions = sorted(weeks_of)
+    quantities = [len(weeks_of[p]) for p in positions]
+    spend = sum(total for _, total in baskets)
+
+    targets = plan_targets(inputs["people"], household, days=PLAN_DAYS * weeks)
+    result = build_plan(ranked, positions, spend, inputs, targets, quantities)
+    for item, position in zip(result["items"], positions):
+        item["weeks"] = weeks_of[position]
+
+    result["schedule"] = []
+    for week, (week_positions, total) in enumerate(baskets, start=1):
+        items = _delta_items(ranked, week_positions)
+        for item, position in zip(items, week_positions):
+            item["perishable"] = ranked.perishable[position]
+        result["schedule"].append({
+            "week": week,
+            "itemCount": len(items),
+            "subtotal": round(total, 2),
+            "perishableItems": sum(item["perishable"] for item in items),
+            "items": items,
+        })
+    return result
+
+
+def _alternative(ranked: RankedCandidates, alternative: tuple, inputs: dict, targets: dict) -> dict:
+    positions, spend, objectives = alternative
+    totals, coverage = ranked.totals(positions, spend, inputs["budget"], inputs["people"], targets)
+    return {
+        "objectives": objectives,
+        "itemCount": len(positions),
+        "totals": totals,
+        "coverage": coverage,
+        "items": _delta_items(ranked, positions),
+        "planToken": encode_plan_token(inputs, [ranked.product_ids[p] for p in positions]),
+    }
+
+
+def _delta_items(ranked: RankedCandidates, positions: list) -> list:
+    columns = [c for c in ("product_id", "product_name", "store") if c in ranked.frame.columns]
+    items = ranked.frame.iloc[positions][columns].to_dict("records")
+    for item, position in zip(items, positions):
+        item["estimated_cost"] = round(ranked.prices[position], 2)
+    return items
+
+
+def plan_sweep(budgets: list, people: int, diet_type: str, goal: str, df: pd.DataFrame, use_ml: bool = True,
+               ml_scores: Optional[pd.Series] = None, stats: Optional[dict] = None,
+               max_stores: Optional[int] = None, preferred_stores: Optional[list] = None,
+               canonical_ids: Optional[pd.Series] = None, household: Optional[list] = None,
+               nutrient_limits=None, seed: Optional[int] = None, exclusions: tuple = ()) -> Dict[str, Any]:
+    """
+    Plans for several budgets from one scoring pass.
+
+    Scoring and sorting don't depend on the budget, so candidates are ranked
+    once and all baskets come from one walk over the ranked candidates that
+    tries each candidate for every budget at once
+    (RankedCandidates.select_budgets()). If stores are limited, each store
+    subset is walked once for all budgets. The baskets are the same as
+    planner() would pick per budget. Baskets for nearby budgets share most
+    items, so the response carries the first basket and then only what
+    changes from one budget to the next.
+
+    Args:
+        budgets: Budgets in dollars (sorted ascending in the response)
+        Other args: As for planner()
+
+    Returns:
+        Dict with inputs, curve (per budget: budget, itemCount, totals and
+        coverage) and deltas (per budget: fromBudget, toBudget, added and
+        removed items; the first delta has fromBudget None and adds the
+        whole first basket)
+    """
+    stages = {}
+    ranked = rank_candidates(df, diet_type, goal, use_ml=use_ml, ml_scores=ml_scores, canonical_ids=canonical_ids,
+                             by_store=bool(max_stores or preferred_stores), stages=stages, exclusions=exclusions)
+
+    targets = plan_targets(people, household)
+    limits = resolve_limits(nutrient_limits, targets)
+
+    sorted_at = time.perf_counter()
+    curve, deltas = [], []
+    previous_budget, previous = None, []
+    budgets = sorted(budgets)
+    baskets = ranked.select_budgets(budgets, max_stores, preferred_stores, limits=limits, seed=seed)
+
+    # Records of every item in any basket, from one slice of the frame
+    in_any = sorted({p for positions, _ in baskets for p in positions})
+    records = dict(zip(in_any, _delta_items(ranked, in_any)))
+
+    for budget, (positions, spend) in zip(budgets, baskets):
+        totals, coverage = ranked.totals(positions, spend, budget, people, targets)
+        curve.append({"budget": budget, "itemCount": len(positions), "totals": totals, "coverage": coverage})
+
+        kept, had = set(positions), set(previous)
+        deltas.append({
+            "fromBudget": previous_budget,
+            "toBudget": budget,
+            "added": [records[p] for p in positions if p not in had],
+            "removed": [records[p] for p in previous if p not in kept],
+        })
+        previous_budget, previous = budget, positions
+
+    if stats is not None:
+        stages["select"] = time.perf_counter() - sorted_at
+        stats["path"] = "ml" if ranked.use_ml else "fallback"
+        stats["stages"] = stages
+
+    inputs = _plan_inputs(None, people, diet_type, goal, max_stores, preferred_stores, household, nutrient_limits,
+                          seed=seed, exclusions=exclusions)
+    del inputs["budget"]
+    inputs["budgets"] = budgets
+    return {"inputs": inputs, "curve": curve, "deltas": deltas}
+
+
+def adjust_plan(ranked: RankedCandidates, prior_ids: list, budget: float, people: int, diet_type: str, goal: str,
+                exclude=(), pin=(), max_stores: Optional[int] = None, preferred_stores: Optional[list] = None,
+                canonical_of: Optional[dict] = None, stats: Optional[dict] = None,
+                household: Optional[list] = None, nutrient_limits=None,
+                seed: Optional[int] = None, exclusions: tuple = ()) -> Dict[str, Any]:
+    """
+    Repair an existing basket after a small edit instead of planning from scratch.
+
+    The prior items are kept unless excluded. If the (new) budget, a
+    cluster cap or a nutrient limit is exceeded, the lowest-ranked unpinned
+    items are dropped first. Pinned products are added and never dropped, even if they alone
+    exceed the budget. The greedy walk then tops the basket up from the
+    same ranked candidates. For store-limited plans it only buys from stores
+    already in the basket. Most items therefore survive an edit, and the
+    cost is one walk with no scoring.
+
+    Args:
+        ranked: rank_candidates() for the plan's diet and goal (reused across
+                requests, e.g. CatalogSnapshot.ranked())
+        prior_ids: product_ids of the prior basket
+        budget, people, diet_type, goal, max_stores, preferred_stores,
+        household, nutrient_limits, seed, exclusions: The plan's inputs after
+        the edit (ranked must already leave out exclusions)
+        exclude: product_ids to remove; other offers of the same product are
+                 excluded too
+        pin: product_ids to keep in the basket (an offer of the same product
+             is used if that exact one isn't a candidate)
+        canonical_of: product_id -> canonical product id for the catalog
+                      (CatalogSnapshot.canonical_of)
+        stats: As for planner() (select and totals stages only)
+
+    Returns:
+        planner() response plus adjustments: added and removed product_ids,
+        and unavailable ones (pins or prior items that aren't candidates)
+    """
+    started = time.perf_counter()
+    canonical_of = canonical_of or {}
+    unavailable = []
+
+    def resolve(product_ids):
+        positions = []
+        for product_id in product_ids:
+            position = ranked.position_of(product_id, canonical_of.get(product_id))
+            if position is None:
+                unavailable.append(product_id)
+            elif position not in positions:
+                positions.append(position)
+        return positions
+
+    excluded_products = set()
+    for product_id in exclude:
+        position = ranked.position_of(product_id)
+        product = canonical_of.get(product_id, ranked.products[position] if position is not None else None)
+        if product is not None:
+            excluded_products.add(product)
+    skip = {i for i, product in enumerate(ranked.products) if product in excluded_products}
+
+    pinned = [p for p in resolve(pin) if p not in skip]
+    kept = [p for p in resolve(prior_ids) if p not in skip and p not in pinned]
+
+    targets = plan_targets(people, household)
+    limits = resolve_limits(nutrient_limits, targets)
+    limit_columns = ranked.limit_columns(limits)
+
+    # Shrink: drop the lowest-ranked unpinned items while over budget, a cluster cap or a nutrient limit
+    max_cluster_budget = ranked.max_cluster_budget(budget)
+    kept.sort()
+    while kept:
+        basket = pinned + kept
+        spend = sum(ranked.prices[p] for p in basket)
+        cluster_spend = {}
+        for p in basket:
+            cluster_spend[ranked.clusters[p]] = cluster_spend.get(ranked.clusters[p], 0.0) + ranked.prices[p]
+        if spend > budget or any(sum(amounts[p] for p in basket) > cap for amounts, cap in limit_columns):
+            kept.pop()
+            continue
+        over_cap = [p for p in kept if cluster_spend[ranked.clusters[p]] > max_cluster_budget]
+        if not over_cap:
+            break
+        kept.remove(over_cap[-1])
+
+    # Top up from the ranked candidates
+    start = pinned + kept
+    store_limited = bool(max_stores or preferred_stores) and "store" in ranked.frame.columns
+    if store_limited and not start:
+        positions, spend = ranked.select(budget, max_stores, preferred_stores, skip=skip, limits=limits, seed=seed)
+    else:
+        order = ranked.walk_order(seed, ranked.stores_of(start) if store_limited else None)
+        positions, spend = _greedy_walk(ranked.prices, ranked.clusters, budget, max_cluster_budget, order,
+                                        ranked.names, start=start, skip=skip, limits=limit_columns)
+    positions.sort()
+    selected_at = time.perf_counter()
+
+    inputs = _plan_inputs(budget, people, diet_type, goal, max_stores, preferred_stores, household, nutrient_limits,
+                          seed=seed, exclusions=exclusions)
+    result = build_plan(ranked, positions, spend, inputs, targets)
+    new_ids = [ranked.product_ids[p] for p in positions]
+    had, has = set(prior_ids), set(new_ids)
+    result["adjustments"] = {
+        "added": [pid for pid in new_ids if pid not in had],
+        "removed": [pid for pid in prior_ids if pid not in has],
+        "unavailable": unavailable,
     }
+
+    if stats is not None:
+        stats["path"] = "ml" if ranked.use_ml else "fallback"
+        stats["stages"] = {"select": selected_at - started, "totals": time.perf_counter() - selected_at}
+
+    return result
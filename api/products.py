@@ -0,0 +1,133 @@
+"""
+Canonical products: the same item sold by several stores
+
+The catalog lists each store's offer as its own row, so "Bacon 500g" can
+appear at IGA, Metro and Sobeys, under several brands (sometimes twice at
+one store). canonical_product_ids() gives every row the id of the product it
+offers, keyed on normalized name and package weight. A size written into the
+name ("Cola Soda 1kg") is dropped from the name because the weight is
+already part of the key, and so is a pack descriptor ("Skim Milk Family
+Pack", "Value Pack", "Single Serve"): it names the same item in another
+package, whose weight is in the key too.
+
+Brand is left out on purpose: for a basket, 500g of bacon is the same item
+whichever brand sells it, and the planner keeps only the cheapest offer of
+each product, so a basket holds it once. The catalog has ~4900 rows but only
+~630 name and weight pairs, so keying on brand too (~4000 "products") let a
+basket hold the same item several times. Price comparison is the exception:
+/api/foods?group_by=product compares one brand's product across stores, so
+it uses by_brand=True ids.
+
+The catalog snapshot builds both sets of ids once at load time.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+_SIZE = re.compile(r"\b\d+(?:\.\d+)?\s*(?:kg|g|ml|l)\b")
+_PACK = re.compile(r"\b(?:(?:family|value|multi|bulk|party|economy) (?:pack|size)|single serve|multipack)\b")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(values: pd.Series) -> pd.Series:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return (values.fillna("").astype(str).str.lower()
+            .str.replace(_NON_WORD, " ", regex=True).str.strip())
+
+
+def _name_key(df: pd.DataFrame) -> pd.Series:
+    names = df["product_name"].astype(str).str.lower()
+    return normalize_text(names.str.replace(_SIZE, " ", regex=True).str.replace(_PACK, " ", regex=True))
+
+
+def canonical_product_ids(df: pd.DataFrame, by_brand: bool = False) -> pd.Series:
+    """
+    Canonical product id of every row (same index as df).
+
+    Rows share an id when their normalized product_name (without size
+    tokens and pack descriptors) and package_weight_g (to the gram) match, and with by_brand
+    their brand too. Missing columns are left out of the key.
+    """
+    if "product_name" not in df.columns:
+        return pd.Series(np.arange(len(df)), index=df.index)
+
+    key = _name_key(df)
+    if by_brand and "brand" in df.columns:
+        key = key + "|" + normalize_text(df["brand"])
+    if "package_weight_g" in df.columns:
+        key = key + "|" + df["package_weight_g"].round().astype("Int64").astype(str)
+
+    return pd.Series(pd.factorize(key)[0], index=df.index)
+
+
+def product_name_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Id of every row's normalized product_name without size tokens or pack
+    descriptors (same index as df), ignoring brand and package weight: rows share it when
+    they are the same kind of item, whatever the pack or store. Without
+    product_name every row gets its own id.
+    """
+    if "product_name" not in df.columns:
+        return pd.Series(np.arange(len(df)), index=df.index)
+    return pd.Series(pd.factorize(_name_key(df))[0], index=df.index)
+
+
+def cheapest_offers(df: pd.DataFrame, canonical_ids: pd.Series, by_store: bool = False) -> pd.DataFrame:
+    """
+    Keep the cheapest row of each canonical product, in df's row order.
+
+    Args:
+        df: Product rows (any subset of the catalog)
+        canonical_ids: canonical_product_ids() of the catalog (indexed like it)
+        by_store: Keep the cheapest offer per product and store instead
+
+    Returns:
+        Subset of df
+    """
+    price_column = "price_per_item" if "price_per_item" in df.columns else "price_per_100g"
+    key = pd.DataFrame({"product": canonical_ids.reindex(df.index)})
+    if by_store:
+        key["store"] = df["store"]
+    cheapest_first = key.loc[df[price_column].sort_values(kind="stable").index]
+    duplicate = cheapest_first.duplicated().reindex(df.index)
+    return df[~duplicate]
+
+
+def group_by_product(df: pd.DataFrame, canonical_ids: pd.Series, limit: int = None) -> list:
+    """
+    One record per canonical product in df, for GET /api/foods?group_by=product.
+
+    Each record is the product's cheapest offer plus canonical_id, min_price
+    and max_price (per item), offers (rows) and stores (sorted names) across
+    df, in df row order of the cheapest offers.
+
+    Args:
+        df: Product rows (already filtered)
+        canonical_ids: canonical_product_ids(by_brand=True) of the catalog
+        limit: Keep only the first this many products to appear in df
+    """
+    price_column = "price_per_item" if "price_per_item" in df.columns else "price_per_100g"
+    products = canonical_ids.reindex(df.index)
+    if limit is not None:
+        keep = products.isin(products.drop_duplicates().head(limit))
+        df, products = df[keep], products[keep]
+
+    grouped = df.groupby(products, sort=False)
+    summary = pd.DataFrame({
+        "min_price": grouped[price_column].min(),
+        "max_price": grouped[price_column].max(),
+        "offers": grouped.size(),
+    })
+    if "store" in df.columns:
+        stores = pd.DataFrame({"product": products, "store": df["store"].astype(str)}).drop_duplicates()
+        summary["stores"] = stores.sort_values("store").groupby("product")["store"].agg(list)
+    summary = summary.to_dict(orient="index")
+
+    cheapest = cheapest_offers(df, canonical_ids)
+    records = cheapest.to_dict(orient="records")
+    for record, product in zip(records, products.reindex(cheapest.index).tolist()):
+        record["canonical_id"] = product
+        record.update(summary[product])
+    return records
@@ -0,0 +1,170 @@
+"""
+On-demand request profiling for the NutriBudget API
+
+Off unless configured. When PROFILE_TOKEN and PROFILE_ALLOWLIST are both
+unset, RequestProfiler.enabled is False and the routes skip profiling with a
+single attribute check.
+
+A request to /api/plan or /api/foods is profiled when either:
+- it carries an X-Profile-Token header equal to PROFILE_TOKEN (admin, any
+  environment), or
+- its path is in PROFILE_ALLOWLIST (e.g. "/api/plan" on a staging box, where
+  every call to it is profiled)
+
+The call runs under cProfile in the request's own thread (plans are forced
+inline for that request, so pool workers don't hide the planner's time). The
+result is written to PROFILE_DIR as <request id>.pstats, and the response
+carries an X-Profile-Id header. Profiles are downloadable with the admin
+token from /admin/profiles/<id>, either as pstats (snakeviz, pstats.Stats)
+or as collapsed stacks for flamegraph.pl / speedscope.
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import tempfile
+import uuid
+
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class RequestProfiler:
+    """
+    Args:
+        token: Admin token that enables profiling per request (X-Profile-Token)
+        allowlist: Request paths that are always profiled
+        directory: Where .pstats files are kept (shared by workers on a host)
+        keep: Most recent profiles to keep; older ones are deleted
+    """
+
+    def __init__(self, token=None, allowlist=(), directory=None, keep=50):
+        self.token = token or None
+        self.allowlist = frozenset(allowlist or ())
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "nutribudget-profiles")
+        self.keep = keep
+        self.enabled = bool(self.token or self.allowlist)
+
+    def is_admin(self, headers) -> bool:
+        return self.token is not None and headers.get("X-Profile-Token") == self.token
+
+    def wants(self, path, headers) -> bool:
+        """Whether this request should be profiled (call only when enabled)."""
+        return path in self.allowlist or self.is_admin(headers)
+
+    @staticmethod
+    def request_id(headers) -> str:
+        """The caller's X-Request-ID if it is a safe file name, else a new one."""
+        request_id = headers.get("X-Request-ID", "")
+        return request_id if _PROFILE_ID.match(request_id) else uuid.uuid4().hex
+
+    def _path(self, profile_id):
+        if not _PROFILE_ID.match(profile_id):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}.pstats")
+
+    def run(self, profile_id, fn, *args, **kwargs):
+        """Call fn under cProfile and store the profile as profile_id."""
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args, **kwargs)
+        finally:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(self._path(profile_id))
+            self._prune()
+
+    def _prune(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".pstats")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in files[:-self.keep]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # another worker pruned it
+
+    def list(self) -> list:
+        """Stored profile ids, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".pstats")]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [entry.name[:-len(".pstats")] for entry in entries]
+
+    def pstats_bytes(self, profile_id) -> bytes:
+        """Raw pstats file. Raises KeyError if there is no such profile."""
+        try:
+            with open(self._path(profile_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(profile_id)
+
+    def collapsed(self, profile_id) -> str:
+        """Profile as collapsed stacks. Raises KeyError if there is no such profile."""
+        path = self._path(profile_id)
+        if not os.path.exists(path):
+            raise KeyError(profile_id)
+        return collapse_stats(pstats.Stats(path))
+
+
+def _label(func):
+    filename, line, name = func
+    return f"{name} ({os.path.basename(filename)}:{line})" if line else name
+
+
+def collapse_stats(stats: pstats.Stats, max_depth: int = 64, min_fraction: float = 0.001) -> str:
+    """
+    Convert pstats to collapsed stacks ("root;child;leaf <microseconds>").
+
+    cProfile records caller -> callee edges rather than whole stacks, so each
+    function's self time is split across its callers in proportion to the
+    time spent via each edge. This is the same approximation flameprof makes.
+
+    The number of caller paths grows exponentially with call-graph depth, so
+    a call path is only followed while its share of the profile's total time
+    is at least min_fraction (frames narrower than that don't show on a
+    flame graph). Shares along one depth add up to at most the total, so at
+    most max_depth / min_fraction paths are visited. Time below the cut is
+    reported as an "(other)" frame under the last followed function, so
+    totals still add up.
+    """
+    functions = stats.stats  # func -> (cc, nc, tottime, cumtime, callers)
+    callees = {}
+    for func, (_, _, _, _, callers) in functions.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, (_, _, _, _, callers) in functions.items() if not callers]
+    total = sum(functions[root][3] for root in roots)
+    min_time = total * min_fraction
+    labels = {func: _label(func) for func in functions}
+    lines = {}
+
+    def add(key, seconds):
+        us = int(seconds * 1e6)
+        if us > 0:
+            lines[key] = lines.get(key, 0) + us
+
+    def walk(func, stack, on_stack, share):
+        _, _, tottime, cumtime, _ = functions[func]
+        key = f"{stack};{labels[func]}" if stack else labels[func]
+        add(key, tottime * share)
+        if len(on_stack) + 1 >= max_depth:
+            return
+        on_stack = on_stack | {labels[func]}
+        pruned = 0.0
+        for callee, edge_cumtime in callees.get(func, []):
+            callee_cumtime = functions[callee][3]
+            if callee_cumtime <= 0 or labels[callee] in on_stack:
+                continue  # no time, or recursion
+            if edge_cumtime * share < min_time:
+                pruned += edge_cumtime * share
+                continue
+            walk(callee, key, on_stack, share * edge_cumtime / callee_cumtime)
+        add(f"{key};(other)", pruned)
+
+    for root in roots:
+        walk(root, "", frozenset(), 1.0)
+
+    return "".join(f"{stack} {us}\n" for stack, us in sorted(lines.items()))
@@ -0,0 +1,49 @@
+"""
+Configuration shared by the Flask (app.py) and ASGI (asgi_app.py) entry points.
+"""
+
+import os
+
+# Path to CSV (in api/data folder for deployment)
+DATA_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "data",
+    "foods_enhanced.csv",
+)
+
+# CORS configuration for local dev and production
+CORS_ORIGINS = [
+    "http://localhost:3000",  # Local development
+    "https://nutribudget-web.vercel.app",  # Production (update this after Vercel deployment)
+    "https://*.vercel.app",  # Vercel preview deployments
+]
+
+def _warm_mode_from_env():
+    """
+    NUTRIBUDGET_WARM_MODELS: "1" (default) warms models in a background thread,
+    "sync" warms before the app is returned (use with gunicorn --preload so
+    workers fork with models already loaded), "0" loads them on first use.
+    """
+    value = os.environ.get("NUTRIBUDGET_WARM_MODELS", "1").lower()
+    if value in ("0", "off", "false"):
+        return "off"
+    return "sync" if value == "sync" else "background"
+
+def default_config():
+    """Configuration used by create_app() / create_asgi_app() when not overridden."""
+    return {
+        "DATA_PATH": os.environ.get("NUTRIBUDGET_DATA_PATH", DATA_PATH),
+        "WARM_MODELS": _warm_mode_from_env(),
+        "GEMINI_API_KEY": None,  # None = read from the environment / .env on first use
+        "CORS_ORIGINS": CORS_ORIGINS,
+        # How planner() runs (see plan_executor.py): "inline", "thread" or
+        # "process"; None = inline for Flask, thread for the ASGI app
+        "PLAN_EXECUTOR": os.environ.get("NUTRIBUDGET_PLAN_EXECUTOR"),
+        "PLAN_WORKERS": int(os.environ.get("NUTRIBUDGET_PLAN_WORKERS", 2)),
+        # Plans queued or running before /api/plan answers 429 (None = 4 per worker)
+        "PLAN_MAX_PENDING": int(os.environ["NUTRIBUDGET_PLAN_MAX_PENDING"]) if os.environ.get("NUTRIBUDGET_PLAN_MAX_PENDING") else None,
+        # On-demand profiling (see profiling.py); off unless a token or allowlist is set
+        "PROFILE_TOKEN": os.environ.get("NUTRIBUDGET_PROFILE_TOKEN"),
+        "PROFILE_ALLOWLIST": [p for p in os.environ.get("NUTRIBUDGET_PROFILE_ALLOWLIST", "").split(",") if p],
+        "PROFILE_DIR": os.environ.get("NUTRIBUDGET_PROFILE_DIR"),
+    }
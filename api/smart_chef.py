@@ -0,0 +1,104 @@
+"""
+Smart Chef: recipe generation with Gemini.
+
+Shared by the Flask and ASGI entry points. The Gemini SDK is slow to import,
+so it is loaded on the first recipe request rather than at startup. Workers
+that never serve recipes never pay for it.
+"""
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# gemini-flash-latest is explicitly available for this key
+MODEL_NAME = "gemini-flash-latest"
+
+_genai = None
+_genai_lock = threading.Lock()
+_dotenv_loaded = False
+
+
+def get_genai(api_key: str = None):
+    """
+    Import and configure google.generativeai on first use.
+
+    Args:
+        api_key: Gemini key; if omitted, read GEMINI_API_KEY from the
+                 environment / .env file
+
+    Returns:
+        The configured genai module, or None if no key is available.
+    """
+    global _genai, _dotenv_loaded
+    if _genai is not None:
+        return _genai
+
+    with _genai_lock:
+        if _genai is None:
+            if not api_key:
+                if not _dotenv_loaded:
+                    from dotenv import load_dotenv
+
+                    # Load environment variables from .env file (once; a missing
+                    # key doesn't re-read it on every call)
+                    load_dotenv()
+                    _dotenv_loaded = True
+                api_key = os.environ.get("GEMINI_API_KEY")
+
+            if not api_key:
+                logger.warning("GEMINI_API_KEY not found in environment variables. Smart Chef features will fail.")
+                return None
+
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _genai = genai
+    return _genai
+
+
+def build_prompt(ingredient_names: list) -> str:
+    """Recipe prompt for the given basket (top 20 items to avoid huge prompts)."""
+    ingredients_str = ", ".join(ingredient_names[:20])
+    return f"""
+        You are a creative chef helping a budget-conscious user.
+        Create 3 simple, healthy, and delicious recipes using a subset of these ingredients: {ingredients_str}.
+        You can assume they have basic pantry staples (oil, salt, pepper, water).
+
+        Format the output strictly as a JSON list of objects with these keys:
+        - name: Recipe Name
+        - time: Preparation time (e.g., "30 mins")
+        - difficulty: "Easy", "Medium", or "Hard"
+        - ingredients: List of strings (ingredients used)
+        - instructions: List of strings (step-by-step instructions)
+        - calories: Approximate calories per serving (number)
+
+        Do not include markdown formatting (like ```json). Just return the raw JSON string.
+        """
+
+
+def parse_recipes(text: str) -> list:
+    """Decode the model's reply, stripping markdown code fences if present."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text)
+
+
+def generate_recipes(genai, ingredient_names: list) -> list:
+    """Blocking recipe generation (used by the Flask app)."""
+    model = genai.GenerativeModel(MODEL_NAME)
+    response = model.generate_content(build_prompt(ingredient_names))
+    return parse_recipes(response.text)
+
+
+async def generate_recipes_async(genai, ingredient_names: list) -> list:
+    """Recipe generation that awaits the Gemini call instead of blocking a thread."""
+    model = genai.GenerativeModel(MODEL_NAME)
+    response = await model.generate_content_async(build_prompt(ingredient_names))
+    return parse_recipes(response.text)
@@ -0,0 +1,129 @@
+"""
+"Swap this item": nearest-neighbour substitutes for a product
+
+SubstituteIndex puts every product in a KD-tree over its standardized
+nutrient vector (calories, protein, carbs, fat, sugar, fiber per 100g; the
+nutrient features ml_utils.prepare_features() feeds the models). Each
+column is z-scored with the catalog's mean and standard deviation, so no
+single nutrient dominates the distance. The catalog snapshot builds the
+index once (on warm-up or the first request) and every
+GET /api/foods/<product_id>/substitutes call is a tree query plus
+vectorized filters, instead of a scan over the catalog.
+
+sklearn is imported when the index is built, not at startup.
+"""
+
+import numpy as np
+import pandas as pd
+
+NUTRIENT_FEATURES = ["calories", "protein", "carbs", "fat", "sugar", "fiber"]
+
+DEFAULT_SUBSTITUTES = 5
+MAX_SUBSTITUTES = 50
+
+
+class SubstituteIndex:
+    """
+    KD-tree over standardized nutrient vectors of a catalog.
+
+    Args:
+        df: Catalog DataFrame (rows are addressed by position)
+        canonical_ids: Canonical product id per row, so only one offer of
+                       each product is returned (see products.py)
+    """
+
+    def __init__(self, df: pd.DataFrame, canonical_ids: pd.Series = None):
+        from sklearn.neighbors import KDTree
+
+        columns = [df[c] if c in df.columns else pd.Series(0.0, index=df.index) for c in NUTRIENT_FEATURES]
+        features = np.column_stack([column.fillna(0).to_numpy(dtype=float) for column in columns])
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0
+        self.vectors = (features - features.mean(axis=0)) / scale
+        self.tree = KDTree(self.vectors)
+
+        price_column = "price_per_item" if "price_per_item" in df.columns else "price_per_100g"
+        self.prices = df[price_column].to_numpy(dtype=float)
+        self.vegetarian = (df["veg_nonveg"].astype(str).str.lower().str.startswith("veg").to_numpy()
+                           if "veg_nonveg" in df.columns else np.ones(len(df), dtype=bool))
+        self.categories = (pd.factorize(df["category"])[0] if "category" in df.columns
+                           else np.zeros(len(df), dtype=int))
+        self.products = (canonical_ids.to_numpy() if canonical_ids is not None else np.arange(len(df)))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def query(self, position: int, k: int = DEFAULT_SUBSTITUTES, vegetarian: bool = False,
+              max_price: float = None, same_category: bool = False) -> list:
+        """
+        Nearest products to the one at position that pass the filters.
+
+        Neighbours are fetched in growing batches (4x k, then 4x more) until
+        k pass the filters or the catalog is exhausted. The product itself
+        and other offers of it are never returned, and each other product
+        appears once (its nearest offer).
+
+        Returns:
+            [(position, distance)] nearest first, at most k
+        """
+        n = len(self)
+        fetch = min(n, max(4 * k, 16))
+        while True:
+            distances, positions = self.tree.query(self.vectors[position:position + 1], k=fetch)
+            distances, positions = distances[0], positions[0]
+
+            keep = self.products[positions] != self.products[position]
+            if vegetarian:
+                keep &= self.vegetarian[positions]
+            if max_price is not None:
+                keep &= self.prices[positions] <= max_price
+            if same_category:
+                keep &= self.categories[positions] == self.categories[position]
+
+            _, first = np.unique(self.products[positions[keep]], return_index=True)
+            first.sort()
+            if len(first) >= k or fetch == n:
+                return [(int(p), float(d)) for p, d in zip(positions[keep][first][:k], distances[keep][first][:k])]
+            fetch = min(n, fetch * 4)
+
+
+def find_substitutes(catalog, product_id: int, args) -> dict:
+    """
+    GET /api/foods/<product_id>/substitutes.
+
+    Args:
+        catalog: CatalogSnapshot
+        product_id: Product to replace
+        args: Query params: k (default 5, max 50), diet ("veg" for
+              vegetarian only), max_price (per item), same_category
+              ("true"/"1")
+
+    Returns:
+        Dict with product (the original record), count and items (records
+        plus distance and price_difference vs the original, nearest first)
+
+    Raises:
+        KeyError: if product_id isn't in the catalog
+        ValueError: if a param can't be parsed
+    """
+    position = catalog.position_of(product_id)
+    if position is None:
+        raise KeyError(product_id)
+
+    k = int(args.get("k", DEFAULT_SUBSTITUTES))
+    if not 1 <= k <= MAX_SUBSTITUTES:
+        raise ValueError(f"k must be between 1 and {MAX_SUBSTITUTES}")
+    diet = str(args.get("diet", "")).lower()
+    vegetarian = "veg" in diet and "non" not in diet
+    max_price = float(args["max_price"]) if "max_price" in args else None
+    same_category = str(args.get("same_category", "")).lower() in ("1", "true", "yes")
+
+    index = catalog.substitute_index()
+    matches = index.query(position, k, vegetarian=vegetarian, max_price=max_price, same_category=same_category)
+
+    original = catalog.df.iloc[[position]].to_dict(orient="records")[0]
+    items = catalog.df.iloc[[p for p, _ in matches]].to_dict(orient="records")
+    for item, (match, distance) in zip(items, matches):
+        item["distance"] = round(distance, 4)
+        item["price_difference"] = round(float(index.prices[match] - index.prices[position]), 2)
+    return {"product": original, "count": len(items), "items": items}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tag pattern tests for allergens.py
+
+Runs TAGS over real product names: the catalog's own (data/foods_enhanced.csv)
+and common grocery names it doesn't carry yet. Each case lists the tags a
+name must get and the ones it must not, so plant milks, eggplant, oats or
+vegan cookies aren't dropped by exclude=dairy/eggs/gluten while the real
+allergens still are.
+
+Run with pytest, or directly: python test_allergens.py
+"""
+
+import pandas as pd
+
+from allergens import tag_bits, tag_names
+
+# product_name -> (tags it must have, tags it must not have)
+CASES = {
+    # Catalog names
+    "Skim Milk Family Pack": ({"dairy"}, {"gluten", "eggs"}),
+    "2% Milk 1kg": ({"dairy"}, set()),
+    "Cheddar Cheese 500g": ({"dairy"}, set()),
+    "Greek Yogurt": ({"dairy"}, set()),
+    "Butter": ({"dairy"}, set()),
+    "Peanut Butter 1kg": ({"peanuts"}, {"dairy"}),
+    "Margarine": (set(), {"dairy"}),
+    "Chocolate Chip Cookies": ({"gluten", "dairy", "eggs"}, set()),
+    "Oatmeal Cookies": ({"gluten", "eggs"}, set()),
+    "Oatmeal": (set(), {"gluten", "dairy", "eggs"}),
+    "Frozen Lasagna Value Pack": ({"gluten", "dairy", "eggs"}, set()),
+    "Mayonnaise": ({"eggs"}, {"dairy"}),
+    "Whole Wheat Bread": ({"gluten"}, {"dairy", "eggs"}),
+    "Granola Bars": ({"gluten", "tree_nuts"}, set()),
+    "Black Tea Bags": ({"caffeine"}, set()),
+    "Ham Slices": ({"pork"}, set()),
+    "Bagels": ({"gluten", "sesame"}, set()),
+    "Rice Cakes": (set(), {"gluten", "dairy"}),
+    # Names the catalog doesn't carry (yet)
+    "Large Brown Eggs": ({"eggs"}, set()),
+    "Free Range Egg": ({"eggs"}, set()),
+    "Eggplant": (set(), {"eggs"}),
+    "Almond Milk Unsweetened": ({"tree_nuts"}, {"dairy"}),
+    "Oat Milk Barista": (set(), {"dairy", "gluten"}),
+    "Soy Milk": ({"soy"}, {"dairy"}),
+    "Coconut Milk 400ml": (set(), {"dairy"}),
+    "Buttermilk": ({"dairy"}, set()),
+    "Butternut Squash": (set(), {"dairy"}),
+    "Dark Chocolate 70%": (set(), {"dairy"}),
+    "Milk Chocolate Bar": ({"dairy"}, set()),
+    "Vegan Chocolate Chip Cookies": ({"gluten"}, {"dairy", "eggs"}),
+    "Vegan Cheddar Cheese": (set(), {"dairy"}),
+    "Gluten-Free Bread": (set(), {"gluten"}),
+    "Rolled Oats": (set(), {"gluten"}),
+    "Eggnog": ({"eggs", "dairy"}, set()),
+}
+
+
+def tags_of(names) -> list:
+    bits = tag_bits(pd.DataFrame({"product_name": list(names)}))
+    return [set(tag_names(int(value))) for value in bits]
+
+
+def test_tags_match_real_names():
+    failures = []
+    for name, tags in zip(CASES, tags_of(CASES)):
+        must, must_not = CASES[name]
+        if not must <= tags or tags & must_not:
+            failures.append(f"{name}: got {sorted(tags)}, need {sorted(must)}, not {sorted(must_not)}")
+    assert not failures, "\n".join(failures)
+
+
+def test_tags_are_case_insensitive():
+    assert tags_of(["LARGE BROWN EGGS"]) == tags_of(["large brown eggs"])
+
+
+if __name__ == "__main__":
+    test_tags_match_real_names()
+    test_tags_are_case_insensitive()
+    print("✅ Allergen tag checks passed")
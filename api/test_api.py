@@ -6,6 +6,15 @@ This script tests all API endpoints with various scenarios including:
 - Foods filtering
 - Plan generation with different parameters
 - Statistics retrieval
+- Readiness check
+- Prometheus metrics
+- Budget sweeps
+- Plan adjustment from a planToken
+- Substitutes
+- Household targets and nutrient limits
+- Plan alternatives
+- Seeded plans
+- Allergen and brand exclusions
 - Edge cases and error handling
 
 Run this script with the API server running on http://localhost:5000
@@ -16,8 +25,13 @@ import json
 from typing import Dict, Any
 import time
 
+from allergens import TAGS
+
 BASE_URL = "http://localhost:5000"
 
+# Plan request most tests start from
+PLAN_BODY = {"budget": 60, "people": 2, "dietType": "veg", "goal": "balanced"}
+
 class Colors:
     """ANSI color codes for terminal output"""
     GREEN = '\033[92m'
@@ -44,6 +58,14 @@ def print_info(message: str):
     """Print info message"""
     print(f"{Colors.YELLOW}ℹ {message}{Colors.RESET}")
 
+def post_plan(**fields) -> requests.Response:
+    """POST PLAN_BODY (updated with fields) to /api/plan"""
+    return requests.post(f"{BASE_URL}/api/plan", json={**PLAN_BODY, **fields})
+
+def item_ids(plan: Dict[str, Any]) -> list:
+    """product_ids of a plan's items"""
+    return [item["product_id"] for item in plan.get("items", [])]
+
 def test_health_endpoint():
     """Test the health check endpoint"""
     print_test("Health Check Endpoint")
@@ -201,6 +223,301 @@ def test_plan_endpoint():
         except Exception as e:
             print_error(f"Error: {e}")
 
+def test_ready_endpoint():
+    """Test the readiness check (200 once warm, 503 while warming up)"""
+    print_test("Readiness Endpoint")
+
+    try:
+        response = requests.get(f"{BASE_URL}/ready")
+        data = response.json()
+        if response.status_code == 200 and data.get("status") == "ready":
+            print_success(f"Ready with {data.get('products')} products (models: {data['models'].get('state')})")
+        elif response.status_code == 503 and data.get("status") == "warming":
+            print_info("Still warming up (503)")
+        else:
+            print_error(f"Unexpected /ready response: {response.status_code} {data}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_metrics_endpoint():
+    """Test the Prometheus metrics endpoint"""
+    print_test("Metrics Endpoint")
+
+    try:
+        response = requests.get(f"{BASE_URL}/metrics")
+        if response.status_code == 200 and "nutribudget_http_requests_total" in response.text:
+            print_success("Metrics endpoint exposes request counters")
+        else:
+            print_error(f"Unexpected /metrics response: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_sweep_endpoint():
+    """Test budget sweeps: one curve point per budget, each within its budget"""
+    print_test("Budget Sweep Endpoint (/api/plan/sweep)")
+
+    try:
+        body = {key: value for key, value in PLAN_BODY.items() if key != "budget"}
+        response = requests.post(
+            f"{BASE_URL}/api/plan/sweep",
+            json={**body, "budgetRange": {"min": 20, "max": 100, "step": 20}}
+        )
+
+        if response.status_code == 200:
+            curve = response.json().get("curve", [])
+            if [point["budget"] for point in curve] == [20, 40, 60, 80, 100]:
+                print_success("One curve point per budget")
+            else:
+                print_error(f"Unexpected budgets: {[point['budget'] for point in curve]}")
+
+            over = [point["budget"] for point in curve if point["totals"]["total_spent"] > point["budget"]]
+            if not over:
+                print_success("Every subtotal is within its budget")
+            else:
+                print_error(f"Over budget at: {over}")
+        else:
+            print_error(f"Status code: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_adjust_endpoint():
+    """Test re-planning from a planToken: kept items stay, excluded ones go"""
+    print_test("Plan Adjust Endpoint (/api/plan/adjust)")
+
+    try:
+        plan = post_plan().json()
+        ids = item_ids(plan)
+        excluded, kept = ids[0], ids[1:]
+
+        response = requests.post(
+            f"{BASE_URL}/api/plan/adjust",
+            json={"planToken": plan["planToken"], "exclude": [excluded], "pin": kept[:1]}
+        )
+
+        if response.status_code == 200:
+            adjusted = response.json()
+            new_ids = item_ids(adjusted)
+            if excluded not in new_ids:
+                print_success(f"Excluded product {excluded} was removed")
+            else:
+                print_error(f"Excluded product {excluded} is still in the plan")
+
+            missing = [product_id for product_id in kept if product_id not in new_ids]
+            if not missing:
+                print_success(f"All {len(kept)} kept items are still in the plan")
+            else:
+                print_error(f"Kept items dropped: {missing}")
+
+            if adjusted["totals"]["total_spent"] <= PLAN_BODY["budget"]:
+                print_success(f"Adjusted plan within budget (${adjusted['totals']['total_spent']})")
+            else:
+                print_error(f"Adjusted plan over budget: ${adjusted['totals']['total_spent']}")
+            print_info(f"Adjustments: {adjusted.get('adjustments')}")
+        else:
+            print_error(f"Status code: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+    try:
+        response = requests.post(f"{BASE_URL}/api/plan/adjust", json={"planToken": "not-a-token"})
+        if response.status_code == 400:
+            print_success("Invalid planToken rejected with 400")
+        else:
+            print_error(f"Expected 400 for an invalid planToken, got {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_substitutes_endpoint():
+    """Test substitutes: never the product itself, 404 for unknown products"""
+    print_test("Substitutes Endpoint (/api/foods/<id>/substitutes)")
+
+    try:
+        product_id = item_ids(post_plan().json())[0]
+        response = requests.get(f"{BASE_URL}/api/foods/{product_id}/substitutes", params={"k": 5})
+
+        if response.status_code == 200:
+            items = response.json().get("items", [])
+            if 0 < len(items) <= 5:
+                print_success(f"Returned {len(items)} substitutes for product {product_id}")
+            else:
+                print_error(f"Expected 1-5 substitutes, got {len(items)}")
+
+            if product_id not in item_ids({"items": items}):
+                print_success("The product itself is not among its substitutes")
+            else:
+                print_error("The product was returned as its own substitute")
+        else:
+            print_error(f"Status code: {response.status_code}")
+
+        response = requests.get(f"{BASE_URL}/api/foods/99999999/substitutes")
+        if response.status_code == 404:
+            print_success("Unknown product returns 404")
+        else:
+            print_error(f"Expected 404 for an unknown product, got {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_household_and_limits():
+    """Test household targets and weekly nutrientLimits"""
+    print_test("Household and Nutrient Limits")
+
+    try:
+        response = post_plan(household=[{"age": 35, "sex": "female"}, {"age": 8}],
+                             nutrientLimits={"sodium": 5000})
+
+        if response.status_code == 200:
+            data = response.json()
+            if data["inputs"].get("household") and data["inputs"].get("nutrientLimits") == {"sodium": 5000}:
+                print_success("Household and nutrientLimits echoed in inputs")
+            else:
+                print_error(f"Unexpected inputs: {data['inputs']}")
+
+            if data["totals"]["sodium"] <= 5000:
+                print_success(f"Sodium {data['totals']['sodium']}mg within the 5000mg weekly limit")
+            else:
+                print_error(f"Sodium {data['totals']['sodium']}mg exceeds the 5000mg weekly limit")
+
+            default = post_plan().json()
+            if data["coverage"]["calories"]["target"] != default["coverage"]["calories"]["target"]:
+                print_success("Household changes the calorie target")
+            else:
+                print_error("Household plan has the same calorie target as people=2")
+        else:
+            print_error(f"Status code: {response.status_code}")
+
+        for limits in ({"sodium": -1}, {"bogus": 5}):
+            response = post_plan(nutrientLimits=limits)
+            if response.status_code == 400:
+                print_success(f"nutrientLimits={limits} rejected with 400")
+            else:
+                print_error(f"Expected 400 for nutrientLimits={limits}, got {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_alternatives():
+    """Test Pareto alternatives: each within budget and with its own planToken"""
+    print_test("Plan Alternatives (alternatives)")
+
+    try:
+        response = post_plan(alternatives=3)
+
+        if response.status_code == 200:
+            alternatives = response.json().get("alternatives", [])
+            if 0 < len(alternatives) <= 3:
+                print_success(f"Returned {len(alternatives)} alternatives")
+            else:
+                print_error(f"Expected 1-3 alternatives, got {len(alternatives)}")
+
+            over = [alt["totals"]["total_spent"] for alt in alternatives
+                    if alt["totals"]["total_spent"] > PLAN_BODY["budget"]]
+            if not over:
+                print_success("Every alternative is within budget")
+            else:
+                print_error(f"Alternatives over budget: {over}")
+
+            if all(alt.get("planToken") and "objectives" in alt for alt in alternatives):
+                print_success("Every alternative has objectives and a planToken")
+            else:
+                print_error("Some alternatives lack objectives or a planToken")
+        else:
+            print_error(f"Status code: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_seeded_plans():
+    """Test variety seeds: the same seed gives the same basket"""
+    print_test("Seeded Plans (seed)")
+
+    try:
+        first = post_plan(seed=7).json()
+        second = post_plan(seed=7).json()
+
+        if item_ids(first) == item_ids(second):
+            print_success("Same seed gave an identical basket")
+        else:
+            print_error("Same seed gave different baskets")
+
+        if first.get("inputs", {}).get("seed") == 7:
+            print_success("Seed is echoed in inputs")
+        else:
+            print_error(f"Seed missing from inputs: {first.get('inputs')}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_exclusions():
+    """Test exclude: tagged products and excluded brands never appear"""
+    print_test("Allergen and Brand Exclusions (exclude)")
+
+    try:
+        mask = sum(1 << list(TAGS).index(tag) for tag in ("dairy", "gluten"))
+        response = post_plan(exclude=["dairy", "gluten"])
+
+        if response.status_code == 200:
+            tagged = [item["product_name"] for item in response.json()["items"] if item["tag_bits"] & mask]
+            if not tagged:
+                print_success("No dairy or gluten products in the plan")
+            else:
+                print_error(f"Excluded tags found on: {tagged}")
+        else:
+            print_error(f"Status code: {response.status_code}")
+
+        brand = post_plan().json()["items"][0]["brand"]
+        response = post_plan(exclude=[f"brand:{brand}"])
+        brands = {item["brand"].lower() for item in response.json().get("items", [])}
+        if response.status_code == 200 and brand.lower() not in brands:
+            print_success(f"Brand {brand} excluded")
+        else:
+            print_error(f"Brand {brand} still in the plan (status {response.status_code})")
+
+        for exclude in (["nuts"], ["brand:no-such-brand"]):
+            response = post_plan(exclude=exclude)
+            if response.status_code == 400:
+                print_success(f"exclude={exclude} rejected with 400")
+            else:
+                print_error(f"Expected 400 for exclude={exclude}, got {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
+def test_weeks_plan():
+    """Test multi-week plans: one schedule entry per week, and weeks that vary"""
+    print_test("Multi-Week Plan (weeks)")
+
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/plan",
+            json={"budget": 80, "people": 2, "dietType": "veg", "goal": "balanced", "weeks": 4}
+        )
+
+        if response.status_code == 200:
+            schedule = response.json().get("schedule", [])
+            if len(schedule) == 4:
+                print_success("weeks=4 returned 4 schedule entries")
+            else:
+                print_error(f"Expected 4 schedule entries, got {len(schedule)}")
+
+            baskets = [frozenset(item["product_id"] for item in week["items"]) for week in schedule]
+            if len(set(baskets)) == len(baskets):
+                print_success("No two weeks have the same basket")
+            else:
+                print_error("Some weeks have identical baskets")
+
+            repeated = [week["week"] for week in schedule
+                        if len({item["product_name"].lower() for item in week["items"]}) < len(week["items"])]
+            if not repeated:
+                print_success("No product name appears twice within a week")
+            else:
+                print_error(f"Weeks with a repeated product name: {repeated}")
+
+            over = [week["week"] for week in schedule if week["subtotal"] > 80]
+            if not over:
+                print_success("Every week stays within the weekly budget")
+            else:
+                print_error(f"Weeks over budget: {over}")
+        else:
+            print_error(f"Status code: {response.status_code}")
+    except Exception as e:
+        print_error(f"Error: {e}")
+
 def test_edge_cases():
     """Test edge cases and error handling"""
     print_test("Edge Cases and Error Handling")
@@ -326,7 +643,17 @@ def main():
     test_health_endpoint()
     test_foods_endpoint()
     test_stats_endpoint()
+    test_ready_endpoint()
+    test_metrics_endpoint()
     test_plan_endpoint()
+    test_sweep_endpoint()
+    test_adjust_endpoint()
+    test_substitutes_endpoint()
+    test_seeded_plans()
+    test_exclusions()
+    test_household_and_limits()
+    test_alternatives()
+    test_weeks_plan()
     test_edge_cases()
     test_performance()
     
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Multi-week variety tests for planner._horizon_walk()
+
+Candidates are pack variants of real catalog items ("Skim Milk", "Skim Milk
+Family Pack", ...), keyed with products.product_name_keys() as
+RankedCandidates does, so another pack of an item counts as a repeat:
+no week holds an item twice, an item comes back no sooner than
+VARIETY_GAP_WEEKS later, and no two weeks are the same.
+
+Run with pytest, or directly: python test_horizon.py
+"""
+
+import pandas as pd
+
+from planner import VARIETY_GAP_WEEKS, _horizon_walk
+from products import product_name_keys
+
+ITEMS = ["Skim Milk", "Frozen Lasagna", "Baby Carrots", "Bananas", "Bagels"]
+VARIANTS = ["", " Family Pack", " Value Pack", " Single Serve", " 1kg"]
+
+# Best-first: every variant of the first item, then of the next, ...
+NAMES = [item + variant for item in ITEMS for variant in VARIANTS]
+
+
+def walk(weeks: int = 6, budget: float = 10.0):
+    keys = product_name_keys(pd.DataFrame({"product_name": NAMES})).tolist()
+    baskets = _horizon_walk([5.0] * len(NAMES), [0] * len(NAMES), keys, [False] * len(NAMES),
+                            weeks, budget, budget)
+    return [[NAMES[p] for p in positions] for positions, _ in baskets], keys
+
+
+def item_of(name: str) -> str:
+    return next(item for item in ITEMS if name.startswith(item))
+
+
+def test_no_item_twice_in_a_week():
+    baskets, _ = walk()
+    for week in baskets:
+        items = [item_of(name) for name in week]
+        assert len(items) == len(set(items)), week
+
+
+def test_pack_variants_respect_the_gap():
+    baskets, _ = walk()
+    last_week = {}
+    for w, week in enumerate(baskets):
+        for name in week:
+            item = item_of(name)
+            if item in last_week:
+                assert w - last_week[item] > VARIETY_GAP_WEEKS, (item, last_week[item], w)
+            last_week[item] = w
+
+
+def test_weeks_differ():
+    baskets, _ = walk()
+    assert all(baskets)
+    assert len({frozenset(week) for week in baskets}) == len(baskets)
+
+
+def test_pack_variants_share_a_key():
+    _, keys = walk()
+    assert len(set(keys)) == len(ITEMS)
+
+
+if __name__ == "__main__":
+    test_no_item_twice_in_a_week()
+    test_pack_variants_respect_the_gap()
+    test_weeks_differ()
+    test_pack_variants_share_a_key()
+    print("✅ Horizon variety checks passed")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Import-time regression test for app.py
+
+Profiles a cold `import app` with `python -X importtime` in a fresh process
+(model warm-up disabled) and checks that:
+- the cumulative import time of `app` stays under IMPORT_TIME_CAP_S
+- heavy optional dependencies (Gemini SDK, sklearn, joblib, dotenv) are not
+  imported until they are actually used
+
+Run with pytest, or directly: python test_import_time.py
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+# Cold import budget for `app`, in seconds (override with NUTRIBUDGET_IMPORT_CAP_S)
+IMPORT_TIME_CAP_S = float(os.environ.get("NUTRIBUDGET_IMPORT_CAP_S", 1.5))
+
+DEFERRED_MODULES = ["google.generativeai", "sklearn", "joblib", "dotenv"]
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_import():
+    """Returns ({module: cumulative_us}, stdout) for a cold `import app`."""
+    code = (
+        "import sys, json, app; "
+        f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=API_DIR,
+        env={**os.environ, "NUTRIBUDGET_WARM_MODELS": "0"},
+        capture_output=True, text=True, check=True,
+    )
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)", line)
+        if match and not match.group(2):  # top-level imports only
+            cumulative[match.group(3)] = int(match.group(1))
+    return cumulative, result.stdout
+
+
+def test_app_import_time_under_cap():
+    cumulative, _ = profile_import()
+    seconds = cumulative["app"] / 1e6
+    assert seconds < IMPORT_TIME_CAP_S, f"import app took {seconds:.2f}s (cap {IMPORT_TIME_CAP_S}s)"
+
+
+def test_heavy_dependencies_are_deferred():
+    _, stdout = profile_import()
+    loaded = stdout.strip().splitlines()[-1]
+    assert loaded == "[]", f"imported at startup: {loaded}"
+
+
+if __name__ == "__main__":
+    cumulative, stdout = profile_import()
+    print(f"import app: {cumulative['app'] / 1e6:.3f}s (cap {IMPORT_TIME_CAP_S}s)")
+    print(f"deferred modules loaded at import: {stdout.strip().splitlines()[-1]}")
+    test_app_import_time_under_cap()
+    test_heavy_dependencies_are_deferred()
+    print("✅ Import-time checks passed")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Canonical product and name key tests for products.py
+
+Checks, on product names as they appear in data/foods_enhanced.csv, that
+size tokens and pack descriptors ("Family Pack", "Value Pack", "Single
+Serve") don't split one item into several products, while package weight
+(and brand, for by_brand ids) still does.
+
+Run with pytest, or directly: python test_products.py
+"""
+
+import os
+
+import pandas as pd
+
+from products import canonical_product_ids, product_name_keys
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "foods_enhanced.csv")
+
+# Real catalog rows: (product_name, brand, package_weight_g)
+ROWS = [
+    ("Skim Milk", "No Name", 2000.0),
+    ("Skim Milk Family Pack", "Oikos", 2000.0),
+    ("Skim Milk Value Pack", "Oikos", 2000.0),
+    ("Skim Milk Single Serve", "No Name", 2000.0),
+    ("Skim Milk 1kg", "Nestlé", 1000.0),
+    ("Frozen Lasagna Family Pack", "Selection", 600.0),
+    ("Frozen Lasagna Value Pack", "No Name", 600.0),
+    ("Frozen Lasagna 500g", "Kirkland", 500.0),
+    ("2% Milk Family Pack", "Maple Leaf", 2000.0),
+]
+
+
+def frame(rows=ROWS) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["product_name", "brand", "package_weight_g"])
+
+
+def test_pack_descriptors_collapse():
+    ids = canonical_product_ids(frame())
+    assert ids[0] == ids[1] == ids[2] == ids[3], "Skim Milk pack variants of one weight"
+    assert ids[5] == ids[6], "Frozen Lasagna pack variants of one weight"
+
+
+def test_weight_and_name_still_split():
+    ids = canonical_product_ids(frame())
+    assert ids[0] != ids[4], "2000g and 1kg Skim Milk"
+    assert ids[5] != ids[7], "600g and 500g Frozen Lasagna"
+    assert ids[0] != ids[8], "Skim Milk and 2% Milk"
+
+
+def test_by_brand_ids_keep_brands_apart():
+    ids = canonical_product_ids(frame(), by_brand=True)
+    assert ids[0] == ids[3], "same brand, pack variants"
+    assert ids[1] == ids[2], "same brand, pack variants"
+    assert ids[0] != ids[1], "different brands"
+
+
+def test_name_keys_ignore_size_and_pack():
+    keys = product_name_keys(frame())
+    assert len(set(keys[:5])) == 1, "every Skim Milk row"
+    assert len(set(keys[5:8])) == 1, "every Frozen Lasagna row"
+    assert keys[0] != keys[8]
+
+
+def test_catalog_pack_variants_collapse():
+    df = pd.read_csv(DATA_PATH, usecols=["product_name", "brand", "package_weight_g"])
+    ids = canonical_product_ids(df)
+    skim = df["product_name"].str.fullmatch(r"Skim Milk( Family Pack| Value Pack| Single Serve)?")
+    assert skim.sum() > 4
+    assert ids[skim & (df["package_weight_g"] == 2000)].nunique() == 1
+    assert product_name_keys(df)[df["product_name"].str.startswith("Skim Milk")].nunique() == 1
+
+
+if __name__ == "__main__":
+    test_pack_descriptors_collapse()
+    test_weight_and_name_still_split()
+    test_by_brand_ids_keep_brands_apart()
+    test_name_keys_ignore_size_and_pack()
+    test_catalog_pack_variants_collapse()
+    print("✅ Product key checks passed")
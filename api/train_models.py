@@ -11,8 +11,13 @@ Models are saved to the models/ directory for use in the planner.
 
 import pandas as pd
 import numpy as np
+import argparse
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import sklearn
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.linear_model import LinearRegression
@@ -25,9 +30,31 @@ import joblib
 
 # Configuration
 DATA_PATH = "data/foods_scored.csv"
+TRAINING_DATA_PATH = "data/foods_enhanced.csv"
 MODELS_DIR = "models"
 RANDOM_STATE = 42
 
+# Fingerprints of the last trained artifacts; unchanged models are skipped
+CACHE_PATH = os.path.join(MODELS_DIR, "training_cache.json")
+
+# Hyperparameters (part of each model's cache fingerprint)
+QUALITY_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 20,
+    'min_samples_leaf': 10,
+}
+VALUE_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 15,
+    'min_samples_split': 20,
+    'min_samples_leaf': 10,
+}
+PRICE_PARAMS = {}
+
+# Written by tune_models.py; overrides the defaults above when present
+TUNED_PARAMS_PATH = os.path.join(MODELS_DIR, "tuned_params.json")
+
 def create_health_categories(df):
     """
     Create health quality categories based on health_score.
@@ -71,7 +98,7 @@ def prepare_features(df, feature_cols=None):
     
     return X_scaled, scaler
 
-def train_quality_classifier(X, y):
+def train_quality_classifier(X, y, params=QUALITY_PARAMS, n_jobs=1):
     """
     Train Random Forest classifier to predict product health quality.
     """
@@ -86,12 +113,9 @@ def train_quality_classifier(X, y):
     
     # Train model
     model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=10,
-        min_samples_split=20,
-        min_samples_leaf=10,
+        **params,
         random_state=RANDOM_STATE,
-        n_jobs=-1
+        n_jobs=n_jobs
     )
     
     print(f"Training on {len(X_train)} samples...")
@@ -135,7 +159,7 @@ def train_quality_classifier(X, y):
     
     return model, metrics
 
-def train_value_predictor(X, y):
+def train_value_predictor(X, y, params=VALUE_PARAMS, n_jobs=1):
     """
     Train Random Forest regressor to predict nutritional value score.
     """
@@ -150,12 +174,9 @@ def train_value_predictor(X, y):
     
     # Train model
     model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=15,
-        min_samples_split=20,
-        min_samples_leaf=10,
+        **params,
         random_state=RANDOM_STATE,
-        n_jobs=-1
+        n_jobs=n_jobs
     )
     
     print(f"Training on {len(X_train)} samples...")
@@ -193,7 +214,7 @@ def train_value_predictor(X, y):
     
     return model, metrics
 
-def train_price_predictor(X, y):
+def train_price_predictor(X, y, params=PRICE_PARAMS, n_jobs=1):
     """
     Train Linear Regression model to predict fair prices.
     """
@@ -213,7 +234,7 @@ def train_price_predictor(X, y):
         X_test = X_test.drop(columns=[price_col])
     
     # Train model
-    model = LinearRegression()
+    model = LinearRegression(**params)
     
     print(f"Training on {len(X_train)} samples...")
     model.fit(X_train, y_train)
@@ -250,10 +271,99 @@ def train_price_predictor(X, y):
     
     return model, metrics
 
-def main():
+# name -> (train function, artifact filename, relative CPU weight)
+TRAINING_JOBS = {
+    'quality_classifier': (train_quality_classifier, "quality_classifier.joblib", 4),
+    'value_predictor': (train_value_predictor, "value_predictor.joblib", 4),
+    'price_predictor': (train_price_predictor, "price_predictor.joblib", 1),
+}
+
+def hash_file(path):
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def model_fingerprint(name, data_hash, params):
+    """Cache key for one model: training data, hyperparameters and sklearn version."""
+    payload = json.dumps({
+        'model': name,
+        'data': data_hash,
+        'params': params,
+        'sklearn': sklearn.__version__,
+        'random_state': RANDOM_STATE,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def load_hyperparameters():
+    """Default hyperparameters, overridden by tune_models.py results if any."""
+    params = {
+        'quality_classifier': QUALITY_PARAMS,
+        'value_predictor': VALUE_PARAMS,
+        'price_predictor': PRICE_PARAMS,
+    }
+    for name, tuned in load_json(TUNED_PARAMS_PATH).items():
+        if name in params:
+            print(f"Using tuned hyperparameters for {name}: {tuned}")
+            params[name] = tuned
+    return params
+
+def split_core_budget(names, cores):
+    """
+    Split a core budget across concurrent jobs by their CPU weight.
+
+    Every job gets one core and the rest are shared by weight (floors, then
+    leftovers by largest remainder), so the shares add up to exactly cores.
+    With fewer cores than jobs they can't all run at once: every job gets
+    the whole budget and main() runs them one after another.
+    """
+    if cores < len(names):
+        return {name: cores for name in names}
+
+    weights = {name: TRAINING_JOBS[name][2] for name in names}
+    total = sum(weights.values())
+    spare = cores - len(names)
+    budget = {name: 1 + (spare * w) // total for name, w in weights.items()}
+    leftover = cores - sum(budget.values())
+    by_remainder = sorted(names, key=lambda name: -((spare * weights[name]) % total))
+    for name in by_remainder[:leftover]:
+        budget[name] += 1
+    return budget
+
+def _run_training_job(name, X, y, params, n_jobs):
+    """Train one model in a worker process and save its artifact."""
+    train_fn, filename, _ = TRAINING_JOBS[name]
+    start = time.perf_counter()
+    model, metrics = train_fn(X, y, params=params, n_jobs=n_jobs)
+    metrics['training_time_s'] = round(time.perf_counter() - start, 3)
+    metrics['n_jobs'] = n_jobs
+
+    path = os.path.join(MODELS_DIR, filename)
+    joblib.dump(model, path)
+    print(f"\nSaved {name} to {path}")
+    return metrics
+
+def main(cores=None, force=False, params=None):
     """
     Main training pipeline.
+
+    The three models train concurrently, sharing a budget of `cores` CPUs
+    (one after another if there are fewer cores than models).
+    Models whose fingerprint matches training_cache.json are skipped.
     """
+    wall_start = time.perf_counter()
+    cores = cores or os.cpu_count() or 1
+    params = params or load_hyperparameters()
+
     print("\n" + "="*60)
     print("NutriBudget ML Model Training")
     print("="*60)
@@ -263,7 +373,7 @@ def main():
     
     # Load enhanced data
     try:
-        df = pd.read_csv('data/foods_enhanced.csv')
+        df = pd.read_csv(TRAINING_DATA_PATH)
         print(f"Loaded {len(df)} products from enhanced dataset")
     except FileNotFoundError:
         print("❌ Enhanced dataset not found. Run enhance_data.py first.")
@@ -287,45 +397,66 @@ def main():
     joblib.dump(scaler, scaler_path)
     print(f"Saved feature scaler to {scaler_path}")
     
-    # Train Quality Classifier
-    print("\n🤖 Training Quality Classifier...")
     # Create labels if not present (using health_score)
     if 'quality_label' not in df.columns:
         df['quality_label'] = pd.cut(df['health_score'], 
                                    bins=[-1, 33, 66, 100], 
                                    labels=['Low', 'Medium', 'High'])
     
-    y_quality = df['quality_label']
-    quality_model, quality_metrics = train_quality_classifier(X, y_quality)
-    quality_path = os.path.join(MODELS_DIR, "quality_classifier.joblib")
-    joblib.dump(quality_model, quality_path)
-    print(f"\nSaved quality classifier to {quality_path}")
-    
-    # Train Value Predictor
-    print("\n📈 Training Value Predictor...")
-    # Target: nutri_score_app (0-100)
-    y_value = df['nutri_score_app']
-    value_model, value_metrics = train_value_predictor(X, y_value)
-    value_path = os.path.join(MODELS_DIR, "value_predictor.joblib")
-    joblib.dump(value_model, value_path)
-    print(f"\nSaved value predictor to {value_path}")
-    
-    # Train Price Predictor (Fair Price per ITEM)
-    print("\n💰 Training Price Predictor...")
-    # Target: price_per_item
-    y_price = df['price_per_item']
-    price_model, price_metrics = train_price_predictor(X, y_price)
-    price_path = os.path.join(MODELS_DIR, "price_predictor.joblib")
-    joblib.dump(price_model, price_path)
-    print(f"\nSaved price predictor to {price_path}")
-    
+    targets = {
+        'quality_classifier': df['quality_label'],   # Low / Medium / High
+        'value_predictor': df['nutri_score_app'],    # 0-100
+        'price_predictor': df['price_per_item'],     # Fair price per ITEM
+    }
+
+    # Skip models whose data, hyperparameters and sklearn version are unchanged
+    data_hash = hash_file(TRAINING_DATA_PATH)
+    cache = load_json(CACHE_PATH)
+    previous_metrics = load_json(os.path.join(MODELS_DIR, "model_metrics.json"))
+    fingerprints = {name: model_fingerprint(name, data_hash, params[name]) for name in TRAINING_JOBS}
+
+    all_metrics = {}
+    pending = []
+    for name, (_, filename, _) in TRAINING_JOBS.items():
+        artifact_exists = os.path.exists(os.path.join(MODELS_DIR, filename))
+        if not force and artifact_exists and cache.get(name) == fingerprints[name] and name in previous_metrics:
+            print(f"⏭️  {name} unchanged, using cached artifact")
+            all_metrics[name] = dict(previous_metrics[name], cached=True)
+        else:
+            pending.append(name)
+
+    if pending:
+        budget = split_core_budget(pending, cores)
+        concurrent = len(pending) if cores >= len(pending) else 1
+        print(f"\n🤖 Training {', '.join(pending)} on {cores} core(s), {concurrent} at a time: {budget}")
+        with ProcessPoolExecutor(max_workers=concurrent) as pool:
+            futures = {
+                name: pool.submit(_run_training_job, name, X, targets[name], params[name], budget[name])
+                for name in pending
+            }
+            for name, future in futures.items():
+                all_metrics[name] = dict(future.result(), cached=False)
+                cache[name] = fingerprints[name]
+
+    with open(CACHE_PATH, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+    quality_metrics = all_metrics['quality_classifier']
+    value_metrics = all_metrics['value_predictor']
+    price_metrics = all_metrics['price_predictor']
+
     # Save all metrics
     all_metrics = {
         'quality_classifier': quality_metrics,
         'value_predictor': value_metrics,
         'price_predictor': price_metrics,
         'dataset_size': len(df),
-        'features': list(X.columns)
+        'features': list(X.columns),
+        'training': {
+            'cores': cores,
+            'wall_time_s': round(time.perf_counter() - wall_start, 3),
+            'sklearn_version': sklearn.__version__,
+        }
     }
     
     metrics_path = os.path.join(MODELS_DIR, "model_metrics.json")
@@ -344,4 +475,10 @@ def main():
     print(f"\nAll models saved to {MODELS_DIR}/")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the NutriBudget ML models.")
+    parser.add_argument("--cores", type=int, default=None,
+                        help="Total CPU budget shared by the training jobs (default: all cores)")
+    parser.add_argument("--force", action="store_true",
+                        help="Retrain every model even if its cache fingerprint is unchanged")
+    args = parser.parse_args()
+    main(cores=args.cores, force=args.force)
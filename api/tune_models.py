@@ -0,0 +1,191 @@
+"""
+NutriBudget Hyperparameter Search
+
+Runs successive-halving random search (HalvingRandomSearchCV) for the two
+Random Forest models used by the planner. Poor candidates are dropped after
+training on small sample budgets, so only promising ones see the full data.
+
+Because every prediction lands on the /api/plan path, each surviving candidate
+is also timed at inference. The chosen model is the *fastest* one whose CV
+score is within --margin of the best score, not simply the most accurate.
+
+Results:
+- models/search_results.json  accuracy vs latency table for every finalist
+- models/tuned_params.json    chosen hyperparameters, picked up by train_models.py
+
+Usage:
+    python tune_models.py --margin 0.01 --n-candidates 60
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, KFold, StratifiedKFold, train_test_split
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import accuracy_score, r2_score
+
+from train_models import (
+    MODELS_DIR, RANDOM_STATE, TRAINING_DATA_PATH, QUALITY_PARAMS, VALUE_PARAMS, prepare_features,
+)
+
+SEARCH_RESULTS_PATH = os.path.join(MODELS_DIR, "search_results.json")
+TUNED_PARAMS_PATH = os.path.join(MODELS_DIR, "tuned_params.json")
+
+# Rows per latency measurement; matches the "per 1k rows" figure we track
+LATENCY_ROWS = 1000
+
+# Smallest training sample in the first halving round
+MIN_SAMPLES = 300
+
+FOREST_SPACE = {
+    'n_estimators': [10, 25, 50, 100, 200],
+    'max_depth': [4, 6, 8, 10, 15, None],
+    'min_samples_split': [2, 10, 20, 50],
+    'min_samples_leaf': [1, 5, 10, 20],
+    'max_features': ['sqrt', 0.5, 1.0],
+}
+
+SEARCHES = {
+    'quality_classifier': (RandomForestClassifier, 'accuracy', accuracy_score, QUALITY_PARAMS),
+    'value_predictor': (RandomForestRegressor, 'r2', r2_score, VALUE_PARAMS),
+}
+
+def measure_latency_ms(model, X, repeats=5):
+    """Best-of-N single-threaded predict() time for LATENCY_ROWS rows, in ms."""
+    rows = X.iloc[np.resize(np.arange(len(X)), LATENCY_ROWS)]
+    model.set_params(n_jobs=1)
+    model.predict(rows)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def choose_candidate(candidates, margin):
+    """Fastest candidate whose CV score is within `margin` of the best."""
+    best_score = max(c['cv_score'] for c in candidates)
+    eligible = [c for c in candidates if c['cv_score'] >= best_score - margin]
+    return min(eligible, key=lambda c: c['latency_ms_per_1k'])
+
+def search_model(name, X, y, n_candidates, n_jobs, margin, stratify=False):
+    estimator_cls, scoring, score_fn, baseline_params = SEARCHES[name]
+
+    print("\n" + "="*60)
+    print(f"Successive-halving search: {name}")
+    print("="*60)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=RANDOM_STATE, stratify=y if stratify else None
+    )
+
+    # Shuffled folds, like the shuffled train/test split used in train_models.py
+    cv = (StratifiedKFold if stratify else KFold)(n_splits=3, shuffle=True, random_state=RANDOM_STATE)
+    search = HalvingRandomSearchCV(
+        estimator_cls(random_state=RANDOM_STATE, n_jobs=1),
+        FOREST_SPACE,
+        n_candidates=n_candidates,
+        factor=3,
+        min_resources=MIN_SAMPLES,
+        scoring=scoring,
+        cv=cv,
+        random_state=RANDOM_STATE,
+        n_jobs=n_jobs,
+    )
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_time = time.perf_counter() - start
+    print(f"Searched {n_candidates} candidates over {search.n_iterations_} rounds in {search_time:.1f}s")
+
+    # Candidates that survived to the final round were scored on the most data
+    results = pd.DataFrame(search.cv_results_)
+    finalists = results[results['iter'] == results['iter'].max()]
+
+    candidates = []
+    for _, row in finalists.iterrows():
+        model = estimator_cls(**row['params'], random_state=RANDOM_STATE, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
+        candidates.append({
+            'params': row['params'],
+            'cv_score': float(row['mean_test_score']),
+            'test_score': float(score_fn(y_test, model.predict(X_test))),
+            'latency_ms_per_1k': round(measure_latency_ms(model, X_test), 3),
+        })
+
+    # The hand-picked defaults from train_models.py, for comparison
+    baseline = estimator_cls(**baseline_params, random_state=RANDOM_STATE, n_jobs=n_jobs)
+    baseline.fit(X_train, y_train)
+    baseline_result = {
+        'params': baseline_params,
+        'test_score': float(score_fn(y_test, baseline.predict(X_test))),
+        'latency_ms_per_1k': round(measure_latency_ms(baseline, X_test), 3),
+    }
+
+    chosen = choose_candidate(candidates, margin)
+
+    print(f"\n{'cv':>8}{'test':>8}{'ms/1k':>10}  params")
+    for c in sorted(candidates, key=lambda c: -c['cv_score']):
+        marker = " <- chosen" if c is chosen else ""
+        print(f"{c['cv_score']:>8.4f}{c['test_score']:>8.4f}{c['latency_ms_per_1k']:>10.2f}  {c['params']}{marker}")
+    print(f"Baseline: test={baseline_result['test_score']:.4f}, {baseline_result['latency_ms_per_1k']:.2f} ms/1k")
+
+    return {
+        'scoring': scoring,
+        'margin': margin,
+        'n_candidates': n_candidates,
+        'n_rounds': int(search.n_iterations_),
+        'search_time_s': round(search_time, 2),
+        'candidates': candidates,
+        'baseline': baseline_result,
+        'chosen': chosen,
+    }
+
+def main(margin=0.01, n_candidates=60, n_jobs=-1):
+    """
+    Search both forests and write the chosen hyperparameters.
+    """
+    df = pd.read_csv(TRAINING_DATA_PATH)
+    feature_cols = ['calories', 'protein', 'carbs', 'fat', 'sugar', 'fiber', 'price_per_100g', 'package_weight_g']
+    df = df.dropna(subset=feature_cols)
+    X, _ = prepare_features(df[feature_cols], feature_cols)
+
+    if 'quality_label' not in df.columns:
+        df['quality_label'] = pd.cut(df['health_score'],
+                                   bins=[-1, 33, 66, 100],
+                                   labels=['Low', 'Medium', 'High'])
+
+    results = {
+        'quality_classifier': search_model(
+            'quality_classifier', X, df['quality_label'], n_candidates, n_jobs, margin, stratify=True
+        ),
+        'value_predictor': search_model(
+            'value_predictor', X, df['nutri_score_app'], n_candidates, n_jobs, margin
+        ),
+    }
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    with open(SEARCH_RESULTS_PATH, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    with open(TUNED_PARAMS_PATH, 'w') as f:
+        json.dump({name: r['chosen']['params'] for name, r in results.items()}, f, indent=2)
+
+    print(f"\nSaved search results to {SEARCH_RESULTS_PATH}")
+    print(f"Saved tuned hyperparameters to {TUNED_PARAMS_PATH}")
+    print("Run 'python train_models.py' to retrain with them.")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the planner models.")
+    parser.add_argument("--margin", type=float, default=0.01,
+                        help="Accept any candidate within this CV score of the best; pick the fastest")
+    parser.add_argument("--n-candidates", type=int, default=60,
+                        help="Random candidates in the first halving round")
+    parser.add_argument("--n-jobs", type=int, default=-1,
+                        help="Worker processes for the search (default: all cores)")
+    args = parser.parse_args()
+    main(margin=args.margin, n_candidates=args.n_candidates, n_jobs=args.n_jobs)
@@ -0,0 +1,528 @@
+"""
+Request validation shared by the Flask (app.py) and ASGI (asgi_app.py) entry points.
+
+Each parser returns plain Python values or raises RequestError carrying the
+JSON error body and HTTP status, so both frameworks return identical errors.
+"""
+
+import logging
+
+from allergens import parse_exclusions, unknown_brands
+from nutrients import NUTRIENTS, SEXES, daily_targets
+from plan_tokens import MAX_TOKEN_LENGTH, decode_plan_token
+
+logger = logging.getLogger(__name__)
+
+VALID_DIET_TYPES = ["veg", "vegetarian", "nonveg", "non-veg", "non_veg", "mixed", "vegan"]
+VALID_GOALS = ["balanced", "high_protein", "low_sugar"]
+MAX_SWEEP_BUDGETS = 50
+MAX_WEEKS = 8
+MAX_ALTERNATIVES = 5
+MAX_SEED = 2 ** 32 - 1
+
+
+class RequestError(Exception):
+    """Invalid request; `payload` is the JSON error body, `status` the HTTP code."""
+
+    def __init__(self, payload: dict, status: int = 400):
+        super().__init__(payload.get("message") or payload.get("error"))
+        self.payload = payload
+        self.status = status
+
+
+def parse_plan_request(body: dict) -> dict:
+    """
+    Validate a POST /api/plan body.
+
+    Args:
+        body: Decoded JSON body (None is treated as empty)
+
+    Returns:
+        Dict with budget, people, diet_type, goal, max_stores,
+        preferred_stores, household, nutrient_limits, weeks, alternatives,
+        seed and exclusions (parse_exclusions() of exclude)
+
+    Raises:
+        RequestError: on missing fields, bad types or out-of-range values
+    """
+    body = body or {}
+
+    # Validate required fields
+    required_fields = ["budget", "people", "dietType", "goal"]
+    missing_fields = [field for field in required_fields if field not in body]
+    if missing_fields:
+        logger.warning(f"Missing required fields: {missing_fields}")
+        raise RequestError({
+            "error": "Missing required fields",
+            "missing": missing_fields
+        })
+
+    try:
+        budget = float(body.get("budget", 0))
+        people = int(body.get("people", 1))
+        diet_type = str(body.get("dietType", "veg")).lower()
+        goal = str(body.get("goal", "balanced")).lower()
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid request body: {e}")
+        raise RequestError({
+            "error": "Invalid data types",
+            "message": "budget must be a number, people must be an integer"
+        })
+
+    _validate_budget(budget)
+
+    # Validate people
+    if people < 1:
+        logger.warning(f"Invalid people count: {people}")
+        raise RequestError({
+            "error": "Invalid people count",
+            "message": "Number of people must be at least 1"
+        })
+
+    if people > 20:
+        logger.warning(f"Very large household: {people}")
+        raise RequestError({
+            "error": "Household too large",
+            "message": "Maximum supported household size is 20 people"
+        })
+
+    # Validate diet type
+    if diet_type not in VALID_DIET_TYPES:
+        logger.warning(f"Invalid diet type: {diet_type}")
+        raise RequestError({
+            "error": "Invalid diet type",
+            "message": f"dietType must be one of: {', '.join(VALID_DIET_TYPES)}",
+            "received": diet_type
+        })
+
+    # Validate goal
+    if goal not in VALID_GOALS:
+        logger.warning(f"Invalid goal: {goal}")
+        raise RequestError({
+            "error": "Invalid goal",
+            "message": f"goal must be one of: {', '.join(VALID_GOALS)}",
+            "received": goal
+        })
+
+    max_stores, preferred_stores = _parse_store_limits(body)
+    household = _parse_household(body, people)
+    nutrient_limits = _parse_nutrient_limits(body)
+
+    # Validate weeks
+    weeks = body.get("weeks", 1)
+    if isinstance(weeks, bool) or not isinstance(weeks, int) or not 1 <= weeks <= MAX_WEEKS:
+        logger.warning(f"Invalid weeks: {weeks}")
+        raise RequestError({
+            "error": "Invalid weeks",
+            "message": f"weeks must be an integer from 1 to {MAX_WEEKS}"
+        })
+
+    # Validate alternatives (true: as many as allowed)
+    alternatives = body.get("alternatives", 0)
+    if alternatives is True:
+        alternatives = MAX_ALTERNATIVES
+    if isinstance(alternatives, bool) or not isinstance(alternatives, int) or not 0 <= alternatives <= MAX_ALTERNATIVES:
+        logger.warning(f"Invalid alternatives: {alternatives}")
+        raise RequestError({
+            "error": "Invalid alternatives",
+            "message": f"alternatives must be true, false or an integer from 0 to {MAX_ALTERNATIVES}"
+        })
+    if alternatives and weeks > 1:
+        raise RequestError({
+            "error": "Invalid alternatives",
+            "message": "alternatives are available for one-week plans"
+        })
+
+    # Validate seed (variety mode)
+    seed = body.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed <= MAX_SEED):
+        logger.warning(f"Invalid seed: {seed}")
+        raise RequestError({
+            "error": "Invalid seed",
+            "message": f"seed must be an integer from 0 to {MAX_SEED}"
+        })
+
+    # Validate exclude (allergen/attribute tags and brand:<name>)
+    exclude = body.get("exclude") or []
+    try:
+        if not isinstance(exclude, list) or not all(isinstance(value, str) for value in exclude):
+            raise ValueError("exclude must be a list of strings")
+        exclusions = parse_exclusions(exclude)
+    except ValueError as e:
+        logger.warning(f"Invalid exclude: {exclude}")
+        raise RequestError({
+            "error": "Invalid exclude",
+            "message": str(e),
+            "received": exclude
+        })
+
+    return {"budget": budget, "people": people, "diet_type": diet_type, "goal": goal,
+            "max_stores": max_stores, "preferred_stores": preferred_stores,
+            "household": household, "nutrient_limits": nutrient_limits, "weeks": weeks,
+            "alternatives": alternatives, "seed": seed, "exclusions": exclusions}
+
+
+def check_catalog_params(params: dict, catalog) -> dict:
+    """
+    Check parsed plan params against the catalog they will run on.
+
+    Args:
+        params: parse_plan_request(), parse_sweep_request() or
+                parse_adjust_request() result
+        catalog: CatalogSnapshot
+
+    Returns:
+        params, unchanged
+
+    Raises:
+        RequestError: if preferred_stores names a store the catalog doesn't sell at,
+                      or a brand:<name> exclusion a brand it doesn't carry
+    """
+    known = {store.lower() for store in catalog.stores}
+    unknown = [store for store in params.get("preferred_stores") or [] if store.lower() not in known]
+    if unknown:
+        logger.warning(f"Unknown preferredStores: {unknown}")
+        raise RequestError({
+            "error": "Unknown preferredStores",
+            "message": f"preferredStores must be among: {', '.join(catalog.stores)}",
+            "unknown": unknown
+        })
+
+    unknown = unknown_brands(params.get("exclusions", ()), catalog.brands)
+    if unknown:
+        logger.warning(f"Unknown brands in exclude: {unknown}")
+        raise RequestError({
+            "error": "Invalid exclude",
+            "message": "brand:<name> exclusions must name a brand in the catalog",
+            "unknown": unknown
+        })
+    return params
+
+
+def _single_week(params: dict, endpoint: str) -> dict:
+    """Raise RequestError for a multi-week plan on an endpoint that plans one week."""
+    if params["weeks"] > 1:
+        raise RequestError({
+            "error": "Invalid weeks",
+            "message": f"{endpoint} works on one-week plans"
+        })
+    return params
+
+
+def _validate_budget(budget: float):
+    """Raise RequestError unless $5 < budget <= $1000."""
+    if budget <= 0:
+        logger.warning(f"Invalid budget: {budget}")
+        raise RequestError({
+            "error": "Invalid budget",
+            "message": "Budget must be greater than 0"
+        })
+
+    if budget <= 5:
+        logger.info(f"Very low budget: {budget}")
+        raise RequestError({
+            "error": "Budget too low",
+            "message": "Budget must be greater than $5 to meet basic nutrition needs."
+        })
+
+    if budget > 1000:
+        logger.warning(f"Very high budget: {budget}")
+        raise RequestError({
+            "error": "Budget too high",
+            "message": "Budget must be less than $1000. Please contact support for larger budgets."
+        })
+
+
+def _parse_store_limits(body: dict) -> tuple:
+    """Optional maxStores / preferredStores of a plan body -> (int or None, list)."""
+    max_stores = body.get("maxStores")
+    if max_stores is not None:
+        try:
+            max_stores = int(max_stores)
+        except (TypeError, ValueError):
+            max_stores = 0
+        if max_stores < 1:
+            logger.warning(f"Invalid maxStores: {body.get('maxStores')}")
+            raise RequestError({
+                "error": "Invalid maxStores",
+                "message": "maxStores must be a positive integer"
+            })
+
+    preferred_stores = body.get("preferredStores") or []
+    if not isinstance(preferred_stores, list) or not all(isinstance(s, str) and s.strip() for s in preferred_stores):
+        logger.warning(f"Invalid preferredStores: {preferred_stores}")
+        raise RequestError({
+            "error": "Invalid preferredStores",
+            "message": "preferredStores must be a list of store names"
+        })
+    preferred_stores = list(dict.fromkeys(s.strip() for s in preferred_stores))
+
+    if max_stores is not None and len(preferred_stores) > max_stores:
+        raise RequestError({
+            "error": "Too many preferred stores",
+            "message": f"preferredStores lists {len(preferred_stores)} stores but maxStores is {max_stores}"
+        })
+
+    return max_stores, preferred_stores
+
+
+def _parse_household(body: dict, people: int) -> list:
+    """Optional household of a plan body -> list of {"age", "sex"} (one per person)."""
+    household = body.get("household") or []
+    if not isinstance(household, list) or not all(isinstance(person, dict) for person in household):
+        raise RequestError({
+            "error": "Invalid household",
+            "message": "household must be a list of {\"age\", \"sex\"} objects"
+        })
+
+    people_profiles = []
+    for person in household:
+        try:
+            age = int(person["age"]) if person.get("age") is not None else None
+            sex = str(person["sex"]).lower() if person.get("sex") is not None else None
+            daily_targets(age, sex)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Invalid household member {person}: {e}")
+            raise RequestError({
+                "error": "Invalid household",
+                "message": f"Each person needs an integer age and a sex of {' or '.join(SEXES)} ({e})"
+            })
+        people_profiles.append({key: value for key, value in (("age", age), ("sex", sex)) if value is not None})
+
+    if people_profiles and len(people_profiles) != people:
+        raise RequestError({
+            "error": "Household size mismatch",
+            "message": f"household lists {len(people_profiles)} people but people is {people}"
+        })
+    return people_profiles
+
+
+def _parse_nutrient_limits(body: dict):
+    """
+    Optional nutrientLimits of a plan body: a list of "max" nutrient names or
+    a dict of nutrient -> positive amount per week, in the nutrient's unit
+    (NUTRIENTS: mg for sodium, kcal for calories, g otherwise). Multi-week
+    plans apply it to every week. Returns it normalized (None if not given).
+    """
+    limits = body.get("nutrientLimits")
+    if not limits:
+        return None
+
+    capped = [name for name, (_, kind) in NUTRIENTS.items() if kind == "max"]
+    if isinstance(limits, list):
+        unknown = [name for name in limits if name not in capped]
+        if unknown:
+            raise RequestError({
+                "error": "Invalid nutrientLimits",
+                "message": f"Only these nutrients have limits: {', '.join(capped)}",
+                "received": unknown
+            })
+        return list(dict.fromkeys(limits))
+
+    if isinstance(limits, dict):
+        unknown = [name for name in limits if name not in NUTRIENTS]
+        if unknown:
+            raise RequestError({
+                "error": "Invalid nutrientLimits",
+                "message": f"nutrientLimits keys must be among: {', '.join(NUTRIENTS)}",
+                "received": unknown
+            })
+        try:
+            limits = {name: float(amount) for name, amount in limits.items()}
+        except (TypeError, ValueError):
+            limits = None
+        if limits is None or any(amount <= 0 for amount in limits.values()):
+            raise RequestError({
+                "error": "Invalid nutrientLimits",
+                "message": "nutrientLimits amounts must be positive numbers per week, in "
+                           + ", ".join(f"{name} ({unit})" for name, (unit, _) in NUTRIENTS.items())
+            })
+        return limits
+
+    raise RequestError({
+        "error": "Invalid nutrientLimits",
+        "message": "nutrientLimits must be a list of nutrient names or an object of nutrient amounts"
+    })
+
+
+def parse_sweep_request(body: dict) -> dict:
+    """
+    Validate a POST /api/plan/sweep body.
+
+    Takes the /api/plan fields, except that budget is replaced by either
+    budgets (a list) or budgetRange ({"min", "max", "step"}, step default 5).
+
+    Returns:
+        parse_plan_request() dict with budgets (sorted, distinct) instead of budget
+
+    Raises:
+        RequestError: as parse_plan_request(), or on a bad budget list or range
+    """
+    body = body or {}
+
+    if "budgets" in body:
+        budgets = body["budgets"]
+        if not isinstance(budgets, list) or not budgets:
+            raise RequestError({
+                "error": "Invalid budgets",
+                "message": "budgets must be a non-empty list of numbers"
+            })
+    elif "budgetRange" in body:
+        budget_range = body["budgetRange"]
+        try:
+            low = float(budget_range["min"])
+            high = float(budget_range["max"])
+            step = float(budget_range.get("step", 5))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise RequestError({
+                "error": "Invalid budgetRange",
+                "message": "budgetRange needs numeric min and max (and optional step)"
+            })
+        if step <= 0 or high < low:
+            raise RequestError({
+                "error": "Invalid budgetRange",
+                "message": "budgetRange needs min <= max and a positive step"
+            })
+        count = int((high - low) / step + 1e-9) + 1
+        budgets = [round(low + i * step, 2) for i in range(min(count, MAX_SWEEP_BUDGETS + 1))]
+    else:
+        raise RequestError({
+            "error": "Missing required fields",
+            "missing": ["budgets"]
+        })
+
+    try:
+        budgets = sorted({float(budget) for budget in budgets})
+    except (TypeError, ValueError):
+        raise RequestError({
+            "error": "Invalid data types",
+            "message": "budgets must be numbers"
+        })
+    if len(budgets) > MAX_SWEEP_BUDGETS:
+        raise RequestError({
+            "error": "Too many budgets",
+            "message": f"A sweep covers at most {MAX_SWEEP_BUDGETS} budgets"
+        })
+    for budget in budgets:
+        _validate_budget(budget)
+
+    params = _single_week(parse_plan_request({**body, "budget": budgets[0]}), "/api/plan/sweep")
+    del params["budget"]
+    params["budgets"] = budgets
+    return params
+
+
+def parse_adjust_request(body: dict) -> dict:
+    """
+    Validate a POST /api/plan/adjust body.
+
+    The prior plan is given as planToken (from an /api/plan or
+    /api/plan/adjust response) or as plan (such a response body; its inputs
+    and the items' product_id are used). Edits are optional: exclude and
+    pin (lists of product_ids), budget, people, household and
+    nutrientLimits. Changing people without a household drops the prior
+    plan's household. The prior plan's tag/brand exclusions (its inputs'
+    exclude) still apply.
+
+    Returns:
+        parse_plan_request() dict for the edited inputs, plus basket (the
+        prior product_ids), exclude and pin
+
+    Raises:
+        RequestError: on a missing or malformed prior plan, or invalid edits
+    """
+    body = body or {}
+
+    if "planToken" in body:
+        if not isinstance(body["planToken"], str) or len(body["planToken"]) > MAX_TOKEN_LENGTH:
+            logger.warning("Invalid plan token: not a string or too long")
+            raise RequestError({
+                "error": "Invalid planToken",
+                "message": "planToken is not a token returned by /api/plan"
+            })
+        try:
+            inputs, basket = decode_plan_token(body["planToken"])
+        except ValueError as e:
+            logger.warning(f"Invalid plan token: {e}")
+            raise RequestError({
+                "error": "Invalid planToken",
+                "message": "planToken is not a token returned by /api/plan"
+            })
+    elif isinstance(body.get("plan"), dict):
+        inputs = body["plan"].get("inputs")
+        try:
+            basket = [int(item["product_id"]) for item in body["plan"].get("items") or []]
+        except (TypeError, ValueError, KeyError):
+            raise RequestError({
+                "error": "Invalid plan",
+                "message": "plan.items must be basket items with a product_id"
+            })
+    else:
+        raise RequestError({
+            "error": "Missing required fields",
+            "missing": ["planToken"]
+        })
+
+    if not isinstance(inputs, dict):
+        raise RequestError({
+            "error": "Invalid plan",
+            "message": "plan.inputs must be the inputs of an /api/plan response"
+        })
+
+    edited = dict(inputs)
+    for field in ("budget", "people", "household", "nutrientLimits"):
+        if field in body:
+            edited[field] = body[field]
+    if "people" in body and "household" not in body:
+        edited.pop("household", None)
+    params = _single_week(parse_plan_request(edited), "/api/plan/adjust")
+
+    exclude = _parse_product_ids(body, "exclude")
+    pin = _parse_product_ids(body, "pin")
+    if set(exclude) & set(pin):
+        raise RequestError({
+            "error": "Conflicting edits",
+            "message": "A product can't be both excluded and pinned"
+        })
+
+    params.update(basket=basket, exclude=exclude, pin=pin)
+    return params
+
+
+def _parse_product_ids(body: dict, field: str) -> list:
+    values = body.get(field) or []
+    try:
+        if not isinstance(values, list):
+            raise TypeError(field)
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise RequestError({
+            "error": f"Invalid {field}",
+            "message": f"{field} must be a list of product_id values"
+        })
+
+
+def parse_recipe_items(body: dict) -> list:
+    """
+    Validate a POST /api/recipes body and extract ingredient names.
+
+    Accepts both a list of names and a list of basket items with product_name.
+
+    Raises:
+        RequestError: if no items were provided
+    """
+    items = (body or {}).get("items", [])
+
+    if not items or len(items) == 0:
+        raise RequestError({
+            "error": "No items provided",
+            "message": "Please provide a list of ingredients."
+        })
+
+    ingredient_names = []
+    for item in items:
+        if isinstance(item, str):
+            ingredient_names.append(item)
+        elif isinstance(item, dict) and "product_name" in item:
+            ingredient_names.append(item["product_name"])
+    return ingredient_names
@@ -0,0 +1,89 @@
+"""
+Benchmark per-category price winsorization.
+
+Compares the old row-group `groupby.apply` implementation with the vectorized
+pass in clean_data.winsorize_prices, then shows how the process-pool mode
+scales with worker count on a synthetic catalog.
+
+Usage (from data-ml/):
+    python benchmark_winsorize.py --rows 2000000 --categories 64
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from clean_data import find_raw_path, winsorize_prices
+
+
+def legacy_winsorize(group, lower=0.01, upper=0.99):
+    # The pre-vectorization implementation, kept here as the reference point
+    q_low = group["price_per_100g"].quantile(lower)
+    q_high = group["price_per_100g"].quantile(upper)
+    group["price_per_100g_clean"] = group["price_per_100g"].clip(q_low, q_high)
+    mask = group["price_per_100g"] != 0
+    factor = pd.Series(1.0, index=group.index)
+    factor[mask] = group.loc[mask, "price_per_100g_clean"] / group.loc[mask, "price_per_100g"]
+    group["price_per_gram_clean"] = group["price_per_gram"] * factor
+    group["price_per_serving_clean"] = group["price_per_serving"] * factor
+    return group
+
+
+def make_catalog(n_rows, n_categories, seed=42):
+    """Resample the raw price columns into a larger catalog with more categories."""
+    raw = pd.read_csv(find_raw_path(), usecols=["category", "price_per_gram", "price_per_serving", "price_per_100g"])
+    rng = np.random.default_rng(seed)
+
+    df = raw.sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+    noise = rng.lognormal(0, 0.1, n_rows)
+    for col in ["price_per_gram", "price_per_serving", "price_per_100g"]:
+        df[col] = df[col] * noise
+    df["category"] = df["category"] + " #" + (rng.integers(0, n_categories, n_rows) % n_categories).astype(str)
+    return df
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"Building synthetic catalog: {args.rows} rows, ~{args.categories} categories...")
+    df = make_catalog(args.rows, args.categories)
+
+    legacy = best_of(
+        lambda: df.copy().groupby("category", group_keys=False)[df.columns.tolist()].apply(legacy_winsorize),
+        args.repeats,
+    )
+    print(f"\n{'mode':<22}{'seconds':>10}{'speedup':>10}")
+    print(f"{'groupby.apply':<22}{legacy:>10.3f}{1.0:>10.2f}")
+
+    reference = winsorize_prices(df.copy())
+    workers = 1
+    while workers <= args.max_workers:
+        elapsed = best_of(lambda: winsorize_prices(df.copy(), workers=workers), args.repeats)
+        label = "vectorized" if workers == 1 else f"process pool x{workers}"
+        print(f"{label:<22}{elapsed:>10.3f}{legacy / elapsed:>10.2f}")
+
+        # Sharding must not change results or row order
+        if workers > 1:
+            pd.testing.assert_frame_equal(winsorize_prices(df.copy(), workers=workers), reference)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
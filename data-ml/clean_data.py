@@ -1,23 +1,18 @@
-import pandas as pd
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
-# 1. Load Data
-# Try relative path from data-ml first, then from root
-raw_path = Path("raw/canada_grocery_nutrition_5000.csv")
-if not raw_path.exists():
-    raw_path = Path("data-ml/raw/canada_grocery_nutrition_5000.csv")
-
-if not raw_path.exists():
-    # Fallback to absolute path if needed, but let's try relative first
-    print(f"Error: Could not find {raw_path}")
-    exit(1)
+import numpy as np
+import pandas as pd
 
-print(f"Loading data from {raw_path}...")
-df = pd.read_csv(raw_path)
+# Rows per chunk when streaming (--chunksize). Peak memory is bounded by this,
+# not by the size of the input file.
+DEFAULT_CHUNKSIZE = 50_000
 
-# 2. Fix brand-product mismatches
-df = df.copy()
+# t-digest compression: higher = more centroids per category = tighter quantiles.
+SKETCH_COMPRESSION = 200
 
 big_cp_brands = {
     "Coca-Cola", "PepsiCo", "Nestlé", "Heinz",
@@ -39,6 +34,24 @@ beverage_keywords = {
 
 produce_categories = {"Produce"}
 
+
+def find_raw_path():
+    # Try relative path from data-ml first, then from root
+    raw_path = Path("raw/canada_grocery_nutrition_5000.csv")
+    if not raw_path.exists():
+        raw_path = Path("data-ml/raw/canada_grocery_nutrition_5000.csv")
+    return raw_path
+
+
+def find_output_path():
+    output_path = Path("outputs/canada_grocery_nutrition_clean.csv")
+    if not output_path.parent.exists():
+        # If running from root
+        output_path = Path("data-ml/outputs/canada_grocery_nutrition_clean.csv")
+    return output_path
+
+
+# 2. Fix brand-product mismatches
 def clean_brand(row):
     name = str(row["product_name"]).lower()
     brand = str(row["brand"])
@@ -57,52 +70,240 @@ def clean_brand(row):
     # 3) Otherwise keep the original brand
     return brand
 
-df["brand_clean"] = df.apply(clean_brand, axis=1)
 
 # 3. Winsorize prices
-def winsorize_prices(group, lower=0.01, upper=0.99):
-    q_low = group["price_per_100g"].quantile(lower)
-    q_high = group["price_per_100g"].quantile(upper)
-
-    # Clamp
-    group["price_per_100g_clean"] = group["price_per_100g"].clip(q_low, q_high)
+def clip_prices(df, q_low, q_high):
+    """
+    Clamp price_per_100g to [q_low, q_high] and scale the other price columns
+    by the same factor. Bounds may be scalars or Series aligned with df.
+    """
+    df["price_per_100g_clean"] = df["price_per_100g"].clip(q_low, q_high)
 
     # Scale other price columns proportionally
     # Avoid division by zero
-    mask = group["price_per_100g"] != 0
-    factor = pd.Series(1.0, index=group.index)
-    factor[mask] = group.loc[mask, "price_per_100g_clean"] / group.loc[mask, "price_per_100g"]
-    
-    group["price_per_gram_clean"] = group["price_per_gram"] * factor
-    group["price_per_serving_clean"] = group["price_per_serving"] * factor
+    mask = df["price_per_100g"] != 0
+    factor = pd.Series(1.0, index=df.index)
+    factor[mask] = df.loc[mask, "price_per_100g_clean"] / df.loc[mask, "price_per_100g"]
+
+    df["price_per_gram_clean"] = df["price_per_gram"] * factor
+    df["price_per_serving_clean"] = df["price_per_serving"] * factor
+
+    return df
+
+
+def _winsorize_frame(df, lower, upper):
+    # One vectorized pass: every row gets its own category's bounds
+    prices = df.groupby("category")["price_per_100g"]
+    q_low = prices.transform("quantile", lower)
+    q_high = prices.transform("quantile", upper)
+    return clip_prices(df, q_low, q_high)
 
-    return group
 
-# Filter out zero prices before grouping if necessary, or handle in function
-# The original dataset might have some 0s, let's keep them but they won't be scaled
-df = df.groupby("category", group_keys=False).apply(winsorize_prices)
+def _shard_categories(df, workers):
+    """Split categories into `workers` shards of roughly equal row count."""
+    sizes = df["category"].value_counts()
+    shards = [[] for _ in range(workers)]
+    loads = [0] * workers
+    # Largest first onto the lightest shard; ties broken by name so shards are stable
+    for category, size in sorted(sizes.items(), key=lambda kv: (-kv[1], str(kv[0]))):
+        i = loads.index(min(loads))
+        shards[i].append(category)
+        loads[i] += size
+    return [s for s in shards if s]
+
+
+def winsorize_prices(df, lower=0.01, upper=0.99, workers=1):
+    """
+    Clamp price_per_100g to each category's [lower, upper] quantiles.
+
+    Categories are independent, so with workers > 1 they are sharded across a
+    process pool. Output rows always come back in the input order.
+    """
+    if workers <= 1:
+        return _winsorize_frame(df, lower, upper)
+
+    # Copies, so clip_prices() writes to each shard rather than a view of df
+    shards = [df[df["category"].isin(cats)].copy() for cats in _shard_categories(df, workers)]
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        parts = list(pool.map(_winsorize_frame, shards, repeat(lower), repeat(upper)))
+
+    # Rows without a category have no bounds; keep them unclipped
+    uncategorized = df[df["category"].isna()].copy()
+    if len(uncategorized):
+        parts.append(clip_prices(uncategorized, None, None))
+
+    return pd.concat(parts).reindex(df.index)
+
 
 # 4. Finalize columns
-# Drop old columns and rename clean ones
-df = df.drop(columns=["brand"])
-df = df.rename(columns={"brand_clean": "brand"})
-
-df = df.drop(
-    columns=["price_per_gram", "price_per_serving", "price_per_100g"]
-).rename(
-    columns={
-        "price_per_gram_clean": "price_per_gram",
-        "price_per_serving_clean": "price_per_serving",
-        "price_per_100g_clean": "price_per_100g",
+def finalize_columns(df):
+    # Drop old columns and rename clean ones
+    df = df.drop(columns=["brand"])
+    df = df.rename(columns={"brand_clean": "brand"})
+
+    return df.drop(
+        columns=["price_per_gram", "price_per_serving", "price_per_100g"]
+    ).rename(
+        columns={
+            "price_per_gram_clean": "price_per_gram",
+            "price_per_serving_clean": "price_per_serving",
+            "price_per_100g_clean": "price_per_100g",
+        }
+    )
+
+
+class QuantileSketch:
+    """
+    Mergeable t-digest style sketch for approximate quantiles.
+
+    Keeps at most ~compression/2 weighted centroids, packed more densely near
+    the tails (arcsine scale function) so the 1st/99th percentiles used for
+    winsorizing stay accurate. Memory is O(compression) regardless of how
+    many values are added.
+    """
+
+    def __init__(self, compression=SKETCH_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values))])
+        self._compress(means, weights)
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        q_mid = (np.cumsum(weights) - weights / 2) / total
+
+        # k1 scale function: centroids sharing a unit interval of k get merged
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q_mid - 1)
+        bucket = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+
+        # Centroid centres on the same 0..n-1 rank scale pandas uses, so a
+        # sketch of singleton centroids reproduces Series.quantile exactly
+        centres = np.cumsum(self.weights) - self.weights / 2 - 0.5
+        positions = np.r_[0.0, centres, self.count - 1]
+        values = np.r_[self.min, self.means, self.max]
+        return float(np.interp(q * (self.count - 1), positions, values))
+
+
+def compute_category_bounds(raw_path, chunksize, lower=0.01, upper=0.99):
+    """
+    Pass 1: stream category + price_per_100g and sketch each category's
+    price distribution. Returns {category: (q_low, q_high)}.
+    """
+    sketches = {}
+    reader = pd.read_csv(raw_path, usecols=["category", "price_per_100g"], chunksize=chunksize)
+    for chunk in reader:
+        for category, prices in chunk.groupby("category")["price_per_100g"]:
+            if category not in sketches:
+                sketches[category] = QuantileSketch()
+            sketches[category].update(prices.to_numpy())
+
+    return {
+        category: (sketch.quantile(lower), sketch.quantile(upper))
+        for category, sketch in sketches.items()
     }
-)
 
-# 5. Save
-output_path = Path("outputs/canada_grocery_nutrition_clean.csv")
-if not output_path.parent.exists():
-    # If running from root
-    output_path = Path("data-ml/outputs/canada_grocery_nutrition_clean.csv")
 
-output_path.parent.mkdir(parents=True, exist_ok=True)
-df.to_csv(output_path, index=False)
-print(f"Saved cleaned data to {output_path}")
+def clean_in_memory(raw_path, output_path, workers=1):
+    print(f"Loading data from {raw_path}...")
+    df = pd.read_csv(raw_path)
+
+    df = df.copy()
+    df["brand_clean"] = df.apply(clean_brand, axis=1)
+
+    # The original dataset might have some 0s, let's keep them but they won't be scaled
+    df = winsorize_prices(df, workers=workers)
+
+    df = finalize_columns(df)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(output_path, index=False)
+    print(f"Saved cleaned data to {output_path}")
+
+
+def clean_streaming(raw_path, output_path, chunksize=DEFAULT_CHUNKSIZE, lower=0.01, upper=0.99):
+    """
+    Out-of-core variant of clean_in_memory for catalogs larger than memory.
+
+    Pass 1 builds per-category quantile sketches; pass 2 re-reads the file in
+    chunks, clips against the approximate bounds and appends to the output.
+    """
+    print(f"Streaming data from {raw_path} in chunks of {chunksize} rows...")
+    bounds = compute_category_bounds(raw_path, chunksize, lower, upper)
+    print(f"Computed price bounds for {len(bounds)} categories")
+
+    q_low = {category: lo for category, (lo, _) in bounds.items()}
+    q_high = {category: hi for category, (_, hi) in bounds.items()}
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_path.exists():
+        os.remove(output_path)
+
+    n_rows = 0
+    for chunk in pd.read_csv(raw_path, chunksize=chunksize):
+        chunk["brand_clean"] = chunk.apply(clean_brand, axis=1)
+        chunk = clip_prices(chunk, chunk["category"].map(q_low), chunk["category"].map(q_high))
+        chunk = finalize_columns(chunk)
+
+        chunk.to_csv(output_path, mode="a", header=(n_rows == 0), index=False)
+        n_rows += len(chunk)
+
+    print(f"Saved {n_rows} cleaned rows to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the raw grocery dataset.")
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help=f"Stream the input in chunks of this many rows (e.g. {DEFAULT_CHUNKSIZE}) "
+             "instead of loading it into memory",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Processes to use for per-category winsorization (in-memory mode)",
+    )
+    args = parser.parse_args()
+
+    # 1. Load Data
+    raw_path = find_raw_path()
+    if not raw_path.exists():
+        print(f"Error: Could not find {raw_path}")
+        exit(1)
+
+    # 5. Save
+    output_path = find_output_path()
+    if args.chunksize:
+        clean_streaming(raw_path, output_path, args.chunksize)
+    else:
+        clean_in_memory(raw_path, output_path, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,43 @@
+import argparse
 import pandas as pd
 import numpy as np
+import joblib
+from scipy.optimize import linear_sum_assignment
 from sklearn.preprocessing import MinMaxScaler, StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import os
 
-# 1. Load Data
-DATA_PATH = "outputs/canada_grocery_nutrition_clean.csv"
-# Adjust path to be relative to where we run the script (data-ml folder)
-if not os.path.exists(DATA_PATH):
-    # Try absolute path or relative to project root if run from there
-    DATA_PATH = "data-ml/outputs/canada_grocery_nutrition_clean.csv"
+# Persisted clustering artifacts. Once these exist, new products are assigned
+# to the nearest saved centroid instead of refitting the whole catalog.
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+CLUSTER_SCALER_PATH = os.path.join(MODELS_DIR, "cluster_scaler.joblib")
+CLUSTER_MODEL_PATH = os.path.join(MODELS_DIR, "cluster_model.joblib")
+
+CLUSTER_FEATURES = ["calories", "protein", "carbs", "fat", "sugar", "fiber", "FPro", "nutriscore"]
+N_CLUSTERS = 4
+RANDOM_STATE = 42
 
-if not os.path.exists(DATA_PATH):
-    # Fallback for safety
-    DATA_PATH = "/Users/yagna/Documents/NutriBudget/nutribudget/data-ml/raw/canada_grocery_nutrition_5000.csv"
+cluster_map = {
+    0: "Staples / Mixed",
+    1: "Veg & Wholefoods",
+    2: "Processed / Snacks",
+    3: "High Energy / Fatty"
+}
+
+
+# 1. Load Data
+def find_data_path():
+    DATA_PATH = "outputs/canada_grocery_nutrition_clean.csv"
+    # Adjust path to be relative to where we run the script (data-ml folder)
+    if not os.path.exists(DATA_PATH):
+        # Try absolute path or relative to project root if run from there
+        DATA_PATH = "data-ml/outputs/canada_grocery_nutrition_clean.csv"
 
-print(f"Loading data from {DATA_PATH}...")
-df = pd.read_csv(DATA_PATH)
+    if not os.path.exists(DATA_PATH):
+        # Fallback for safety
+        DATA_PATH = "/Users/yagna/Documents/NutriBudget/nutribudget/data-ml/raw/canada_grocery_nutrition_5000.csv"
+    return DATA_PATH
 
-# 2. Create product_id
-df["product_id"] = df.index.astype(int)
-print(f"Loaded {len(df)} rows.")
 
 # 3. Engineer Health Score (0-100)
 def calculate_raw_health(row):
@@ -34,76 +51,159 @@ def calculate_raw_health(row):
         ns_map = {'a': 40, 'b': 30, 'c': 20, 'd': 10, 'e': 0} # Example mapping
         ns = ns_map.get(ns.lower(), 0)
     score += ns * 5
-    
+
     # Penalties
     score -= row.get("sugar", 0) * 1
     score -= row.get("saturated_fat", 0) * 2
     score -= row.get("trans_fat", 0) * 5
     score -= (row.get("sodium", 0) / 100) * 1
     score -= row.get("FPro", 0) * 20
-    
-    return score
 
-df["raw_health"] = df.apply(calculate_raw_health, axis=1)
+    return score
 
-# Scale to 0-100
-scaler = MinMaxScaler(feature_range=(0, 100))
-df["health_score"] = scaler.fit_transform(df[["raw_health"]]).round(1)
 
-# 4. Engineer Affordability Score (0-100)
-price_col = "price_per_100g"
-# Handle potential zeros
-df = df[df[price_col] > 0].copy()
+def score_products(df):
+    df["raw_health"] = df.apply(calculate_raw_health, axis=1)
 
-df["price_inv"] = 1 / df[price_col]
-scaler_afford = MinMaxScaler(feature_range=(0, 100))
-df["affordability_score"] = scaler_afford.fit_transform(df[["price_inv"]]).round(1)
+    # Scale to 0-100
+    scaler = MinMaxScaler(feature_range=(0, 100))
+    df["health_score"] = scaler.fit_transform(df[["raw_health"]]).round(1)
 
-# 5. NutriScore App
-df["nutri_score_app"] = (0.6 * df["health_score"] + 0.4 * df["affordability_score"]).round(1)
+    # 4. Engineer Affordability Score (0-100)
+    price_col = "price_per_100g"
+    # Handle potential zeros
+    df = df[df[price_col] > 0].copy()
 
-# 6. Clustering
-features = ["calories", "protein", "carbs", "fat", "sugar", "fiber", "FPro", "nutriscore"]
-# Ensure all features are numeric
-for f in features:
-    df[f] = pd.to_numeric(df[f], errors='coerce').fillna(0)
+    df["price_inv"] = 1 / df[price_col]
+    scaler_afford = MinMaxScaler(feature_range=(0, 100))
+    df["affordability_score"] = scaler_afford.fit_transform(df[["price_inv"]]).round(1)
 
-X = df[features]
-scaler_cluster = StandardScaler()
-X_scaled = scaler_cluster.fit_transform(X)
+    # 5. NutriScore App
+    df["nutri_score_app"] = (0.6 * df["health_score"] + 0.4 * df["affordability_score"]).round(1)
+    return df
 
-kmeans = KMeans(n_clusters=4, random_state=42)
-df["cluster"] = kmeans.fit_predict(X_scaled)
 
-cluster_map = {
-    0: "Staples / Mixed",
-    1: "Veg & Wholefoods",
-    2: "Processed / Snacks",
-    3: "High Energy / Fatty"
-}
-df["cluster_label"] = df["cluster"].map(cluster_map)
-
-# 7. Export
-output_cols = [
-    "product_id", "product_name", "store", "brand",
-    "category", "sub_category", "food_type", "veg_nonveg",
-    "calories", "protein", "carbs", "fat", "sugar", "fiber",
-    "price_per_gram", "price_per_100g",
-    "FPro", "nutriscore",
-    "health_score", "affordability_score", "nutri_score_app", "cluster", "cluster_label"
-]
-
-# Ensure output directory exists
-os.makedirs("outputs", exist_ok=True)
-# Also try absolute path if running from weird location
-abs_output_dir = "/Users/yagna/Documents/NutriBudget/nutribudget/data-ml/outputs"
-os.makedirs(abs_output_dir, exist_ok=True)
-
-final_cols = [c for c in output_cols if c in df.columns]
-
-output_path = "outputs/foods_scored.csv"
-df[final_cols].to_csv(output_path, index=False)
-# Also save to absolute path to be sure
-df[final_cols].to_csv(os.path.join(abs_output_dir, "foods_scored.csv"), index=False)
-
-print(f"Saved to {output_path}")
+# 6. Clustering
+def cluster_feature_matrix(df):
+    # Ensure all features are numeric
+    for f in CLUSTER_FEATURES:
+        df[f] = pd.to_numeric(df[f], errors='coerce').fillna(0)
+    return df[CLUSTER_FEATURES]
+
+
+def fit_clusters(X, algorithm="kmeans", batch_size=4096):
+    """
+    Fit a fresh scaler + clusterer. "minibatch" uses MiniBatchKMeans, which
+    touches one batch at a time and scales to very large catalogs.
+    """
+    scaler_cluster = StandardScaler()
+    X_scaled = scaler_cluster.fit_transform(X)
+
+    if algorithm == "minibatch":
+        model = MiniBatchKMeans(n_clusters=N_CLUSTERS, batch_size=batch_size, n_init=3, random_state=RANDOM_STATE)
+    else:
+        model = KMeans(n_clusters=N_CLUSTERS, random_state=RANDOM_STATE)
+    model.fit(X_scaled)
+    return scaler_cluster, model
+
+
+def align_to_previous(scaler, model, prev_scaler, prev_model):
+    """
+    Reorder a refit model's centroids so each takes the ID of the closest
+    previous centroid. Keeps cluster IDs (and cluster_map labels) stable.
+    """
+    # Compare both sets of centroids in the new scaler's space
+    prev_centers = scaler.transform(
+        pd.DataFrame(prev_scaler.inverse_transform(prev_model.cluster_centers_), columns=CLUSTER_FEATURES)
+    )
+    cost = np.linalg.norm(model.cluster_centers_[:, None, :] - prev_centers[None, :, :], axis=2)
+    new_ids, prev_ids = linear_sum_assignment(cost)
+
+    aligned = np.empty_like(model.cluster_centers_)
+    aligned[prev_ids] = model.cluster_centers_[new_ids]
+    model.cluster_centers_ = aligned
+    return model
+
+
+def load_cluster_artifacts():
+    if os.path.exists(CLUSTER_SCALER_PATH) and os.path.exists(CLUSTER_MODEL_PATH):
+        return joblib.load(CLUSTER_SCALER_PATH), joblib.load(CLUSTER_MODEL_PATH)
+    return None, None
+
+
+def save_cluster_artifacts(scaler, model):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    joblib.dump(scaler, CLUSTER_SCALER_PATH)
+    joblib.dump(model, CLUSTER_MODEL_PATH)
+    print(f"Saved cluster scaler and model to {MODELS_DIR}")
+
+
+def assign_clusters(df, scaler, model):
+    """Nearest-centroid assignment against saved artifacts (no refit)."""
+    X_scaled = scaler.transform(cluster_feature_matrix(df))
+    df["cluster"] = model.predict(X_scaled)
+    df["cluster_label"] = df["cluster"].map(cluster_map)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score and cluster the cleaned grocery dataset.")
+    parser.add_argument(
+        "--refit", choices=["kmeans", "minibatch"], default=None,
+        help="Refit the clusterer instead of assigning to saved centroids. "
+             "IDs are aligned to the previous centroids when they exist.",
+    )
+    args = parser.parse_args()
+
+    DATA_PATH = find_data_path()
+    print(f"Loading data from {DATA_PATH}...")
+    df = pd.read_csv(DATA_PATH)
+
+    # 2. Create product_id
+    df["product_id"] = df.index.astype(int)
+    print(f"Loaded {len(df)} rows.")
+
+    df = score_products(df)
+
+    prev_scaler, prev_model = load_cluster_artifacts()
+    if args.refit or prev_model is None:
+        algorithm = args.refit or "kmeans"
+        print(f"Fitting clusters ({algorithm})...")
+        scaler_cluster, model = fit_clusters(cluster_feature_matrix(df), algorithm)
+        if prev_model is not None:
+            model = align_to_previous(scaler_cluster, model, prev_scaler, prev_model)
+        save_cluster_artifacts(scaler_cluster, model)
+    else:
+        print(f"Assigning clusters from saved centroids in {MODELS_DIR}")
+        scaler_cluster, model = prev_scaler, prev_model
+
+    df = assign_clusters(df, scaler_cluster, model)
+
+    # 7. Export
+    output_cols = [
+        "product_id", "product_name", "store", "brand",
+        "category", "sub_category", "food_type", "veg_nonveg",
+        "calories", "protein", "carbs", "fat", "sugar", "fiber", "sodium", "saturated_fat",
+        "price_per_gram", "price_per_100g",
+        "FPro", "nutriscore",
+        "health_score", "affordability_score", "nutri_score_app", "cluster", "cluster_label"
+    ]
+
+    # Ensure output directory exists
+    os.makedirs("outputs", exist_ok=True)
+    # Also try absolute path if running from weird location
+    abs_output_dir = "/Users/yagna/Documents/NutriBudget/nutribudget/data-ml/outputs"
+    os.makedirs(abs_output_dir, exist_ok=True)
+
+    final_cols = [c for c in output_cols if c in df.columns]
+
+    output_path = "outputs/foods_scored.csv"
+    df[final_cols].to_csv(output_path, index=False)
+    # Also save to absolute path to be sure
+    df[final_cols].to_csv(os.path.join(abs_output_dir, "foods_scored.csv"), index=False)
+
+    print(f"Saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
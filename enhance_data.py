@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import re
 
+from api.allergens import tag_bits
+
 def extract_weight(product_name):
     """Extract weight in grams from product name if available"""
     # Patterns for g, kg, ml, l
@@ -85,6 +87,20 @@ def round_retail_price(price):
     else:
         return base + 0.99 # .99
 
+def add_raw_nutrients(df, raw_path='data-ml/raw/canada_grocery_nutrition_5000.csv'):
+    """Add sodium (mg/100g) and saturated_fat (g/100g) from the raw dataset by product_id"""
+    missing = [c for c in ['sodium', 'saturated_fat'] if c not in df.columns]
+    if not missing:
+        return df
+    try:
+        raw = pd.read_csv(raw_path, usecols=missing)
+    except FileNotFoundError:
+        print(f"⚠️ Could not find {raw_path}; plans won't report {', '.join(missing)}")
+        return df
+    for column in missing:
+        df[column] = raw[column].reindex(df['product_id']).to_numpy()
+    return df
+
 def enhance_data():
     print("🚀 Enhancing dataset with realistic prices...")
     
@@ -96,6 +112,10 @@ def enhance_data():
         print("❌ Could not find api/data/foods_scored.csv")
         return
 
+    # 0. Bring in sodium and saturated fat from the raw dataset
+    # (foods_scored.csv drops them; raw rows are in product_id order)
+    df = add_raw_nutrients(df)
+
     # 1. Calculate Package Weights
     weights = []
     sources = []
@@ -128,6 +148,9 @@ def enhance_data():
     # This ensures consistency: item_price / weight * 100 = price_per_100g
     df['price_per_100g'] = (df['price_per_item'] / df['package_weight_g']) * 100
     
+    # 5. Allergen and attribute tags, packed into one bitset column (see api/allergens.py)
+    df['tag_bits'] = tag_bits(df)
+
     # Save enhanced data
     output_path = 'api/data/foods_enhanced.csv'
     df.to_csv(output_path, index=False)
@@ -13,6 +13,8 @@ export type BasketItem = {
   // Optional raw data if needed
   calories?: number;
   protein?: number;
+  // Multi-week plans: weeks the item is bought in
+  weeks?: number[];
 };
 
 export type PlanTotals = {
@@ -21,19 +23,63 @@ export type PlanTotals = {
   calories: number;
   protein: number;
   fiber: number;
+  carbs?: number;
+  fat?: number;
+  saturated_fat?: number;
+  sugar?: number;
+  sodium?: number;
+};
+
+export type NutrientCoverage = {
+  target: number;
+  actual: number;
+  percentage: number;
+  kind?: "min" | "max";
 };
 
 export type PlanCoverage = {
-  calories: {
-    target: number;
-    actual: number;
-    percentage: number;
-  };
-  protein: {
-    target: number;
-    actual: number;
-    percentage: number;
-  };
+  calories: NutrientCoverage;
+  protein: NutrientCoverage;
+  carbs?: NutrientCoverage;
+  fat?: NutrientCoverage;
+  saturated_fat?: NutrientCoverage;
+  sugar?: NutrientCoverage;
+  fiber?: NutrientCoverage;
+  sodium?: NutrientCoverage;
+};
+
+export type PlanWeek = {
+  week: number;
+  itemCount: number;
+  subtotal: number;
+  perishableItems: number;
+  items: {
+    product_id: number;
+    product_name: string;
+    store: string;
+    estimated_cost: number;
+    perishable: boolean;
+  }[];
+};
+
+export type PlanObjectives = {
+  cost: number;
+  coverage: number;
+  processedShare: number;
+};
+
+export type PlanAlternative = {
+  objectives: PlanObjectives;
+  itemCount: number;
+  totals: PlanTotals;
+  coverage: PlanCoverage;
+  items: {
+    product_id: number;
+    product_name: string;
+    store: string;
+    estimated_cost: number;
+  }[];
+  planToken: string;
 };
 
 export type PlanResponse = {
@@ -41,7 +87,11 @@ export type PlanResponse = {
     budget: number;
     people: number;
     dietType: string;
+    weeks?: number;
+    seed?: number;
+    exclude?: string[];
   };
+  planToken?: string;
   items: BasketItem[];
   totals: PlanTotals;
   coverage: PlanCoverage;
@@ -52,4 +102,8 @@ export type PlanResponse = {
   };
   clusterBreakdown: Record<string, number>;
   processingBreakdown?: Record<string, number>;
+  storeBreakdown?: Record<string, { items: number; subtotal: number }>;
+  schedule?: PlanWeek[];
+  objectives?: PlanObjectives;
+  alternatives?: PlanAlternative[];
 };